@@ -65,8 +65,6 @@ shorteners_list = []
 categories_dict = {}
 aria2_options = {}
 qbit_options = {}
-queued_dl = {}
-queued_up = {}
 bot_cache = {}
 bot_cache["pkgs"] = ["7z", "rclone", "ffmpeg"]
 non_queued_dl = set()
@@ -388,12 +386,32 @@ QUEUE_DOWNLOAD = "" if len(QUEUE_DOWNLOAD) == 0 else int(QUEUE_DOWNLOAD)
 QUEUE_UPLOAD = environ.get("QUEUE_UPLOAD", "")
 QUEUE_UPLOAD = "" if len(QUEUE_UPLOAD) == 0 else int(QUEUE_UPLOAD)
 
+LINK_SPEED = environ.get("LINK_SPEED", "")
+LINK_SPEED = int(LINK_SPEED) if LINK_SPEED.isdigit() else 0
+
+LINK_UTILIZATION = environ.get("LINK_UTILIZATION", "")
+LINK_UTILIZATION = min(int(LINK_UTILIZATION), 100) if LINK_UTILIZATION.isdigit() else 90
+
 INCOMPLETE_TASK_NOTIFIER = environ.get("INCOMPLETE_TASK_NOTIFIER", "")
 INCOMPLETE_TASK_NOTIFIER = INCOMPLETE_TASK_NOTIFIER.lower() == "true"
 
+DATABASE_WRITE_DELAY = environ.get("DATABASE_WRITE_DELAY", "")
+DATABASE_WRITE_DELAY = (
+    int(DATABASE_WRITE_DELAY) if DATABASE_WRITE_DELAY.isdigit() else 0
+)
+
+ARCHIVE_WORKERS = environ.get("ARCHIVE_WORKERS", "")
+ARCHIVE_WORKERS = int(ARCHIVE_WORKERS) if ARCHIVE_WORKERS.isdigit() else 0
+
+ARCHIVE_LEVEL = environ.get("ARCHIVE_LEVEL", "")
+ARCHIVE_LEVEL = min(int(ARCHIVE_LEVEL), 9) if ARCHIVE_LEVEL.isdigit() else 0
+
 STOP_DUPLICATE = environ.get("STOP_DUPLICATE", "")
 STOP_DUPLICATE = STOP_DUPLICATE.lower() == "true"
 
+DRIVE_INDEX = environ.get("DRIVE_INDEX", "")
+DRIVE_INDEX = DRIVE_INDEX.lower() == "true"
+
 IS_TEAM_DRIVE = environ.get("IS_TEAM_DRIVE", "")
 IS_TEAM_DRIVE = IS_TEAM_DRIVE.lower() == "true"
 
@@ -427,6 +445,11 @@ DELETE_LINKS = DELETE_LINKS.lower() == "true"
 EQUAL_SPLITS = environ.get("EQUAL_SPLITS", "")
 EQUAL_SPLITS = EQUAL_SPLITS.lower() == "true"
 
+LEECH_UPLOAD_WORKERS = environ.get("LEECH_UPLOAD_WORKERS", "")
+LEECH_UPLOAD_WORKERS = (
+    int(LEECH_UPLOAD_WORKERS) if LEECH_UPLOAD_WORKERS.isdigit() else 1
+)
+
 MEDIA_GROUP = environ.get("MEDIA_GROUP", "")
 MEDIA_GROUP = MEDIA_GROUP.lower() == "true"
 
@@ -565,6 +588,12 @@ GD_INFO = environ.get("GD_INFO", "")
 if len(GD_INFO) == 0:
     GD_INFO = "Uploaded by WZML-X"
 
+GD_CLONE_WORKERS = environ.get("GD_CLONE_WORKERS", "")
+GD_CLONE_WORKERS = int(GD_CLONE_WORKERS) if GD_CLONE_WORKERS.isdigit() else 1
+
+GD_UPLOAD_WORKERS = environ.get("GD_UPLOAD_WORKERS", "")
+GD_UPLOAD_WORKERS = int(GD_UPLOAD_WORKERS) if GD_UPLOAD_WORKERS.isdigit() else 1
+
 SAVE_MSG = environ.get("SAVE_MSG", "")
 SAVE_MSG = SAVE_MSG.lower() == "true"
 
@@ -691,12 +720,18 @@ config_dict = {
     "TITLE_NAME": TITLE_NAME,
     "TIMEZONE": TIMEZONE,
     "GD_INFO": GD_INFO,
+    "GD_CLONE_WORKERS": GD_CLONE_WORKERS,
+    "GD_UPLOAD_WORKERS": GD_UPLOAD_WORKERS,
     "GDTOT_CRYPT": GDTOT_CRYPT,
     "JIODRIVE_TOKEN": JIODRIVE_TOKEN,
     "EQUAL_SPLITS": EQUAL_SPLITS,
+    "LEECH_UPLOAD_WORKERS": LEECH_UPLOAD_WORKERS,
     "EXTENSION_FILTER": EXTENSION_FILTER,
     "GDRIVE_ID": GDRIVE_ID,
     "INCOMPLETE_TASK_NOTIFIER": INCOMPLETE_TASK_NOTIFIER,
+    "DATABASE_WRITE_DELAY": DATABASE_WRITE_DELAY,
+    "ARCHIVE_WORKERS": ARCHIVE_WORKERS,
+    "ARCHIVE_LEVEL": ARCHIVE_LEVEL,
     "INDEX_URL": INDEX_URL,
     "IS_TEAM_DRIVE": IS_TEAM_DRIVE,
     "LEECH_FILENAME_PREFIX": LEECH_FILENAME_PREFIX,
@@ -718,6 +753,8 @@ config_dict = {
     "QUEUE_ALL": QUEUE_ALL,
     "QUEUE_DOWNLOAD": QUEUE_DOWNLOAD,
     "QUEUE_UPLOAD": QUEUE_UPLOAD,
+    "LINK_SPEED": LINK_SPEED,
+    "LINK_UTILIZATION": LINK_UTILIZATION,
     "RCLONE_FLAGS": RCLONE_FLAGS,
     "RCLONE_PATH": RCLONE_PATH,
     "RCLONE_SERVE_URL": RCLONE_SERVE_URL,
@@ -740,6 +777,7 @@ config_dict = {
     "STATUS_LIMIT": STATUS_LIMIT,
     "STATUS_UPDATE_INTERVAL": STATUS_UPDATE_INTERVAL,
     "STOP_DUPLICATE": STOP_DUPLICATE,
+    "DRIVE_INDEX": DRIVE_INDEX,
     "SUDO_USERS": SUDO_USERS,
     "TELEGRAM_API": TELEGRAM_API,
     "TELEGRAM_HASH": TELEGRAM_HASH,
@@ -46,6 +46,8 @@ from .helper.ext_utils.bot_utils import (
     get_stats,
 )
 from .helper.ext_utils.db_handler import DbManger
+from .helper.ext_utils.drive_index import start_drive_index
+from .helper.ext_utils.bandwidth_utils import bandwidth
 from .helper.telegram_helper.bot_commands import BotCommands
 from .helper.telegram_helper.message_utils import (
     sendMessage,
@@ -184,6 +186,8 @@ async def restart(client, message):
     )
     proc2 = await create_subprocess_exec("python3", "update.py")
     await gather(proc1.wait(), proc2.wait())
+    if DATABASE_URL:
+        await DbManger().flush_writes()
     async with aiopen(".restartmsg", "w") as f:
         await f.write(f"{restart_message.chat.id}\n{restart_message.id}\n")
     osexecl(executable, executable, "-m", "bot")
@@ -386,8 +390,10 @@ async def main():
         search_images(),
         set_commands(bot),
         log_check(),
+        start_drive_index(),
     )
     await sync_to_async(start_aria2_listener, wait=False)
+    bandwidth.start()
 
     bot.add_handler(
         MessageHandler(start, filters=command(BotCommands.StartCommand) & private)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+from os import cpu_count
+from re import findall
+from asyncio import create_subprocess_exec, gather, Semaphore
+from asyncio.subprocess import PIPE
+from contextlib import suppress
+
+from bot import config_dict
+
+
+def archive_workers():
+    return config_dict["ARCHIVE_WORKERS"] or min(cpu_count() or 1, 4)
+
+
+class ProcessGroup:
+    """Several subprocesses behind the single listener.suproc handle"""
+
+    def __init__(self):
+        self.__procs = set()
+        self.returncode = None
+
+    def add(self, proc):
+        self.__procs.add(proc)
+
+    def discard(self, proc):
+        self.__procs.discard(proc)
+
+    def kill(self):
+        self.returncode = -9
+        for proc in list(self.__procs):
+            with suppress(Exception):
+                proc.kill()
+
+
+class ArchiveStage:
+    """Runs 7z jobs, archive_workers() at a time, and reports their progress as
+    a share of total, each job weighted by the size of its input"""
+
+    def __init__(self, listener, total):
+        self.__total = total
+        self.__workers = Semaphore(archive_workers())
+        self.__group = ProcessGroup()
+        self.__jobs = {}
+        listener.suproc = self.__group
+
+    @property
+    def processed_bytes(self):
+        if not (weight := sum(size for size, _ in self.__jobs.values())):
+            return 0
+        done = sum(size * percent for size, percent in self.__jobs.values())
+        return int(self.__total * done / (weight * 100))
+
+    def cancelled(self):
+        return self.__group.returncode == -9
+
+    def __add(self, size):
+        job = object()
+        self.__jobs[job] = [size, 0]
+        return job
+
+    async def run(self, cmd, size):
+        """Returns the exit code of 7z, -9 once the stage has been cancelled"""
+        return await self.__run(cmd, self.__add(size))
+
+    async def __run(self, cmd, job):
+        async with self.__workers:
+            if self.cancelled():
+                return -9
+            proc = await create_subprocess_exec(*cmd, "-bsp1", "-bso0", stdout=PIPE)
+            self.__group.add(proc)
+            try:
+                while chunk := await proc.stdout.read(1024):
+                    if percents := findall(rb"(\d+)%", chunk):
+                        self.__jobs[job][1] = int(percents[-1])
+                code = await proc.wait()
+            finally:
+                self.__group.discard(proc)
+        if self.cancelled():
+            return -9
+        if code == 0:
+            self.__jobs[job][1] = 100
+        return code
+
+    async def run_all(self, jobs):
+        """jobs: (cmd, size, out) triples, returns the exit codes in the same
+        order. Jobs sharing an output directory run one after another so 7z can
+        still rename clashing entries, different directories run side by side"""
+        codes = [None] * len(jobs)
+        groups = {}
+        for index, (cmd, size, out) in enumerate(jobs):
+            groups.setdefault(out, []).append((index, cmd, self.__add(size)))
+
+        async def run_group(group):
+            for index, cmd, job in group:
+                codes[index] = await self.__run(cmd, job)
+
+        await gather(*[run_group(group) for group in groups.values()])
+        return codes
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+from asyncio import sleep
+from threading import Lock
+from time import time
+
+from aria2p import Download
+
+from bot import aria2, LOGGER
+from bot.helper.ext_utils.bot_utils import sync_to_async
+
+ARIA2_STATE_TTL = 1
+ARIA2_LIST_LIMIT = 1000
+# everything the status page and the listener poll, names and files stay with the
+# full tellStatus taken when a status object is created
+ARIA2_KEYS = [
+    "gid",
+    "status",
+    "totalLength",
+    "completedLength",
+    "uploadLength",
+    "downloadSpeed",
+    "uploadSpeed",
+    "connections",
+    "numSeeders",
+    "seeder",
+    "followedBy",
+    "errorCode",
+    "errorMessage",
+]
+
+
+class Aria2State:
+    """Trimmed status of every active, waiting and stopped aria2 download, fetched
+    in one system.multicall at most once per ARIA2_STATE_TTL"""
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__structs = {}
+        self.__updated = 0
+
+    def refresh(self, force=False):
+        with self.__lock:
+            if not force and time() - self.__updated < ARIA2_STATE_TTL:
+                return
+            results = aria2.client.multicall2(
+                [
+                    ("aria2.tellActive", [ARIA2_KEYS]),
+                    ("aria2.tellWaiting", [0, ARIA2_LIST_LIMIT, ARIA2_KEYS]),
+                    ("aria2.tellStopped", [0, ARIA2_LIST_LIMIT, ARIA2_KEYS]),
+                ]
+            )
+            structs = {}
+            for result in results:
+                # successful calls are wrapped in a one item list, faults are dicts
+                if isinstance(result, dict):
+                    raise Exception(result.get("faultString", result))
+                for struct in result[0]:
+                    structs[struct["gid"]] = struct
+            self.__structs = structs
+            self.__updated = time()
+
+    def get(self, gid):
+        try:
+            self.refresh()
+        except Exception as e:
+            LOGGER.error(f"{e}: Aria2c, Error while syncing downloads")
+        return self.__structs.get(gid)
+
+    async def wait_for(self, gid, predicate, timeout):
+        """Trimmed status of gid once predicate holds for it, aria2 has no
+        notification for these, so the shared cache is checked every tick"""
+        for _ in range(max(int(timeout / ARIA2_STATE_TTL), 1)):
+            struct = await sync_to_async(self.get, gid)
+            if struct is None or predicate(struct):
+                return struct
+            await sleep(ARIA2_STATE_TTL)
+        return await sync_to_async(self.get, gid)
+
+    def download(self, gid):
+        """Download built from the trimmed status only, None once gid is gone"""
+        if (struct := self.get(gid)) is not None:
+            return Download(aria2, struct)
+
+
+aria2_state = Aria2State()
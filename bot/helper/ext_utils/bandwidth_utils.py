@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+from asyncio import Condition
+
+from bot import LOGGER, aria2, config_dict, download_dict
+from bot.helper.ext_utils.bot_utils import (
+    MirrorStatus,
+    get_task_speed,
+    setInterval,
+    sync_to_async,
+)
+from bot.helper.ext_utils.qbit_utils import qb_state
+from bot.helper.mirror_utils.status_utils.aria2_status import Aria2Status
+from bot.helper.mirror_utils.status_utils.qbit_status import QbittorrentStatus
+
+BANDWIDTH_INTERVAL = 5
+MIN_TASK_LIMIT = 65536
+# a task running this close to its limit is taken to want more
+LIMIT_SATURATION = 0.9
+# room a task that runs below its limit gets to speed up until the next tick
+LIMIT_HEADROOM = 1.25
+# limits are only sent to the engines once they move by more than this share
+LIMIT_TOLERANCE = 0.1
+
+
+def link_target():
+    """Bytes/s all tasks together should use in each direction, 0 if unlimited"""
+    return config_dict["LINK_SPEED"] * 125000 * config_dict["LINK_UTILIZATION"] // 100
+
+
+def fair_shares(demands, budget):
+    """Max-min fair split of budget, a demand of None takes whatever is left"""
+
+    def wanted(key):
+        return float("inf") if demands[key] is None else demands[key]
+
+    shares = {}
+    left = len(demands)
+    for key in sorted(demands, key=wanted):
+        shares[key] = min(wanted(key), budget / left)
+        budget -= shares[key]
+        left -= 1
+    return shares
+
+
+class BandwidthController:
+    """Keeps the traffic of all tasks at LINK_UTILIZATION of LINK_SPEED. aria2
+    and qBittorrent downloads get per task limits from what the other downloads
+    leave, new uploads wait while the upload direction is full"""
+
+    def __init__(self):
+        self.__limits = {}
+        self.__up_speed = 0
+        self.__uploads = 0
+        # uploads started since the last sample, they are not in it yet
+        self.__admitted = 0
+        self.__changed = Condition()
+        self.__interval = None
+
+    def start(self):
+        if self.__interval is None:
+            self.__interval = setInterval(BANDWIDTH_INTERVAL, self.__tick)
+
+    def __sample(self):
+        """Task speeds summed the way the status message does"""
+        engines = {}
+        other_dl = up_speed = uploads = 0
+        for download in list(download_dict.values()):
+            try:
+                tstatus = download.status()
+                speed = get_task_speed(download, tstatus)
+                if tstatus == MirrorStatus.STATUS_DOWNLOADING:
+                    if isinstance(download, Aria2Status):
+                        engines[("aria2", download.gid())] = speed
+                    elif isinstance(download, QbittorrentStatus):
+                        engines[("qbit", download.hash())] = speed
+                    else:
+                        other_dl += speed
+                elif tstatus == MirrorStatus.STATUS_UPLOADING:
+                    up_speed += speed
+                    uploads += 1
+                elif tstatus == MirrorStatus.STATUS_SEEDING:
+                    up_speed += speed
+            except Exception:
+                continue
+        return engines, other_dl, up_speed, uploads
+
+    def __demand(self, key, speed):
+        if not (limit := self.__limits.get(key)) or speed >= limit * LIMIT_SATURATION:
+            return None
+        return max(speed * LIMIT_HEADROOM, MIN_TASK_LIMIT)
+
+    async def __set_limit(self, key, limit):
+        engine, id_ = key
+        if engine == "aria2":
+            await sync_to_async(
+                aria2.client.change_option, id_, {"max-download-limit": f"{limit}"}
+            )
+        else:
+            await sync_to_async(
+                qb_state.client.torrents_set_download_limit,
+                limit=limit or -1,
+                torrent_hashes=id_,
+            )
+
+    async def __balance(self):
+        if not (target := link_target()):
+            # lift the limits left from before LINK_SPEED was cleared
+            for key in list(self.__limits):
+                del self.__limits[key]
+                await self.__set_limit(key, 0)
+            self.__up_speed = self.__uploads = 0
+            return
+        engines, other_dl, self.__up_speed, self.__uploads = self.__sample()
+        for key in list(self.__limits):
+            if key not in engines:
+                del self.__limits[key]
+        if not engines:
+            return
+        budget = max(target - other_dl, MIN_TASK_LIMIT * len(engines))
+        shares = fair_shares(
+            {key: self.__demand(key, speed) for key, speed in engines.items()},
+            budget,
+        )
+        for key, share in shares.items():
+            limit = max(int(share), MIN_TASK_LIMIT)
+            if (old := self.__limits.get(key)) and abs(limit - old) <= (
+                old * LIMIT_TOLERANCE
+            ):
+                continue
+            await self.__set_limit(key, limit)
+            self.__limits[key] = limit
+
+    async def __tick(self):
+        try:
+            await self.__balance()
+        except Exception as e:
+            LOGGER.error(f"Bandwidth control failed: {e}")
+        async with self.__changed:
+            self.__admitted = 0
+            self.__changed.notify_all()
+
+    def __upload_room(self):
+        if not (target := link_target()):
+            return True
+        if not self.__uploads:
+            # nothing to take an average from, one new upload per sample
+            return not self.__admitted
+        average = self.__up_speed / self.__uploads
+        return self.__up_speed + (self.__admitted + 1) * average <= target
+
+    async def admit_upload(self, wait=True):
+        """Reserves room for one more upload in the upload direction, waits for
+        it unless wait is False, then returns if there was room"""
+        async with self.__changed:
+            if not self.__upload_room():
+                if not wait:
+                    return False
+                await self.__changed.wait_for(self.__upload_room)
+            if link_target():
+                self.__admitted += 1
+            return True
+
+
+bandwidth = BandwidthController()
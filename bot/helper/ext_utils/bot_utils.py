@@ -29,6 +29,7 @@ from asyncio import (
     create_subprocess_shell,
     run_coroutine_threadsafe,
     sleep,
+    gather,
 )
 from asyncio.subprocess import PIPE
 from functools import partial, wraps
@@ -158,14 +159,15 @@ def bt_selection_buttons(id_):
 
 
 async def get_telegraph_list(telegraph_content):
-    path = [
-        (
-            await telegraph.create_page(
+    pages = await gather(
+        *[
+            telegraph.create_page(
                 title=f"{config_dict['TITLE_NAME']} Drive Search", content=content
             )
-        )["path"]
-        for content in telegraph_content
-    ]
+            for content in telegraph_content
+        ]
+    )
+    path = [page["path"] for page in pages]
     if len(path) > 1:
         await telegraph.edit_telegraph(path, telegraph_content)
     buttons = ButtonMaker()
@@ -254,6 +256,135 @@ class EngineStatus:
         self.STATUS_RCLONE = f"RClone {version_cache['rclone']}"
 
 
+def speed_string_to_bytes(spd):
+    if "K" in spd:
+        return float(spd.split("K")[0]) * 1024
+    elif "M" in spd:
+        return float(spd.split("M")[0]) * 1048576
+    elif "G" in spd:
+        return float(spd.split("G")[0]) * 1073741824
+    elif "T" in spd:
+        return float(spd.split("T")[0]) * 1099511627776
+    else:
+        return 0
+
+
+def get_task_speed(download, tstatus):
+    if tstatus == MirrorStatus.STATUS_SEEDING:
+        if hasattr(download, "upload_speed_raw"):
+            return download.upload_speed_raw()
+        return speed_string_to_bytes(download.upload_speed())
+    if hasattr(download, "speed_raw"):
+        return download.speed_raw()
+    return speed_string_to_bytes(download.speed())
+
+
+# uid -> (sampled values, rendered fragment split around the elapsed time) of
+# the tasks shown last tick, the elapsed time changes every tick and is
+# rendered between the two parts
+status_fragments = {}
+
+
+def get_task_fragment(uid, download, tstatus):
+    msg_link = (
+        download.message.link
+        if download.message.chat.type in [ChatType.SUPERGROUP, ChatType.CHANNEL]
+        and not config_dict["DELETE_LINKS"]
+        else ""
+    )
+    elapsed = time() - download.message.date.timestamp()
+    name = (
+        "Task is being Processed!"
+        if config_dict["SAFE_MODE"] and elapsed >= config_dict["STATUS_UPDATE_INTERVAL"]
+        else escape(f"{download.name()}")
+    )
+    eng = download.eng()
+    # every status method is sampled once per tick
+    if tstatus not in [
+        MirrorStatus.STATUS_SPLITTING,
+        MirrorStatus.STATUS_SEEDING,
+    ]:
+        peers = ()
+        if hasattr(download, "seeders_num"):
+            try:
+                peers = (download.seeders_num(), download.leechers_num())
+            except Exception:
+                pass
+        values = (
+            download.progress(),
+            download.processed_bytes(),
+            download.size(),
+            download.eta(),
+            download.speed(),
+            download.upload_details["mode"],
+            peers,
+        )
+    elif tstatus == MirrorStatus.STATUS_SEEDING:
+        values = (
+            download.size(),
+            download.upload_speed(),
+            download.uploaded_bytes(),
+            download.ratio(),
+            download.seeding_time(),
+        )
+    else:
+        values = (download.size(),)
+    record = (tstatus, name, msg_link, eng, download.gid(), values)
+    if not (cached := status_fragments.get(uid)) or cached[0] != record:
+        cached = (record, *__render_fragment(record, download))
+        status_fragments[uid] = cached
+    _, head, tail = cached
+    if tail:
+        return head + BotTheme("ELAPSED", Elapsed=get_readable_time(elapsed)) + tail
+    return head
+
+
+def __render_fragment(record, download):
+    """Fragment of record as the text before and after the elapsed time, the
+    second part is empty for statuses that show no elapsed time"""
+    tstatus, name, msg_link, eng, gid, values = record
+    msg = BotTheme("STATUS_NAME", Name=name)
+    head = None
+    if tstatus not in [
+        MirrorStatus.STATUS_SPLITTING,
+        MirrorStatus.STATUS_SEEDING,
+    ]:
+        progress, processed, size, eta, speed, mode, peers = values
+        msg += BotTheme("BAR", Bar=f"{get_progress_bar_string(progress)} {progress}")
+        msg += BotTheme("PROCESSED", Processed=f"{processed} of {size}")
+        msg += BotTheme("STATUS", Status=tstatus, Url=msg_link)
+        msg += BotTheme("ETA", Eta=eta)
+        msg += BotTheme("SPEED", Speed=speed)
+        head, msg = msg, ""
+        msg += BotTheme("ENGINE", Engine=eng)
+        msg += BotTheme("STA_MODE", Mode=mode)
+        if peers:
+            msg += BotTheme("SEEDERS", Seeders=peers[0])
+            msg += BotTheme("LEECHERS", Leechers=peers[1])
+    elif tstatus == MirrorStatus.STATUS_SEEDING:
+        size, speed, uploaded, ratio, seeding_time = values
+        msg += BotTheme("STATUS", Status=tstatus, Url=msg_link)
+        msg += BotTheme("SEED_SIZE", Size=size)
+        msg += BotTheme("SEED_SPEED", Speed=speed)
+        msg += BotTheme("UPLOADED", Upload=uploaded)
+        msg += BotTheme("RATIO", Ratio=ratio)
+        msg += BotTheme("TIME", Time=seeding_time)
+        msg += BotTheme("SEED_ENGINE", Engine=eng)
+    else:
+        msg += BotTheme("STATUS", Status=tstatus, Url=msg_link)
+        msg += BotTheme("STATUS_SIZE", Size=values[0])
+        msg += BotTheme("NON_ENGINE", Engine=eng)
+
+    msg += BotTheme("USER", User=download.message.from_user.mention(style="html"))
+    msg += BotTheme("ID", Id=download.message.from_user.id)
+    if eng.startswith("qBit"):
+        msg += BotTheme("BTSEL", Btsel=f"/{BotCommands.BtSelectCommand}_{gid}")
+    msg += BotTheme("CANCEL", Cancel=f"/{BotCommands.CancelMirror}_{gid}")
+    if head is None:
+        return msg, ""
+    return head, msg
+
+
 def get_readable_message():
     msg = ""
     button = None
@@ -263,107 +394,28 @@ def get_readable_message():
     if PAGE_NO > PAGES and PAGES != 0:
         globals()["STATUS_START"] = STATUS_LIMIT * (PAGES - 1)
         globals()["PAGE_NO"] = PAGES
-    for download in list(download_dict.values())[
-        STATUS_START : STATUS_LIMIT + STATUS_START
-    ]:
-        msg_link = (
-            download.message.link
-            if download.message.chat.type in [ChatType.SUPERGROUP, ChatType.CHANNEL]
-            and not config_dict["DELETE_LINKS"]
-            else ""
-        )
-        elapsed = time() - download.message.date.timestamp()
-        msg += BotTheme(
-            "STATUS_NAME",
-            Name=(
-                "Task is being Processed!"
-                if config_dict["SAFE_MODE"]
-                and elapsed >= config_dict["STATUS_UPDATE_INTERVAL"]
-                else escape(f"{download.name()}")
-            ),
-        )
-        if download.status() not in [
-            MirrorStatus.STATUS_SPLITTING,
-            MirrorStatus.STATUS_SEEDING,
-            MirrorStatus.STATUS_METADATA,
-        ]:
-            msg += BotTheme(
-                "BAR",
-                Bar=f"{get_progress_bar_string(download.progress())} {download.progress()}",
-            )
-            msg += BotTheme(
-                "PROCESSED",
-                Processed=f"{download.processed_bytes()} of {download.size()}",
-            )
-            msg += BotTheme("STATUS", Status=download.status(), Url=msg_link)
-            msg += BotTheme("ETA", Eta=download.eta())
-            msg += BotTheme("SPEED", Speed=download.speed())
-            msg += BotTheme("ELAPSED", Elapsed=get_readable_time(elapsed))
-            msg += BotTheme("ENGINE", Engine=download.eng())
-            msg += BotTheme("STA_MODE", Mode=download.upload_details["mode"])
-            if hasattr(download, "seeders_num"):
-                try:
-                    msg += BotTheme("SEEDERS", Seeders=download.seeders_num())
-                    msg += BotTheme("LEECHERS", Leechers=download.leechers_num())
-                except Exception:
-                    pass
-        elif download.status() == MirrorStatus.STATUS_SEEDING:
-            msg += BotTheme("STATUS", Status=download.status(), Url=msg_link)
-            msg += BotTheme("SEED_SIZE", Size=download.size())
-            msg += BotTheme("SEED_SPEED", Speed=download.upload_speed())
-            msg += BotTheme("UPLOADED", Upload=download.uploaded_bytes())
-            msg += BotTheme("RATIO", Ratio=download.ratio())
-            msg += BotTheme("TIME", Time=download.seeding_time())
-            msg += BotTheme("SEED_ENGINE", Engine=download.eng())
-        else:
-            msg += BotTheme("STATUS", Status=download.status(), Url=msg_link)
-            msg += BotTheme("STATUS_SIZE", Size=download.size())
-            msg += BotTheme("NON_ENGINE", Engine=download.eng())
-
-        msg += BotTheme("USER", User=download.message.from_user.mention(style="html"))
-        msg += BotTheme("ID", Id=download.message.from_user.id)
-        if (download.eng()).startswith("qBit"):
-            msg += BotTheme(
-                "BTSEL", Btsel=f"/{BotCommands.BtSelectCommand}_{download.gid()}"
-            )
-        msg += BotTheme(
-            "CANCEL", Cancel=f"/{BotCommands.CancelMirror}_{download.gid()}"
-        )
-
-    if len(msg) == 0:
-        return None, None
-
-    dl_speed = 0
-
-    def convert_speed_to_bytes_per_second(spd):
-        if "K" in spd:
-            return float(spd.split("K")[0]) * 1024
-        elif "M" in spd:
-            return float(spd.split("M")[0]) * 1048576
-        elif "G" in spd:
-            return float(spd.split("G")[0]) * 1073741824
-        elif "T" in spd:
-            return float(spd.split("T")[0]) * 1099511627776
-        else:
-            return 0
 
     dl_speed = 0
     up_speed = 0
-    for download in download_dict.values():
+    shown = set()
+    for index, (uid, download) in enumerate(list(download_dict.items())):
         tstatus = download.status()
-        spd = (
-            download.speed()
-            if tstatus != MirrorStatus.STATUS_SEEDING
-            else download.upload_speed()
-        )
-        speed_in_bytes_per_second = convert_speed_to_bytes_per_second(spd)
         if tstatus == MirrorStatus.STATUS_DOWNLOADING:
-            dl_speed += speed_in_bytes_per_second
+            dl_speed += get_task_speed(download, tstatus)
         elif tstatus in [
             MirrorStatus.STATUS_UPLOADING,
             MirrorStatus.STATUS_SEEDING,
         ]:
-            up_speed += speed_in_bytes_per_second
+            up_speed += get_task_speed(download, tstatus)
+        if STATUS_START <= index < STATUS_LIMIT + STATUS_START:
+            msg += get_task_fragment(uid, download, tstatus)
+            shown.add(uid)
+    for uid in list(status_fragments):
+        if uid not in shown:
+            del status_fragments[uid]
+
+    if len(msg) == 0:
+        return None, None
 
     msg += BotTheme("FOOTER")
     buttons = ButtonMaker()
@@ -383,11 +435,12 @@ def get_readable_message():
         buttons.ibutton(BotTheme("REFRESH", Page=f"{PAGE_NO}/{PAGES}"), "status ref")
         buttons.ibutton(BotTheme("NEXT"), "status nex")
     button = buttons.build_menu(3)
+    disk = disk_usage(config_dict["DOWNLOAD_DIR"])
     msg += BotTheme("Cpu", cpu=cpu_percent())
     msg += BotTheme(
         "FREE",
-        free=get_readable_file_size(disk_usage(config_dict["DOWNLOAD_DIR"]).free),
-        free_p=round(100 - disk_usage(config_dict["DOWNLOAD_DIR"]).percent, 1),
+        free=get_readable_file_size(disk.free),
+        free_p=round(100 - disk.percent, 1),
     )
     msg += BotTheme("Ram", ram=virtual_memory().percent)
     msg += BotTheme("uptime", uptime=get_readable_time(time() - botStartTime))
@@ -629,6 +682,12 @@ async def get_stats(event, key="home"):
         btns.ibutton("OS Stats", f"wzmlx {user_id} stats stsys")
         btns.ibutton("Repo Stats", f"wzmlx {user_id} stats strepo")
         btns.ibutton("Bot Limits", f"wzmlx {user_id} stats botlimits")
+        if config_dict["USE_SERVICE_ACCOUNTS"]:
+            btns.ibutton("SA Usage", f"wzmlx {user_id} stats stsa")
+        if any(
+            config_dict[key] for key in ["QUEUE_ALL", "QUEUE_DOWNLOAD", "QUEUE_UPLOAD"]
+        ):
+            btns.ibutton("Queue Stats", f"wzmlx {user_id} stats stqueue")
         msg = "⌬ <b><i>Bot & OS Statistics!</i></b>"
     elif key == "stbot":
         total, used, free, disk = disk_usage("/")
@@ -746,6 +805,27 @@ async def get_stats(event, key="home"):
             UT=("∞" if (val := config_dict["USER_MAX_TASKS"]) == "" else val),
             BT=("∞" if (val := config_dict["BOT_MAX_TASKS"]) == "" else val),
         )
+    elif key == "stsa":
+        from bot.helper.mirror_utils.upload_utils.gdriveTools import sa_scheduler
+
+        stats = await sync_to_async(sa_scheduler.stats)
+        stats.sort(key=lambda sa: sa["size"], reverse=True)
+        msg = f"⌬ <b><i>Service Accounts Usage (24h)</i></b>\n\n<b>Total:</b> {get_readable_file_size(sum(sa['size'] for sa in stats))} | <b>Exhausted:</b> {sum(1 for sa in stats if sa['exhausted'])}/{len(stats)}\n"
+        for sa in stats[:20]:
+            msg += f"\n<code>{sa['name']}</code>: {get_readable_file_size(sa['size'])}, {sa['copies']} copies"
+            if sa["exhausted"]:
+                msg += f" (exhausted, {get_readable_time(sa['exhausted'])} left)"
+    elif key == "stqueue":
+        from bot.helper.ext_utils.task_manager import queued_dl, queued_up
+
+        msg = "⌬ <b><i>Task Queue</i></b>\n"
+        for title, queue in [("Download", queued_dl), ("Upload", queued_up)]:
+            stats = queue.stats()
+            msg += (
+                f"\n<b>{title}:</b> {stats['queued']} tasks of {stats['users']} users"
+            )
+            msg += f"\n┠ <b>Oldest:</b> {get_readable_time(stats['oldest']) or '0s'}"
+            msg += f"\n┖ <b>Wait:</b> {get_readable_time(stats['avg_wait']) or '0s'} avg, {get_readable_time(stats['max_wait']) or '0s'} max\n"
     btns.ibutton("Close", f"wzmlx {user_id} close")
     return msg, btns.build_menu(2)
 
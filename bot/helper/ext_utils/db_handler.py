@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 from aiofiles.os import path as aiopath, makedirs
 from aiofiles import open as aiopen
+from asyncio import sleep
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, DeleteMany, UpdateMany
 from pymongo.errors import PyMongoError
 from dotenv import dotenv_values
 
@@ -19,6 +21,12 @@ from bot import (
 
 
 class DbManger:
+    # one client (and connection pool) for the whole process
+    __client = None
+    # write-behind queue: {(collection, _id)}, flushed by a single task
+    __pending = set()
+    __flush_task = None
+
     def __init__(self):
         self.__err = False
         self.__db = None
@@ -27,7 +35,12 @@ class DbManger:
 
     def __connect(self):
         try:
-            self.__conn = AsyncIOMotorClient(DATABASE_URL)
+            if DbManger.__client is None:
+                options = {}
+                if "maxpoolsize" not in DATABASE_URL.lower():
+                    options["maxPoolSize"] = 20
+                DbManger.__client = AsyncIOMotorClient(DATABASE_URL, **options)
+            self.__conn = DbManger.__client
             self.__db = (
                 self.__conn.wzmlx
             )  # New Section for not conflicting with mltb section !!
@@ -35,6 +48,42 @@ class DbManger:
             LOGGER.error(f"Error in DB connection: {e}")
             self.__err = True
 
+    def __write_behind(self, collection, _id):
+        if not (delay := config_dict["DATABASE_WRITE_DELAY"]):
+            return False
+        DbManger.__pending.add((collection, _id))
+        if DbManger.__flush_task is None or DbManger.__flush_task.done():
+            DbManger.__flush_task = bot_loop.create_task(self.__flush_later(delay))
+        return True
+
+    async def __flush_later(self, delay):
+        await sleep(delay)
+        await self.flush_writes()
+
+    async def flush_writes(self):
+        if self.__err or not DbManger.__pending:
+            return
+        pending, DbManger.__pending = DbManger.__pending, set()
+        ops = {"users": [], "rss": []}
+        # the latest in-memory state is written, so repeated updates merge
+        for collection, _id in pending:
+            if collection == "users":
+                if (data := user_data.get(_id)) is None:
+                    continue
+                data.pop("thumb", None)
+                data.pop("rclone", None)
+            elif (data := rss_dict.get(_id)) is None:
+                continue
+            ops[collection].append(ReplaceOne({"_id": _id}, data, upsert=True))
+        for collection, requests in ops.items():
+            if not requests:
+                continue
+            try:
+                await self.__db[collection][bot_id].bulk_write(requests, ordered=False)
+            except PyMongoError as e:
+                LOGGER.error(f"Error while flushing {collection} writes: {e}")
+        self.__conn.close
+
     async def db_load(self):
         if self.__err:
             return
@@ -137,7 +186,7 @@ class DbManger:
             self.__conn.close
 
     async def update_user_data(self, user_id):
-        if self.__err:
+        if self.__err or self.__write_behind("users", user_id):
             return
         data = user_data[user_id]
         if data.get("thumb"):
@@ -150,6 +199,9 @@ class DbManger:
     async def update_user_doc(self, user_id, key, path=""):
         if self.__err:
             return
+        if ("users", user_id) in DbManger.__pending:
+            # a queued replace would drop this field again
+            await self.flush_writes()
         if path:
             async with aiopen(path, "rb+") as doc:
                 doc_bin = await doc.read()
@@ -189,7 +241,7 @@ class DbManger:
         self.__conn.close
 
     async def rss_update(self, user_id):
-        if self.__err:
+        if self.__err or self.__write_behind("rss", user_id):
             return
         await self.__db.rss[bot_id].replace_one(
             {"_id": user_id}, rss_dict[user_id], upsert=True
@@ -241,9 +293,192 @@ class DbManger:
         self.__conn.close
         return notifier_dict  # return a dict ==> {cid: {tag: [{_id: source}, {_id, source}, ...]}}
 
+    @staticmethod
+    def __index_doc(drive_id, file, ancestors):
+        return {
+            "_id": f"{drive_id}/{file['id']}",
+            "drive": drive_id,
+            "id": file["id"],
+            "name": file.get("name"),
+            "mimeType": file.get("mimeType"),
+            "size": int(file.get("size", 0)),
+            "parent": (file.get("parents") or [None])[0],
+            # folders from below the root down to the parent, a folder that
+            # leaves the tree takes every item listing it along
+            "ancestors": ancestors,
+            "folder": file.get("mimeType") == "application/vnd.google-apps.folder",
+        }
+
+    @staticmethod
+    def __resolve_lineage(files, lineage):
+        """Adds every file that hangs below a folder of lineage (id -> ancestors
+        and the id itself) to it, the others are left out"""
+        parent_of = {file["id"]: (file.get("parents") or [None])[0] for file in files}
+        for file_id in parent_of:
+            chain = []
+            while file_id not in lineage and file_id in parent_of:
+                chain.append(file_id)
+                file_id = parent_of[file_id]
+                if len(chain) > len(parent_of):
+                    # a parent loop, can only happen within a batch of changes
+                    break
+            if file_id not in lineage:
+                continue
+            path = lineage[file_id]
+            for item in reversed(chain):
+                path = lineage[item] = path + [item]
+
+    @staticmethod
+    def __drop_subtree(drive_id, folder_id):
+        return DeleteMany(
+            {"drive": drive_id, "$or": [{"id": folder_id}, {"ancestors": folder_id}]}
+        )
+
+    @staticmethod
+    def __move_subtree(drive_id, folder_id, path):
+        """Replaces everything up to folder_id in the ancestors below it by path"""
+        rest = {
+            "$slice": [
+                "$ancestors",
+                {"$add": [{"$indexOfArray": ["$ancestors", folder_id]}, 1]},
+                {"$size": "$ancestors"},
+            ]
+        }
+        return UpdateMany(
+            {"drive": drive_id, "ancestors": folder_id},
+            [{"$set": {"ancestors": {"$concatArrays": [path, rest]}}}],
+        )
+
+    async def get_drive_index_state(self):
+        if self.__err:
+            return {}
+        state = {
+            doc["_id"]: doc
+            async for doc in self.__db.drive_index_state[bot_id].find({})
+        }
+        self.__conn.close
+        return state
+
+    async def rebuild_drive_index(
+        self, drive_id, root_id, files, page_token, version, account
+    ):
+        if self.__err:
+            return
+        coll = self.__db.drive_index[bot_id]
+        await coll.delete_many({"drive": drive_id})
+        lineage = {root_id: []}
+        self.__resolve_lineage(files, lineage)
+        docs = [
+            self.__index_doc(
+                drive_id, file, lineage.get((file.get("parents") or [None])[0], [])
+            )
+            for file in files
+        ]
+        for i in range(0, len(docs), 1000):
+            await coll.insert_many(docs[i : i + 1000], ordered=False)
+        await coll.create_index([("drive", 1), ("name", 1)])
+        await coll.create_index([("drive", 1), ("id", 1)])
+        await coll.create_index([("drive", 1), ("ancestors", 1)])
+        await self.__db.drive_index_state[bot_id].replace_one(
+            {"_id": drive_id},
+            {
+                "root": root_id,
+                "token": page_token,
+                "version": version,
+                "account": account,
+            },
+            upsert=True,
+        )
+        self.__conn.close
+
+    async def update_drive_index(self, drive_id, root_id, changed, removed, page_token):
+        if self.__err:
+            return
+        coll = self.__db.drive_index[bot_id]
+        drops = [self.__drop_subtree(drive_id, file_id) for file_id in removed]
+        writes = []
+        moves = []
+        if changed:
+            ids = {file["id"] for file in changed}
+            parents = {file["parents"][0] for file in changed if file.get("parents")}
+            lineage = {root_id: []}
+            old = {}
+            async for doc in coll.find(
+                {"drive": drive_id, "id": {"$in": list(parents | ids)}},
+                {"id": 1, "ancestors": 1},
+            ):
+                if doc["id"] in ids:
+                    old[doc["id"]] = doc.get("ancestors")
+                else:
+                    lineage[doc["id"]] = doc.get("ancestors", []) + [doc["id"]]
+            # keep items whose parent is in this drive, new folders included
+            self.__resolve_lineage(changed, lineage)
+            for file in changed:
+                if file["id"] not in lineage:
+                    drops.append(self.__drop_subtree(drive_id, file["id"]))
+                    continue
+                ancestors = lineage[file["id"]][:-1]
+                writes.append(
+                    ReplaceOne(
+                        {"_id": f"{drive_id}/{file['id']}"},
+                        self.__index_doc(drive_id, file, ancestors),
+                        upsert=True,
+                    )
+                )
+                if (
+                    file.get("mimeType") == "application/vnd.google-apps.folder"
+                    and file["id"] in old
+                    and old[file["id"]] != ancestors
+                ):
+                    # items below a moved folder get its new path in front
+                    moves.append(
+                        self.__move_subtree(drive_id, file["id"], lineage[file["id"]])
+                    )
+        if ops := drops + writes + moves:
+            # in this order, a drop must not remove what the batch wrote again
+            await coll.bulk_write(ops, ordered=True)
+        if page_token:
+            await self.__db.drive_index_state[bot_id].update_one(
+                {"_id": drive_id}, {"$set": {"token": page_token}}, upsert=True
+            )
+        self.__conn.close
+
+    async def search_drive_index(self, drive_id, query, limit):
+        if self.__err:
+            return []
+        cursor = (
+            self.__db.drive_index[bot_id]
+            .find({"drive": drive_id, **query})
+            .sort([("folder", -1), ("name", 1)])
+            .limit(limit)
+        )
+        docs = [doc async for doc in cursor]
+        self.__conn.close
+        return docs
+
+    async def get_drive_index_parents(self, drive_id, parent_ids):
+        parents = {}
+        if self.__err:
+            return parents
+        coll = self.__db.drive_index[bot_id]
+        pending = set(parent_ids)
+        while pending:
+            cursor = coll.find(
+                {"drive": drive_id, "id": {"$in": list(pending)}},
+                {"id": 1, "name": 1, "parent": 1},
+            )
+            pending = set()
+            async for doc in cursor:
+                parents[doc["id"]] = (doc["name"], doc["parent"])
+                if doc["parent"] and doc["parent"] not in parents:
+                    pending.add(doc["parent"])
+        self.__conn.close
+        return parents
+
     async def trunc_table(self, name):
         if self.__err:
             return
+        DbManger.__pending = {item for item in DbManger.__pending if item[0] != name}
         await self.__db[name][bot_id].drop()
         self.__conn.close
 
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+from re import escape
+from asyncio import Lock, gather
+
+from bot import DATABASE_URL, LOGGER, bot_loop, config_dict, list_drives_dict
+from bot.helper.ext_utils.bot_utils import setInterval, sync_to_async
+from bot.helper.ext_utils.db_handler import DbManger
+from bot.helper.mirror_utils.upload_utils.gdriveTools import (
+    GoogleDriveHelper,
+    folder_cache,
+)
+
+INDEX_REFRESH_INTERVAL = 300
+# indexes built by an older layout are crawled again
+INDEX_VERSION = 2
+index_lock = Lock()
+index_roots = {}
+index_interval = []
+
+
+def __drive_ids():
+    return list(dict.fromkeys(d["drive_id"] for d in list_drives_dict.values()))
+
+
+async def __sync_drive(drive_id, state):
+    drive = GoogleDriveHelper()
+    account = drive.use_account(state.get("account"))
+    if (
+        not (token := state.get("token"))
+        or state.get("version") != INDEX_VERSION
+        or account is None
+    ):
+        # a token without its account can not be read, crawl with a fixed one
+        account = account or drive.use_account()
+        LOGGER.info(f"Building Drive index: {drive_id}")
+        # take the token first so changes made while crawling are not lost
+        token = await sync_to_async(drive.get_index_token, drive_id)
+        root_id, files = await sync_to_async(drive.crawl_drive, drive_id)
+        await DbManger().rebuild_drive_index(
+            drive_id, root_id, files, token, INDEX_VERSION, account
+        )
+        LOGGER.info(f"Drive index built: {drive_id} ({len(files)} items)")
+    else:
+        root_id = state["root"]
+        changed, removed, token = await sync_to_async(
+            drive.get_index_changes, drive_id, token
+        )
+        if changed or removed:
+            await DbManger().update_drive_index(
+                drive_id, root_id, changed, removed, token
+            )
+        elif token != state["token"]:
+            await DbManger().update_drive_index(drive_id, root_id, [], [], token)
+    index_roots[drive_id] = root_id
+
+
+async def refresh_drive_index():
+    if not config_dict["DRIVE_INDEX"]:
+        index_roots.clear()
+        return
+    async with index_lock:
+        state = await DbManger().get_drive_index_state()
+        for drive_id in __drive_ids():
+            try:
+                await __sync_drive(drive_id, state.get(drive_id, {}))
+            except Exception as e:
+                LOGGER.error(f"Drive index sync failed for {drive_id}: {e}")
+                index_roots.pop(drive_id, None)
+
+
+async def start_drive_index():
+    if not DATABASE_URL or index_interval:
+        return
+    index_interval.append(setInterval(INDEX_REFRESH_INTERVAL, refresh_drive_index))
+    if config_dict["DRIVE_INDEX"]:
+        # the first crawl can take long, startup goes on without it and searches
+        # use the API until a drive is indexed
+        bot_loop.create_task(refresh_drive_index())
+
+
+def __index_query(name, stopDup, itemType, parent):
+    if stopDup:
+        query = {"name": name}
+    else:
+        query = {}
+        if words := [
+            {"name": {"$regex": escape(word), "$options": "i"}} for word in name.split()
+        ]:
+            query["$and"] = words
+        if itemType == "files":
+            query["folder"] = False
+        elif itemType == "folders":
+            query["folder"] = True
+    if parent:
+        query["parent"] = parent
+    return query
+
+
+async def __search_drive(drive_id, name, stopDup, isRecursive, itemType):
+    root_id = index_roots[drive_id]
+    isRecur = False if isRecursive and len(drive_id) > 23 else isRecursive
+    docs = await DbManger().search_drive_index(
+        drive_id,
+        __index_query(name, stopDup, itemType, None if isRecur else root_id),
+        200 if drive_id == "root" else 150,
+    )
+    files = [
+        {
+            "id": doc["id"],
+            "name": doc["name"],
+            "mimeType": doc["mimeType"],
+            "size": doc["size"],
+            "parents": [doc["parent"]] if doc["parent"] else [],
+        }
+        for doc in docs
+    ]
+    if isRecur and files:
+        parents = await DbManger().get_drive_index_parents(
+            drive_id, {file["parents"][0] for file in files if file["parents"]}
+        )
+        for folder_id, (folder_name, parent) in parents.items():
+            folder_cache.set(root_id, folder_id, folder_name, parent)
+    return drive_id, (root_id, files)
+
+
+async def search_drive_index(name, stopDup=False, isRecursive=True, itemType=""):
+    """Local drive_list results for every indexed drive, {} when unavailable"""
+    if not config_dict["DRIVE_INDEX"] or not DATABASE_URL or not name:
+        return {}
+    drives = [drive_id for drive_id in __drive_ids() if drive_id in index_roots]
+    try:
+        return dict(
+            await gather(
+                *[
+                    __search_drive(drive_id, str(name), stopDup, isRecursive, itemType)
+                    for drive_id in drives
+                ]
+            )
+        )
+    except Exception as e:
+        LOGGER.error(f"Drive index search failed: {e}")
+        return {}
+
+
+async def index_uploaded_item(link, name, size, mime_type, dest_id):
+    if (
+        not config_dict["DRIVE_INDEX"]
+        or not DATABASE_URL
+        or dest_id not in index_roots
+        or not isinstance(link, str)
+    ):
+        return
+    try:
+        file_id = GoogleDriveHelper.getIdFromUrl(link)
+    except (KeyError, IndexError):
+        return
+    file = {
+        "id": file_id,
+        "name": name,
+        "mimeType": (
+            "application/vnd.google-apps.folder" if mime_type == "Folder" else mime_type
+        ),
+        "size": size,
+        "parents": [index_roots[dest_id]],
+    }
+    await DbManger().update_drive_index(dest_id, index_roots[dest_id], [file], [], None)
@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
-from os import walk, path as ospath
-from aiofiles.os import remove as aioremove, path as aiopath, listdir, rmdir, makedirs
+from os import walk, path as ospath, stat, scandir, remove, rmdir, listdir as oslistdir
+from collections import OrderedDict
+from typing import NamedTuple
+from natsort import natsorted
+from threading import Lock, local
+from aiofiles.os import remove as aioremove, path as aiopath, listdir, makedirs
 from aioshutil import rmtree as aiormtree, move
 from asyncio import create_subprocess_exec
+from contextlib import suppress
 from asyncio.subprocess import PIPE
 from shutil import rmtree, disk_usage
 from magic import Magic
@@ -15,6 +20,41 @@ from .exceptions import NotSupportedExtractionArchive
 from bot import aria2, LOGGER, DOWNLOAD_DIR, get_client, GLOBAL_EXTENSION_FILTER
 from bot.helper.ext_utils.bot_utils import sync_to_async, cmd_exec
 
+# what libmagic reports for these, without reading the file
+MIME_TYPES = {
+    ".mp4": "video/mp4",
+    ".m4v": "video/x-m4v",
+    ".mkv": "video/x-matroska",
+    ".webm": "video/webm",
+    ".avi": "video/x-msvideo",
+    ".mov": "video/quicktime",
+    ".flv": "video/x-flv",
+    ".mp3": "audio/mpeg",
+    ".flac": "audio/flac",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".wav": "audio/x-wav",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".pdf": "application/pdf",
+    ".zip": "application/zip",
+    ".7z": "application/x-7z-compressed",
+    ".rar": "application/x-rar",
+    ".gz": "application/gzip",
+    ".iso": "application/x-iso9660-image",
+    ".json": "application/json",
+    ".html": "text/html",
+    ".txt": "text/plain",
+    ".nfo": "text/plain",
+}
+MIME_CACHE_SIZE = 16384
+mime_cache = OrderedDict()
+mime_cache_lock = Lock()
+magic_local = local()
+
 ARCH_EXT = [
     ".tar.bz2",
     ".tar.gz",
@@ -88,6 +128,9 @@ async def clean_target(path):
 
 
 async def clean_download(path):
+    from bot.helper.ext_utils.leech_utils import drop_probes
+
+    drop_probes(path.rstrip("/"))
     if await aiopath.exists(path):
         LOGGER.info(f"Cleaning Download: {path}")
         try:
@@ -125,44 +168,131 @@ def exit_clean_up(signal, frame):
         sexit(1)
 
 
-async def clean_unwanted(path):
-    LOGGER.info(f"Cleaning unwanted files/folders: {path}")
-    for dirpath, _, files in await sync_to_async(walk, path, topdown=False):
+class TreeSnapshot(NamedTuple):
+    """One scandir pass over a file or folder. files are (dirpath, name, size) in
+    the order the uploaders walk them, filtered is the subset matching
+    GLOBAL_EXTENSION_FILTER, folders are the dirpaths below path"""
+
+    path: str
+    size: int
+    files: tuple
+    folders: tuple
+    filtered: tuple
+
+    @property
+    def file_count(self):
+        return len(self.files) - len(self.filtered)
+
+    def oversized(self, limit):
+        return tuple(f for f in self.files if f[2] > limit)
+
+    def subtree(self, path):
+        path = path.rstrip("/")
+        if path == self.path:
+            return self
+        prefix = f"{path}/"
+
+        def inside(dirpath):
+            return dirpath == path or dirpath.startswith(prefix)
+
+        files = tuple(
+            f for f in self.files if inside(f[0]) or ospath.join(f[0], f[1]) == path
+        )
+        kept = set(files)
+        return TreeSnapshot(
+            path,
+            sum(f[2] for f in files),
+            files,
+            tuple(d for d in self.folders if d.startswith(prefix)),
+            tuple(f for f in self.filtered if f in kept),
+        )
+
+    def listing(self):
+        """{dirpath: (subdir names, file names)} for every folder of the tree"""
+        listing = {self.path: ([], [])}
+        for dirpath in self.folders:
+            listing[dirpath] = ([], [])
+            listing[ospath.dirname(dirpath)][0].append(ospath.basename(dirpath))
+        for dirpath, name, _ in self.files:
+            listing[dirpath][1].append(name)
+        return listing
+
+
+def is_filtered(name):
+    return name.lower().endswith(tuple(GLOBAL_EXTENSION_FILTER))
+
+
+def scan_tree(path):
+    path = path.rstrip("/")
+    if not ospath.isdir(path):
+        dirpath, name = ospath.split(path)
+        entry = (dirpath, name, ospath.getsize(path))
+        return TreeSnapshot(
+            path, entry[2], (entry,), (), (entry,) if is_filtered(name) else ()
+        )
+    tree = {}
+    stack = [path]
+    while stack:
+        dirpath = stack.pop()
+        names = tree[dirpath] = []
+        with scandir(dirpath) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        # like os.walk, symlinked folders are listed but not entered
+                        if not entry.is_symlink():
+                            stack.append(entry.path)
+                        else:
+                            tree[entry.path] = ()
+                        continue
+                    names.append((entry.name, entry.stat().st_size))
+                except FileNotFoundError:
+                    continue
+    files = tuple(
+        (dirpath, name, size)
+        for dirpath in sorted(tree)
+        for name, size in natsorted(tree[dirpath], key=lambda f: f[0])
+    )
+    return TreeSnapshot(
+        path,
+        sum(f[2] for f in files),
+        files,
+        tuple(sorted(d for d in tree if d != path)),
+        tuple(f for f in files if is_filtered(f[1])),
+    )
+
+
+async def get_tree(path):
+    return await sync_to_async(scan_tree, path)
+
+
+def remove_unwanted(path):
+    for dirpath, _, files in walk(path, topdown=False):
         for filee in files:
             if (
                 filee.endswith(".!qB")
                 or filee.endswith(".parts")
                 and filee.startswith(".")
             ):
-                await aioremove(ospath.join(dirpath, filee))
+                remove(ospath.join(dirpath, filee))
         if dirpath.endswith((".unwanted", "splited_files_mltb", "copied_mltb")):
-            await aiormtree(dirpath)
-    for dirpath, _, files in await sync_to_async(walk, path, topdown=False):
-        if not await listdir(dirpath):
-            await rmdir(dirpath)
+            rmtree(dirpath, ignore_errors=True)
+        elif ospath.isdir(dirpath) and not oslistdir(dirpath):
+            rmdir(dirpath)
+
+
+async def clean_unwanted(path):
+    LOGGER.info(f"Cleaning unwanted files/folders: {path}")
+    await sync_to_async(remove_unwanted, path)
 
 
 async def get_path_size(path):
-    if await aiopath.isfile(path):
-        return await aiopath.getsize(path)
-    total_size = 0
-    for root, dirs, files in await sync_to_async(walk, path):
-        for f in files:
-            abs_path = ospath.join(root, f)
-            total_size += await aiopath.getsize(abs_path)
-    return total_size
+    return (await get_tree(path)).size
 
 
 async def count_files_and_folders(path):
-    total_files = 0
-    total_folders = 0
-    for _, dirs, files in await sync_to_async(walk, path):
-        total_files += len(files)
-        for f in files:
-            if f.endswith(tuple(GLOBAL_EXTENSION_FILTER)):
-                total_files -= 1
-        total_folders += len(dirs)
-    return total_folders, total_files
+    tree = await get_tree(path)
+    return len(tree.folders), tree.file_count
 
 
 def get_base_name(orig_path):
@@ -174,9 +304,23 @@ def get_base_name(orig_path):
 
 
 def get_mime_type(file_path):
-    mime = Magic(mime=True)
-    mime_type = mime.from_file(file_path)
-    mime_type = mime_type or "text/plain"
+    """Known extensions first, then libmagic, cached per (inode, mtime)"""
+    if mime_type := MIME_TYPES.get(ospath.splitext(file_path)[1].lower()):
+        return mime_type
+    st = stat(file_path)
+    key = (st.st_dev, st.st_ino, st.st_mtime_ns)
+    with mime_cache_lock:
+        if mime_type := mime_cache.get(key):
+            mime_cache.move_to_end(key)
+            return mime_type
+    # loading the magic database is the slow part, keep one handle per thread
+    if (mime := getattr(magic_local, "mime", None)) is None:
+        mime = magic_local.mime = Magic(mime=True)
+    mime_type = mime.from_file(file_path) or "text/plain"
+    with mime_cache_lock:
+        mime_cache[key] = mime_type
+        while len(mime_cache) > MIME_CACHE_SIZE:
+            mime_cache.popitem(last=False)
     return mime_type
 
 
@@ -225,8 +369,16 @@ async def join_files(path):
 
 
 async def edit_metadata(
-    listener, base_dir: str, media_file: str, outfile: str, metadata: str = ""
+    listener,
+    base_dir: str,
+    media_file: str,
+    outfile: str,
+    metadata: str = "",
+    group=None,
+    progress=None,
 ):
+    """group: ProcessGroup to run in instead of listener.suproc,
+    progress: called with the seconds of output written so far"""
     cmd = [
         bot_cache["pkgs"][2],
         "-hide_banner",
@@ -282,8 +434,23 @@ async def edit_metadata(
         outfile,
         "-y",
     ]
-    listener.suproc = await create_subprocess_exec(*cmd, stderr=PIPE)
-    code = await listener.suproc.wait()
+    if progress is not None:
+        cmd[1:1] = ["-progress", "pipe:1", "-nostats"]
+    proc = await create_subprocess_exec(
+        *cmd, stdout=PIPE if progress is not None else None, stderr=PIPE
+    )
+    if group is None:
+        listener.suproc = proc
+    else:
+        group.add(proc)
+    if progress is not None:
+        async for line in proc.stdout:
+            if line.startswith(b"out_time_us="):
+                with suppress(ValueError):
+                    progress(int(line[12:]) / 1000000)
+    code = await proc.wait()
+    if group is not None:
+        group.discard(proc)
     if code == 0:
         listener.seed = False
         await clean_target(media_file)
@@ -292,6 +459,6 @@ async def edit_metadata(
         await clean_target(outfile)
         LOGGER.error(
             "%s. Changing metadata failed, Path %s",
-            (await listener.suproc.stderr.read()).decode(),
+            (await proc.stderr.read()).decode(),
             media_file,
         )
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+from hashlib import md5, sha1
+from collections import OrderedDict
+from os import stat
+from threading import Lock
+
+try:
+    from xxhash import xxh64
+except ImportError:
+    xxh64 = None
+
+from bot import LOGGER, config_dict, user_data
+from bot.helper.ext_utils.bot_utils import sync_to_async
+
+HASH_BLOCK_SIZE = 8388608
+HASH_CACHE_SIZE = 512
+HASHERS = {"md5": md5, "sha1": sha1}
+if xxh64 is not None:
+    HASHERS["xxh64"] = xxh64
+hash_cache = OrderedDict()
+hash_cache_lock = Lock()
+
+
+def file_version(path):
+    st = stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def caption_hashes(user_id):
+    """Hashes used by the leech caption of user_id, as {name}_hash fields"""
+    user_dict = user_data.get(user_id, {})
+    lcaption = (
+        config_dict["LEECH_FILENAME_CAPTION"]
+        if (val := user_dict.get("lcaption", "")) == ""
+        else val
+    ).lower()
+    return [name for name in HASHERS if f"{{{name}_hash}}" in lcaption]
+
+
+def store_hashes(path, version, hashes):
+    with hash_cache_lock:
+        cached = hash_cache.get(path)
+        if cached is None or cached[0] != version:
+            cached = hash_cache[path] = (version, {})
+        cached[1].update(hashes)
+        hash_cache.move_to_end(path)
+        while len(hash_cache) > HASH_CACHE_SIZE:
+            hash_cache.popitem(last=False)
+        return dict(cached[1])
+
+
+def hash_file(path, names):
+    """Hex digests of path, reading the file once for all names not cached yet"""
+    version = file_version(path)
+    with hash_cache_lock:
+        cached = hash_cache.get(path)
+        known = dict(cached[1]) if cached and cached[0] == version else {}
+    if missing := [name for name in names if name not in known]:
+        hashes = {name: HASHERS[name]() for name in missing}
+        with open(path, "rb") as f:
+            while chunk := f.read(HASH_BLOCK_SIZE):
+                for hash_ in hashes.values():
+                    hash_.update(chunk)
+        digests = {name: hash_.hexdigest() for name, hash_ in hashes.items()}
+        if file_version(path) == version:
+            known = store_hashes(path, version, digests)
+        else:
+            known.update(digests)
+    return {name: known[name] for name in names}
+
+
+async def get_file_hashes(path, names):
+    try:
+        return await sync_to_async(hash_file, path, names)
+    except Exception as e:
+        LOGGER.error(f"Hashing failed: {e}. Path: {path}")
+        return {}
+
+
+class FileHasher:
+    """Hashes a file in the order it is written, reading back only the new bytes
+    while they are still in the page cache"""
+
+    def __init__(self, names):
+        self.__hashes = {name: HASHERS[name]() for name in names if name in HASHERS}
+        self.__offset = 0
+
+    def __bool__(self):
+        return bool(self.__hashes)
+
+    def feed(self, path, end=None):
+        try:
+            with open(path, "rb") as f:
+                f.seek(self.__offset)
+                while end is None or self.__offset < end:
+                    length = HASH_BLOCK_SIZE
+                    if end is not None:
+                        length = min(length, end - self.__offset)
+                    if not (chunk := f.read(length)):
+                        break
+                    for hash_ in self.__hashes.values():
+                        hash_.update(chunk)
+                    self.__offset += len(chunk)
+        except OSError:
+            pass
+
+    def store(self, path):
+        """Remembers the digests for path if the whole file went through feed"""
+        try:
+            version = file_version(path)
+        except OSError:
+            return
+        if self.__hashes and self.__offset == version[0]:
+            store_hashes(
+                path,
+                version,
+                {name: hash_.hexdigest() for name, hash_ in self.__hashes.items()},
+            )
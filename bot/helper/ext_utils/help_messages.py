@@ -461,6 +461,8 @@ default_desp = {
     "COVER_IMAGE": "Cover Image for Telegraph Page. Put Telegraph Photo Link",
     "TITLE_NAME": "Title name for Telegraph pages (while using /list command)",
     "GD_INFO": "Description of file uploaded to gdrive using bot",
+    "GD_CLONE_WORKERS": "Number of parallel copy workers used while cloning a Google Drive folder. 1 clones one file at a time. Default is 1. Int",
+    "GD_UPLOAD_WORKERS": "Number of files uploaded at the same time while mirroring a folder to Google Drive. 1 uploads one file at a time. Default is 1. Int",
     "DELETE_LINKS": "Delete TgLink/Magnet/File on Start of Task to Auto Clean Group. Default is False",
     "EXCEP_CHATS": "Exception Chats which will not use Logging, chat_id separated by space. Str",
     "SAFE_MODE": "Hide Task Name, Source Link and Indexing of Leech Link for Safety Precautions. Default is False",
@@ -486,9 +488,13 @@ default_desp = {
     "LEECH_LOG_ID": "Chat ID to where leeched files would be uploaded. Int. NOTE: Only available for superGroup/channel. Add -100 before channel/superGroup id. In short don't add bot id or your id!",
     "MIRROR_LOG_ID": "Chat ID to where Mirror files would be Send. Int. NOTE: Only available for superGroup/channel. Add -100 before channel/superGroup id. In short don't add bot id or your id!. For Multiple id Separate them by space.",
     "EQUAL_SPLITS": "Split files larger than LEECH_SPLIT_SIZE into equal parts size (Not working with zip cmd). Default is False.",
+    "LEECH_UPLOAD_WORKERS": "Number of files uploaded to Telegram at the same time while leeching. Messages are still posted in file order. 1 uploads one file at a time. Default is 1. Int",
     "EXTENSION_FILTER": "File extensions that won't upload/clone. Separate them by space.",
     "GDRIVE_ID": "This is the Folder/TeamDrive ID of the Google Drive OR root to which you want to upload all the mirrors using google-api-python-client.",
     "INCOMPLETE_TASK_NOTIFIER": "Get incomplete task messages after restart. Require database and superGroup. Default is False",
+    "DATABASE_WRITE_DELAY": "Delay in seconds for user settings and RSS writes to the database. Repeated changes within this time are merged into one bulk write. 0 writes immediately. Default is 0. Int",
+    "ARCHIVE_WORKERS": "Number of archives extracted at the same time, also the number of 7z threads while compressing. 0 uses the number of CPU cores, up to 4. Default is 0. Int",
+    "ARCHIVE_LEVEL": "7z compression level (0-9) for zip tasks. 0 only stores files, higher levels compress using ARCHIVE_WORKERS threads. Default is 0. Int",
     "INDEX_URL": "Refer to https://gitlab.com/ParveenBhadooOfficial/Google-Drive-Index.",
     "IS_TEAM_DRIVE": "Set True if uploading to TeamDrive using google-api-python-client. Default is False",
     "SHOW_MEDIAINFO": "Add Button to Show MediaInfo in Leeched file. Bool",
@@ -510,6 +516,8 @@ default_desp = {
     "QUEUE_ALL": "Number of parallel tasks of downloads and uploads. For example if 20 task added and QUEUE_ALL is 8, then the summation of uploading and downloading tasks are 8 and the rest in queue. Int. NOTE: if you want to fill QUEUE_DOWNLOAD or QUEUE_UPLOAD, then QUEUE_ALL value must be greater than or equal to the greatest one and less than or equal to summation of QUEUE_UPLOAD and QUEUE_DOWNLOAD",
     "QUEUE_DOWNLOAD": "Number of all parallel downloading tasks. Int",
     "QUEUE_UPLOAD": "Number of all parallel uploading tasks. Int",
+    "LINK_SPEED": "Speed of the server link in Mbit/s, each direction. When set, aria2 and qBittorrent downloads get per task speed limits and new uploads wait, so the total traffic stays at LINK_UTILIZATION of it. 0 disables it. Default is 0. Int",
+    "LINK_UTILIZATION": "Share of LINK_SPEED in percent that all tasks together should use. Default is 90. Int",
     "RCLONE_FLAGS": "key:value|key|key|key:value . Check here all RcloneFlags.",
     "RCLONE_PATH": "Default rclone path to which you want to upload all the mirrors using rclone.",
     "RCLONE_SERVE_URL": "Valid URL where the bot is deployed to use rclone serve. Format of URL should be http://myip, where myip is the IP/Domain(public) of your bot or if you have chosen port other than 80 so write it in this format http://myip:port (http and not https)",
@@ -524,6 +532,7 @@ default_desp = {
     "STATUS_LIMIT": "Limit the no. of tasks shown in status message with buttons. Default is 10. NOTE: Recommended limit is 4 tasks.",
     "STATUS_UPDATE_INTERVAL": "Time in seconds after which the progress/status message will be updated. Recommended 10 seconds at least.",
     "STOP_DUPLICATE": "Bot will check file/folder name in Drive incase uploading to GDRIVE_ID. If it's present in Drive then downloading or cloning will be stopped. (NOTE: Item will be checked using name and not hash, so this feature is not perfect yet). Default is False",
+    "DRIVE_INDEX": "Keep a local index of GDRIVE_ID and drive list names in the database so STOP_DUPLICATE and list searches don't query Drive. Refreshed every 5 minutes from Drive changes. Requires DATABASE_URL. Default is False",
     "SUDO_USERS": "Fill user_id of users whom you want to give sudo permission. Separate them by space. Int",
     "TELEGRAM_API": "This is to authenticate your Telegram account for downloading Telegram files. You can get this from https://my.telegram.org.",
     "TELEGRAM_HASH": "This is to authenticate your Telegram account for downloading Telegram files. You can get this from https://my.telegram.org.",
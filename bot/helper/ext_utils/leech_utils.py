@@ -1,10 +1,18 @@
-from hashlib import md5
+from json import loads
+from collections import OrderedDict
 from time import strftime, gmtime, time
-from re import sub as re_sub, search as re_search
+from re import sub as re_sub, search as re_search, findall as re_findall
 from shlex import split as ssplit
 from natsort import natsorted
-from os import path as ospath
-from aiofiles.os import remove as aioremove, path as aiopath, mkdir, makedirs, listdir
+from os import path as ospath, sendfile, cpu_count
+from aiofiles.os import (
+    remove as aioremove,
+    path as aiopath,
+    mkdir,
+    makedirs,
+    listdir,
+    stat as aiostat,
+)
 from aioshutil import rmtree as aiormtree
 from contextlib import suppress
 from asyncio import create_subprocess_exec, create_task, gather, Semaphore
@@ -20,32 +28,80 @@ from bot.helper.ext_utils.bot_utils import (
     get_readable_file_size,
     get_readable_time,
 )
-from bot.helper.ext_utils.fs_utils import ARCH_EXT, get_mime_type
+from bot.helper.ext_utils.archive_utils import ProcessGroup, archive_workers
+from bot.helper.ext_utils.fs_utils import (
+    ARCH_EXT,
+    get_mime_type,
+    edit_metadata,
+    check_storage_threshold,
+)
+from bot.helper.ext_utils.hash_utils import (
+    HASHERS,
+    FileHasher,
+    caption_hashes,
+    get_file_hashes,
+)
 from bot.helper.ext_utils.telegraph_helper import telegraph
 
+PROBE_CACHE_SIZE = 256
+THUMB_CACHE_SIZE = 64
+SPLIT_WORKERS = min(cpu_count() or 1, 4)
+probe_cache = OrderedDict()
+thumb_cache = OrderedDict()
+ss_stats = {"runs": 0, "frames": 0, "seconds": 0.0}
+
+
+async def probe_media(path):
+    """ffprobe format and streams of path, probed once per (size, mtime) of the file"""
+    try:
+        st = await aiostat(path)
+    except OSError:
+        probe_cache.pop(path, None)
+        raise
+    key = (st.st_size, st.st_mtime_ns)
+    if (cached := probe_cache.get(path)) and cached[0] == key:
+        probe_cache.move_to_end(path)
+        return cached[1]
+    stdout, stderr, _ = await cmd_exec(
+        [
+            "ffprobe",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            path,
+        ]
+    )
+    if stderr:
+        LOGGER.warning(f"FFprobe: {stderr}. Path: {path}")
+    try:
+        result = loads(stdout)
+    except ValueError:
+        result = {}
+    probe_cache[path] = (key, result)
+    probe_cache.move_to_end(path)
+    while len(probe_cache) > PROBE_CACHE_SIZE:
+        probe_cache.popitem(last=False)
+    return result
+
+
+def drop_probes(path):
+    for cached in [p for p in probe_cache if p == path or p.startswith(f"{path}/")]:
+        del probe_cache[cached]
+
 
 async def is_multi_streams(path):
     try:
-        result = await cmd_exec(
-            [
-                "ffprobe",
-                "-hide_banner",
-                "-loglevel",
-                "error",
-                "-print_format",
-                "json",
-                "-show_streams",
-                path,
-            ]
-        )
-        if res := result[1]:
-            LOGGER.warning(f"Get Video Streams: {res}")
+        result = await probe_media(path)
     except Exception as e:
         LOGGER.error(f"Get Video Streams: {e}. Mostly File not found!")
         return False
-    fields = eval(result[0]).get("streams")
+    fields = result.get("streams")
     if fields is None:
-        LOGGER.error(f"get_video_streams: {result}")
+        LOGGER.error(f"get_video_streams: {path}")
         return False
     videos = 0
     audios = 0
@@ -59,28 +115,13 @@ async def is_multi_streams(path):
 
 async def get_media_info(path, metadata=False):
     try:
-        result = await cmd_exec(
-            [
-                "ffprobe",
-                "-hide_banner",
-                "-loglevel",
-                "error",
-                "-print_format",
-                "json",
-                "-show_format",
-                "-show_streams",
-                path,
-            ]
-        )
-        if res := result[1]:
-            LOGGER.warning(f"Media Info FF: {res}")
+        ffresult = await probe_media(path)
     except Exception as e:
         LOGGER.error(f"Media Info: {e}. Mostly File not found!")
         return (0, "", "", "") if metadata else (0, None, None)
-    ffresult = eval(result[0])
     fields = ffresult.get("format")
     if fields is None:
-        LOGGER.error(f"Media Info Sections: {result}")
+        LOGGER.error(f"Media Info Sections: {path}")
         return (0, "", "", "") if metadata else (0, None, None)
     duration = round(float(fields.get("duration", 0)))
     if metadata:
@@ -126,26 +167,13 @@ async def get_document_type(path):
     if not mime_type.startswith("video") and not mime_type.endswith("octet-stream"):
         return is_video, is_audio, is_image
     try:
-        result = await cmd_exec(
-            [
-                "ffprobe",
-                "-hide_banner",
-                "-loglevel",
-                "error",
-                "-print_format",
-                "json",
-                "-show_streams",
-                path,
-            ]
-        )
-        if res := result[1]:
-            LOGGER.warning(f"Get Document Type: {res}")
+        result = await probe_media(path)
     except Exception as e:
         LOGGER.error(f"Get Document Type: {e}. Mostly File not found!")
         return is_video, is_audio, is_image
-    fields = eval(result[0]).get("streams")
+    fields = result.get("streams")
     if fields is None:
-        LOGGER.error(f"get_document_type: {result}")
+        LOGGER.error(f"get_document_type: {path}")
         return is_video, is_audio, is_image
     for stream in fields:
         if stream.get("codec_type") == "video":
@@ -155,6 +183,73 @@ async def get_document_type(path):
     return is_video, is_audio, is_image
 
 
+class MetadataStage:
+    """Rewrites the metadata of many videos, archive_workers() remuxes at a time"""
+
+    def __init__(self, listener, total):
+        self.__listener = listener
+        self.__total = total
+        self.__workers = Semaphore(archive_workers())
+        self.__group = ProcessGroup()
+        self.__jobs = {}
+        listener.suproc = self.__group
+
+    @property
+    def processed_bytes(self):
+        if not (weight := sum(size for size, _ in self.__jobs.values())):
+            return 0
+        done = sum(size * part for size, part in self.__jobs.values())
+        return int(self.__total * done / weight)
+
+    @property
+    def files(self):
+        return sum(part == 1 for _, part in self.__jobs.values()), len(self.__jobs)
+
+    def cancelled(self):
+        return self.__group.returncode == -9 or self.__listener.suproc == "cancelled"
+
+    async def videos(self, paths):
+        """The paths that are videos, probed side by side"""
+
+        async def is_video(path):
+            async with self.__workers:
+                return (await get_document_type(path))[0]
+
+        return [
+            path
+            for path, video in zip(paths, await gather(*map(is_video, paths)))
+            if video
+        ]
+
+    async def __edit(self, base_dir, media_file, outfile, metadata):
+        async with self.__workers:
+            if self.cancelled():
+                return
+            duration = (await get_media_info(media_file))[0]
+            job = self.__jobs[media_file]
+
+            def progress(seconds):
+                if duration:
+                    job[1] = min(seconds / duration, 0.99)
+
+            await edit_metadata(
+                self.__listener,
+                base_dir,
+                media_file,
+                outfile,
+                metadata,
+                self.__group,
+                progress,
+            )
+            job[1] = 1
+
+    async def edit(self, jobs, metadata):
+        """jobs: (base_dir, media_file, outfile) of every video"""
+        for _, media_file, _ in jobs:
+            self.__jobs[media_file] = [await aiopath.getsize(media_file), 0]
+        await gather(*[self.__edit(*job, metadata) for job in jobs])
+
+
 async def get_audio_thumb(audio_file):
     des_dir = "Thumbnails"
     if not await aiopath.exists(des_dir):
@@ -182,14 +277,8 @@ async def get_audio_thumb(audio_file):
     return des_dir
 
 
-async def take_ss(video_file, duration=None, total=1, gen_ss=False):
-    des_dir = ospath.join("Thumbnails", f"{time()}")
-    await makedirs(des_dir, exist_ok=True)
-    if duration is None:
-        duration = (await get_media_info(video_file))[0]
-    if duration == 0:
-        duration = 3
-    duration = duration - (duration * 2 / 100)
+async def seek_frames(video_file, des_dir, duration, total):
+    """One seek and ffmpeg process per frame, for files select_frames can't handle"""
     cmd = [
         "ffmpeg",
         "-hide_banner",
@@ -229,9 +318,97 @@ async def take_ss(video_file, duration=None, total=1, gen_ss=False):
             LOGGER.error(
                 f"Error while extracting thumbnail no. {eq_thumb} from video. Name: {video_file} stderr: {err}"
             )
-            await aiormtree(des_dir)
             return None
-    return (des_dir, tstamps) if gen_ss else ospath.join(des_dir, "wz_thumb_1.jpg")
+    return tstamps
+
+
+async def select_frames(video_file, des_dir, duration, total):
+    """All frames in one pass that only decodes keyframes, taking the first
+    keyframe at or after every evenly spaced point"""
+    interval = duration / total
+    stdout, stderr, code = await cmd_exec(
+        [
+            "ffmpeg",
+            "-hide_banner",
+            "-nostats",
+            "-loglevel",
+            "info",
+            "-skip_frame",
+            "nokey",
+            "-i",
+            video_file,
+            "-vf",
+            f"select='gte(t,{interval}*(selected_n+1))',showinfo",
+            "-vsync",
+            "vfr",
+            "-frames:v",
+            str(total),
+            ospath.join(des_dir, "wz_thumb_%d.jpg"),
+        ]
+    )
+    stamps = [float(t) for t in re_findall(r"pts_time:\s*([\d.]+)", stderr)]
+    if code != 0 or len(stamps) < total:
+        return None
+    return {
+        f"wz_thumb_{n}.jpg": strftime("%H:%M:%S", gmtime(stamp))
+        for n, stamp in enumerate(stamps[:total], start=1)
+    }
+
+
+def is_cached_thumb(thumb):
+    return any(cached[1] == thumb for cached in thumb_cache.values())
+
+
+async def take_ss(video_file, duration=None, total=1, gen_ss=False):
+    start = time()
+    if not gen_ss:
+        # the default thumbnail is kept per file version, so upload retries reuse it
+        with suppress(OSError):
+            st = await aiostat(video_file)
+            version = (st.st_size, st.st_mtime_ns)
+            if (
+                (cached := thumb_cache.get(video_file))
+                and cached[0] == version
+                and await aiopath.exists(cached[1])
+            ):
+                return cached[1]
+    des_dir = ospath.join("Thumbnails", f"{time()}")
+    await makedirs(des_dir, exist_ok=True)
+    if duration is None:
+        duration = (await get_media_info(video_file))[0]
+    if duration == 0:
+        duration = 3
+    duration = duration - (duration * 2 / 100)
+    tstamps = None
+    if total > 1:
+        tstamps = await select_frames(video_file, des_dir, duration, total)
+        if tstamps is None:
+            await aiormtree(des_dir)
+            await makedirs(des_dir, exist_ok=True)
+    if tstamps is None:
+        tstamps = await seek_frames(video_file, des_dir, duration, total)
+    if tstamps is None:
+        await aiormtree(des_dir)
+        return None
+    elapsed = time() - start
+    ss_stats["runs"] += 1
+    ss_stats["frames"] += total
+    ss_stats["seconds"] += elapsed
+    if gen_ss:
+        LOGGER.info(
+            f"Screenshots: {total} frames in {elapsed:.2f}s. Name: {video_file}"
+        )
+        return des_dir, tstamps
+    thumb = ospath.join(des_dir, "wz_thumb_1.jpg")
+    with suppress(OSError):
+        st = await aiostat(video_file)
+        thumb_cache[video_file] = ((st.st_size, st.st_mtime_ns), thumb)
+        thumb_cache.move_to_end(video_file)
+        while len(thumb_cache) > THUMB_CACHE_SIZE:
+            _, (_, old_thumb) = thumb_cache.popitem(last=False)
+            with suppress(Exception):
+                await aiormtree(ospath.dirname(old_thumb))
+    return thumb
 
 
 async def split_file(
@@ -245,7 +422,9 @@ async def split_file(
     i=1,
     inLoop=False,
     multi_streams=True,
+    on_part=None,
 ):
+    """on_part is awaited with the path of every part as soon as it is final"""
     if (
         listener.suproc == "cancelled"
         or listener.suproc is not None
@@ -272,6 +451,21 @@ async def split_file(
         duration = (await get_media_info(path))[0]
         base_name, extension = ospath.splitext(file_)
         split_size -= 5000000
+        if not inLoop:
+            res = await split_on_keyframes(
+                path,
+                size,
+                ospath.join(dirpath, base_name),
+                extension,
+                split_size,
+                listener,
+                multi_streams,
+                on_part,
+            )
+            if not isinstance(res, tuple):
+                return res
+            # no usable index or a part came out too big, cut the rest one by one
+            start_time, i = res
         while i <= parts or start_time < duration - 4:
             parted_name = f"{base_name}.part{i:03}{extension}"
             out_path = ospath.join(dirpath, parted_name)
@@ -332,6 +526,7 @@ async def split_file(
                         i,
                         True,
                         False,
+                        on_part,
                     )
                 else:
                     LOGGER.warning(
@@ -353,40 +548,198 @@ async def split_file(
                     start_time,
                     i,
                     True,
+                    on_part=on_part,
                 )
             lpd = (await get_media_info(out_path))[0]
             if lpd == 0:
                 LOGGER.error(
                     f"Something went wrong while splitting, mostly file is corrupted. Path: {path}"
                 )
+                if on_part:
+                    await on_part(out_path)
                 break
             elif duration == lpd:
                 LOGGER.warning(
                     f"This file has been splitted with default stream and audio, so you will only see one part with less size from orginal one because it doesn't have all streams and audios. This happens mostly with MKV videos. Path: {path}"
                 )
+                if on_part:
+                    await on_part(out_path)
                 break
             elif lpd <= 3:
                 await aioremove(out_path)
                 break
+            if on_part:
+                await on_part(out_path)
             start_time += lpd - 3
             i += 1
     else:
-        out_path = ospath.join(dirpath, f"{file_}.")
-        listener.suproc = await create_subprocess_exec(
-            "split",
-            "--numeric-suffixes=1",
-            "--suffix-length=3",
-            f"--bytes={split_size}",
+        # same naming as split --numeric-suffixes=1 --suffix-length=3
+        for i, offset in enumerate(range(0, size, split_size), start=1):
+            out_path = ospath.join(dirpath, f"{file_}.{i:03}")
+            if not await sync_to_async(
+                cut_part, listener, path, out_path, offset, split_size
+            ):
+                await aioremove(out_path)
+                return False
+            if on_part:
+                await on_part(out_path)
+    return True
+
+
+async def get_keyframes(path):
+    """(pts, byte position) of every keyframe packet of the first video stream"""
+    stdout, stderr, code = await cmd_exec(
+        [
+            "ffprobe",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "packet=pts_time,pos,flags",
+            "-of",
+            "compact=p=0",
             path,
-            out_path,
-            stderr=PIPE,
+        ]
+    )
+    if code != 0:
+        LOGGER.warning(f"Keyframes: {stderr}. Path: {path}")
+        return []
+    keyframes = []
+    for line in stdout.splitlines():
+        fields = dict(field.split("=", 1) for field in line.split("|") if "=" in field)
+        if "K" in fields.get("flags", ""):
+            with suppress(KeyError, ValueError):
+                keyframes.append((float(fields["pts_time"]), int(fields["pos"])))
+    keyframes.sort()
+    return keyframes
+
+
+def plan_cuts(keyframes, size, budget):
+    """Start (pts, position) of every part so that no part spans more than budget bytes"""
+    cuts = [(keyframes[0][0], 0)]
+    last = None
+    for keyframe in keyframes[1:]:
+        if keyframe[1] - cuts[-1][1] > budget:
+            cuts.append(last if last and last[1] > cuts[-1][1] else keyframe)
+        last = keyframe
+    if size - cuts[-1][1] > budget and last and last[1] > cuts[-1][1]:
+        cuts.append(last)
+    return cuts
+
+
+def split_lookahead(split_size):
+    """Parts cut ahead of the ones being uploaded, one and up to SPLIT_WORKERS
+    while the free space above STORAGE_THRESHOLD holds them"""
+    threshold = (config_dict["STORAGE_THRESHOLD"] or 0) * 1024**3
+    ahead = 1
+    while ahead < SPLIT_WORKERS and check_storage_threshold(
+        split_size * (ahead + 1), threshold
+    ):
+        ahead += 1
+    return ahead
+
+
+async def split_on_keyframes(
+    path, size, out_base, extension, split_size, listener, multi_streams, on_part
+):
+    """Cuts all parts of a video at planned keyframes, SPLIT_WORKERS at a time.
+    With on_part a part holds its slot until the uploader took it, so at most
+    split_lookahead() finished parts wait on disk next to the ones uploading.
+    Returns (start_time, part) to continue from when the index can't be used."""
+    keyframes = await get_keyframes(path)
+    if len(keyframes) < 2:
+        return 0, 1
+    start = float((await probe_media(path)).get("format", {}).get("start_time", 0))
+    # headers and index of every part are not part of the packet positions
+    cuts = plan_cuts(keyframes, size, split_size - split_size // 100)
+    starts = [0] + [pts - start for pts, _ in cuts[1:]]
+    segments = [
+        (
+            segment_start,
+            starts[n + 1] - segment_start if n + 1 < len(starts) else None,
+            f"{out_base}.part{n + 1:03}{extension}",
         )
-        code = await listener.suproc.wait()
-        if code == -9:
+        for n, segment_start in enumerate(starts)
+    ]
+    window = Semaphore(split_lookahead(split_size) if on_part else SPLIT_WORKERS)
+    procs = {}
+
+    async def cut(segment_start, segment_duration, out_path):
+        await window.acquire()
+        if listener.suproc == "cancelled":
             return False
-        elif code != 0:
-            err = (await listener.suproc.stderr.read()).decode().strip()
-            LOGGER.error(err)
+        for map_all in ([True, False] if multi_streams else [False]):
+            cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+            cmd += ["-ss", str(segment_start), "-i", path]
+            if segment_duration is not None:
+                cmd += ["-t", str(segment_duration)]
+            if map_all:
+                cmd += ["-map", "0"]
+            cmd += ["-map_chapters", "-1", "-async", "1", "-strict", "-2"]
+            cmd += ["-c", "copy", out_path]
+            listener.suproc = procs[out_path] = await create_subprocess_exec(
+                *cmd, stderr=PIPE
+            )
+            code = await procs[out_path].wait()
+            err = (await procs.pop(out_path).stderr.read()).decode().strip()
+            if code == -9 or listener.suproc == "cancelled":
+                return False
+            if code == 0:
+                return True
+            with suppress(Exception):
+                await aioremove(out_path)
+            LOGGER.warning(f"{err}. Path: {path}")
+        return "errored"
+
+    tasks = [create_task(cut(*segment)) for segment in segments]
+    emitted = 0
+    try:
+        for n, (task, (segment_start, _, out_path)) in enumerate(zip(tasks, segments)):
+            res = await task
+            if res is not True:
+                if res == "errored":
+                    LOGGER.warning(
+                        f"Unable to split this video, if it's size less than {MAX_SPLIT_SIZE} will be uploaded as it is. Path: {path}"
+                    )
+                return res
+            if await aiopath.getsize(out_path) > MAX_SPLIT_SIZE:
+                await aioremove(out_path)
+                return segment_start, n + 1
+            if on_part:
+                await on_part(out_path)
+            emitted += 1
+            window.release()
+        return True
+    finally:
+        for task in tasks:
+            task.cancel()
+        for proc in list(procs.values()):
+            with suppress(Exception):
+                proc.kill()
+        await gather(*tasks, return_exceptions=True)
+        for _, _, out_path in segments[emitted:]:
+            with suppress(Exception):
+                await aioremove(out_path)
+
+
+def cut_part(listener, path, out_path, offset, length):
+    # parts are hashed for the caption right behind the copy, while still cached
+    hasher = FileHasher(caption_hashes(listener.user_id))
+    with open(path, "rb") as src, open(out_path, "wb") as dst:
+        while length > 0:
+            if listener.suproc == "cancelled":
+                return False
+            sent = sendfile(dst.fileno(), src.fileno(), offset, min(length, 67108864))
+            if sent == 0:
+                break
+            offset += sent
+            length -= sent
+            if hasher:
+                hasher.feed(out_path)
+    if hasher:
+        hasher.store(out_path)
     return True
 
 
@@ -481,6 +834,9 @@ async def format_filename(file_, user_id, dirpath=None, isMirror=False):
         slit[0] = re_sub(r"\{([^}]+)\}", lowerVars, slit[0])
         up_path = ospath.join(dirpath, prefile_)
         dur, qual, lang, subs = await get_media_info(up_path, True)
+        hashes = await get_file_hashes(
+            up_path, [name for name in HASHERS if f"{{{name}_hash}}" in slit[0]]
+        )
         cap_mono = slit[0].format(
             filename=nfile_,
             size=get_readable_file_size(await aiopath.getsize(up_path)),
@@ -488,7 +844,9 @@ async def format_filename(file_, user_id, dirpath=None, isMirror=False):
             quality=qual,
             languages=lang,
             subtitles=subs,
-            md5_hash=get_md5_hash(up_path),
+            md5_hash=hashes.get("md5", ""),
+            sha1_hash=hashes.get("sha1", ""),
+            xxh64_hash=hashes.get("xxh64", ""),
         )
         if len(slit) > 1:
             for rep in range(1, len(slit)):
@@ -533,11 +891,3 @@ async def get_mediainfo_link(up_path):
         tc += parseinfo(stdout)
     link_id = (await telegraph.create_page(title="MediaInfo X", content=tc))["path"]
     return f"https://graph.org/{link_id}"
-
-
-def get_md5_hash(up_path):
-    md5_hash = md5()
-    with open(up_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            md5_hash.update(byte_block)
-        return md5_hash.hexdigest()
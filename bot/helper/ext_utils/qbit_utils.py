@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+from threading import Lock
+
+from bot import LOGGER, get_client
+
+
+class QbTorrent(dict):
+    """A torrent of the sync/maindata state, with the attribute access of
+    qbittorrentapi's TorrentDictionary"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError as e:
+            raise AttributeError(name) from e
+
+
+class QbState:
+    """Torrents of the qBittorrent daemon, kept up to date from the rid based
+    sync/maindata deltas through one persistent client"""
+
+    def __init__(self):
+        self.__client = None
+        self.__lock = Lock()
+        self.__rid = 0
+        self.__torrents = {}
+        self.__tags = {}
+
+    @property
+    def client(self):
+        # qbittorrentapi logs in again by itself once the session expires
+        if self.__client is None:
+            self.__client = get_client()
+        return self.__client
+
+    def refresh(self):
+        """Applies the changes since the last call, returns all torrents"""
+        with self.__lock:
+            try:
+                data = self.client.sync_maindata(rid=self.__rid)
+            except Exception:
+                # the next call asks for a full update again
+                self.__rid = 0
+                raise
+            torrents = {} if data.get("full_update") else dict(self.__torrents)
+            for hash_, delta in (data.get("torrents") or {}).items():
+                torrents[hash_] = QbTorrent(torrents.get(hash_, {}), **delta)
+                torrents[hash_]["hash"] = hash_
+            for hash_ in data.get("torrents_removed") or []:
+                torrents.pop(hash_, None)
+            self.__rid = data.get("rid", 0)
+            self.__tags = {tor.get("tags"): tor for tor in torrents.values()}
+            self.__torrents = torrents
+            return list(torrents.values())
+
+    def torrents(self):
+        return list(self.__torrents.values())
+
+    def get(self, tag, refresh=False):
+        """Cached torrent with tag, with refresh the daemon is asked if it is not
+        known yet, status reads rely on the qbit listener keeping the state fresh"""
+        if (tor := self.__tags.get(tag)) is None and refresh:
+            try:
+                self.refresh()
+            except Exception as e:
+                LOGGER.error(f"{e}: Qbittorrent, while syncing torrents. Tag: {tag}")
+            tor = self.__tags.get(tag)
+        return tor
+
+
+qb_state = QbState()
@@ -1,12 +1,14 @@
 #!/usr/bin/env python3
 from time import time
 from asyncio import Event
+from collections import deque
+from heapq import heappush, heappop, heapify
+from itertools import count
 
 from bot import (
     bot_cache,
     config_dict,
-    queued_dl,
-    queued_up,
+    OWNER_ID,
     non_queued_up,
     non_queued_dl,
     queue_dict_lock,
@@ -16,6 +18,7 @@ from bot import (
 )
 from bot.helper.mirror_utils.upload_utils.gdriveTools import GoogleDriveHelper
 from bot.helper.ext_utils.fs_utils import get_base_name, check_storage_threshold
+from bot.helper.ext_utils.drive_index import search_drive_index
 from bot.helper.ext_utils.bot_utils import (
     get_user_tasks,
     getdailytasks,
@@ -48,7 +51,10 @@ async def stop_duplicate_check(name, listener):
             name = None
     if name is not None:
         telegraph_content, contents_no = await sync_to_async(
-            GoogleDriveHelper().drive_list, name, stopDup=True
+            GoogleDriveHelper().drive_list,
+            name,
+            stopDup=True,
+            indexed=await search_drive_index(name, stopDup=True),
         )
         if telegraph_content:
             msg = BotTheme("STOP_DUPLICATE", content=contents_no)
@@ -67,7 +73,113 @@ async def timeval_check(user_id):
     return None
 
 
-async def is_queued(uid):
+QUEUE_SIZE_UNIT = 10 * 1024**3
+
+
+def task_priority(listener):
+    user_id = listener.message.from_user.id
+    if user_id == OWNER_ID:
+        return 0
+    if user_data.get(user_id, {}).get("is_sudo"):
+        return 1
+    return 2
+
+
+class TaskQueue:
+    """Waiting tasks, served owner first, then sudo users, then everyone else.
+    Inside a class each user with waiting tasks gets a turn by virtual finish
+    time, so one user's 200 links don't hold back the next task of anyone else.
+    Bigger tasks cost more of a turn, unknown sizes count as small"""
+
+    def __init__(self):
+        self.__tasks = {}
+        self.__users = {}
+        self.__heads = []
+        self.__head = {}
+        self.__finish = {}
+        self.__vtime = 0
+        self.__seq = count()
+        self.__waits = deque(maxlen=100)
+
+    def __contains__(self, uid):
+        return uid in self.__tasks
+
+    def __len__(self):
+        return len(self.__tasks)
+
+    def __push_head(self, user_id):
+        if not (pending := self.__users.get(user_id)):
+            self.__users.pop(user_id, None)
+            self.__head.pop(user_id, None)
+            return
+        cost, _, uid = pending[0]
+        start = max(self.__vtime, self.__finish.get(user_id, 0))
+        token = self.__head[user_id] = next(self.__seq)
+        heappush(
+            self.__heads,
+            (self.__tasks[uid]["priority"], start + cost, token, user_id, start),
+        )
+
+    def add(self, uid, listener, size=0):
+        user_id = listener.message.from_user.id
+        self.__tasks[uid] = {
+            "event": Event(),
+            "priority": task_priority(listener),
+            "added": time(),
+            "user_id": user_id,
+        }
+        pending = self.__users.setdefault(user_id, [])
+        heappush(pending, (1 + size / QUEUE_SIZE_UNIT, next(self.__seq), uid))
+        if pending[0][2] == uid:
+            self.__push_head(user_id)
+        return self.__tasks[uid]["event"]
+
+    def pop(self):
+        """Starts the next task and returns its uid, None if nothing is waiting"""
+        while self.__heads:
+            _, finish, token, user_id, start = heappop(self.__heads)
+            if self.__head.get(user_id) != token:
+                # the user's next task changed since this turn was queued
+                continue
+            uid = heappop(self.__users[user_id])[2]
+            self.__vtime = max(self.__vtime, start)
+            self.__finish[user_id] = finish
+            self.__push_head(user_id)
+            task = self.__tasks.pop(uid)
+            self.__waits.append(time() - task["added"])
+            task["event"].set()
+            return uid
+        return None
+
+    def remove(self, uid):
+        """Drops a cancelled task, its waiter wakes up and finds it gone"""
+        if (task := self.__tasks.pop(uid, None)) is None:
+            return
+        pending = self.__users[task["user_id"]]
+        was_next = pending[0][2] == uid
+        pending[:] = [item for item in pending if item[2] != uid]
+        heapify(pending)
+        if was_next:
+            self.__push_head(task["user_id"])
+        task["event"].set()
+
+    def stats(self):
+        now = time()
+        waits = list(self.__waits)
+        return {
+            "queued": len(self.__tasks),
+            "users": len(self.__users),
+            "oldest": max((now - t["added"] for t in self.__tasks.values()), default=0),
+            "avg_wait": sum(waits) / len(waits) if waits else 0,
+            "max_wait": max(waits, default=0),
+        }
+
+
+queued_dl = TaskQueue()
+queued_up = TaskQueue()
+
+
+async def is_queued(listener, size=0):
     all_limit = config_dict["QUEUE_ALL"]
     dl_limit = config_dict["QUEUE_DOWNLOAD"]
     event = None
@@ -80,19 +192,15 @@ async def is_queued(uid):
                 all_limit and dl + up >= all_limit and (not dl_limit or dl >= dl_limit)
             ) or (dl_limit and dl >= dl_limit):
                 added_to_queue = True
-                event = Event()
-                queued_dl[uid] = event
+                event = queued_dl.add(listener.uid, listener, size)
     return added_to_queue, event
 
 
-def start_dl_from_queued(uid):
-    queued_dl[uid].set()
-    del queued_dl[uid]
-
-
-def start_up_from_queued(uid):
-    queued_up[uid].set()
-    del queued_up[uid]
+def __start_tasks(queue, limit=None):
+    started = 0
+    while (limit is None or started < limit) and queue.pop() is not None:
+        started += 1
+    return started
 
 
 async def start_from_queued():
@@ -102,52 +210,24 @@ async def start_from_queued():
         async with queue_dict_lock:
             dl = len(non_queued_dl)
             up = len(non_queued_up)
-            all_ = dl + up
-            if all_ < all_limit:
-                f_tasks = all_limit - all_
-                if queued_up and (not up_limit or up < up_limit):
-                    for index, uid in enumerate(list(queued_up.keys()), start=1):
-                        f_tasks = all_limit - all_
-                        start_up_from_queued(uid)
-                        f_tasks -= 1
-                        if f_tasks == 0 or (up_limit and index >= up_limit - up):
-                            break
-                if queued_dl and (not dl_limit or dl < dl_limit) and f_tasks != 0:
-                    for index, uid in enumerate(list(queued_dl.keys()), start=1):
-                        start_dl_from_queued(uid)
-                        if (dl_limit and index >= dl_limit - dl) or index == f_tasks:
-                            break
+            if (f_tasks := all_limit - dl - up) > 0:
+                f_tasks -= __start_tasks(
+                    queued_up, min(f_tasks, up_limit - up) if up_limit else f_tasks
+                )
+                __start_tasks(
+                    queued_dl, min(f_tasks, dl_limit - dl) if dl_limit else f_tasks
+                )
         return
 
-    if up_limit := config_dict["QUEUE_UPLOAD"]:
-        async with queue_dict_lock:
-            up = len(non_queued_up)
-            if queued_up and up < up_limit:
-                f_tasks = up_limit - up
-                for index, uid in enumerate(list(queued_up.keys()), start=1):
-                    start_up_from_queued(uid)
-                    if index == f_tasks:
-                        break
-    else:
-        async with queue_dict_lock:
-            if queued_up:
-                for uid in list(queued_up.keys()):
-                    start_up_from_queued(uid)
-
-    if dl_limit := config_dict["QUEUE_DOWNLOAD"]:
-        async with queue_dict_lock:
-            dl = len(non_queued_dl)
-            if queued_dl and dl < dl_limit:
-                f_tasks = dl_limit - dl
-                for index, uid in enumerate(list(queued_dl.keys()), start=1):
-                    start_dl_from_queued(uid)
-                    if index == f_tasks:
-                        break
-    else:
-        async with queue_dict_lock:
-            if queued_dl:
-                for uid in list(queued_dl.keys()):
-                    start_dl_from_queued(uid)
+    async with queue_dict_lock:
+        if up_limit := config_dict["QUEUE_UPLOAD"]:
+            __start_tasks(queued_up, up_limit - len(non_queued_up))
+        else:
+            __start_tasks(queued_up)
+        if dl_limit := config_dict["QUEUE_DOWNLOAD"]:
+            __start_tasks(queued_dl, dl_limit - len(non_queued_dl))
+        else:
+            __start_tasks(queued_dl)
 
 
 async def limit_checker(
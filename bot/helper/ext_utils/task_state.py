@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+from asyncio import Condition, wait_for, TimeoutError
+from time import monotonic
+
+from bot.helper.ext_utils.bot_utils import getDownloadByGid
+
+TASK_WAIT_TIMEOUT = 10
+# the longest a waiter relies on being notified, gids of aria2 follow-ups change
+# without any task moving on
+TASK_RECHECK = 1
+tasks_changed = Condition()
+
+
+class TaskStage:
+    CREATED = 0
+    STARTED = 1
+    DOWNLOADED = 2
+    FINISHED = 3
+
+
+class TaskState:
+    """Stage of one task, hand-offs wait for the stage they need instead of
+    sleeping"""
+
+    def __init__(self):
+        self.stage = TaskStage.CREATED
+        self.__changed = Condition()
+
+    async def advance(self, stage):
+        async with self.__changed:
+            self.stage = max(self.stage, stage)
+            self.__changed.notify_all()
+        await notify_tasks()
+
+    async def wait_for(self, stage, timeout=None):
+        """True once the task reached stage, False if timeout passed before"""
+        async with self.__changed:
+            try:
+                await wait_for(
+                    self.__changed.wait_for(lambda: self.stage >= stage), timeout
+                )
+            except TimeoutError:
+                return False
+        return True
+
+
+async def notify_tasks():
+    async with tasks_changed:
+        tasks_changed.notify_all()
+
+
+async def __wait(remaining):
+    try:
+        await wait_for(tasks_changed.wait(), min(remaining, TASK_RECHECK))
+    except TimeoutError:
+        pass
+
+
+async def wait_for_tasks(predicate, timeout=None):
+    """Evaluates predicate each time a task moves on, returns its last value"""
+    deadline = None if timeout is None else monotonic() + timeout
+    async with tasks_changed:
+        while not (result := predicate()):
+            remaining = TASK_RECHECK if deadline is None else deadline - monotonic()
+            if remaining <= 0:
+                break
+            await __wait(remaining)
+    return result
+
+
+async def wait_for_download(gid, timeout=TASK_WAIT_TIMEOUT):
+    """Status of gid as soon as its task has started, None after timeout"""
+    deadline = monotonic() + timeout
+    async with tasks_changed:
+        while not (dl := await getDownloadByGid(gid)):
+            if (remaining := deadline - monotonic()) <= 0:
+                break
+            await __wait(remaining)
+    return dl
@@ -5,9 +5,12 @@ from aiofiles.os import remove as aioremove, path as aiopath
 
 from bot import aria2, download_dict_lock, download_dict, LOGGER, config_dict
 from bot.helper.ext_utils.task_manager import limit_checker
+from bot.helper.ext_utils.drive_index import search_drive_index
 from bot.helper.mirror_utils.upload_utils.gdriveTools import GoogleDriveHelper
 from bot.helper.mirror_utils.status_utils.aria2_status import Aria2Status
 from bot.helper.ext_utils.fs_utils import get_base_name, clean_unwanted
+from bot.helper.ext_utils.aria2_utils import aria2_state
+from bot.helper.ext_utils.task_state import TaskStage, wait_for_download
 from bot.helper.ext_utils.bot_utils import (
     getDownloadByGid,
     new_thread,
@@ -23,6 +26,19 @@ from bot.helper.telegram_helper.message_utils import (
 from bot.helper.themes import BotTheme
 
 
+async def __get_sized_download(api, gid):
+    """Download of gid once aria2 got its length from the server"""
+    download = await sync_to_async(api.get_download, gid)
+    if download.is_torrent or download.total_length:
+        return download
+    await aria2_state.wait_for(
+        gid,
+        lambda struct: int(struct["totalLength"]) or struct["status"] != "active",
+        3,
+    )
+    return await sync_to_async(api.get_download, gid)
+
+
 @new_thread
 async def __onDownloadStarted(api, gid):
     download = await sync_to_async(api.get_download, gid)
@@ -30,18 +46,21 @@ async def __onDownloadStarted(api, gid):
         return
     if download.is_metadata:
         LOGGER.info(f"onDownloadStarted: {gid} METADATA")
-        await sleep(1)
-        if dl := await getDownloadByGid(gid):
+        if dl := await wait_for_download(gid):
             listener = dl.listener()
             if listener.select:
                 metamsg = "Downloading Metadata, wait then you can select files. Use torrent file to avoid this wait."
                 meta = await sendMessage(listener.message, metamsg)
                 while True:
                     await sleep(0.5)
-                    if download.is_removed or download.followed_by_ids:
+                    if (
+                        download is None
+                        or download.is_removed
+                        or download.followed_by_ids
+                    ):
                         await deleteMessage(meta)
                         break
-                    download = download.live
+                    download = await sync_to_async(aria2_state.download, gid)
         return
     else:
         LOGGER.info(f"onDownloadStarted: {download.name} - Gid: {gid}")
@@ -57,9 +76,8 @@ async def __onDownloadStarted(api, gid):
             config_dict["DAILY_LEECH_LIMIT"],
         ]
     ):
-        await sleep(1)
         if dl is None:
-            dl = await getDownloadByGid(gid)
+            dl = await wait_for_download(gid)
         if dl:
             if not hasattr(dl, "listener"):
                 LOGGER.warning(
@@ -67,19 +85,15 @@ async def __onDownloadStarted(api, gid):
                 )
                 return
             listener = dl.listener()
-            download = await sync_to_async(api.get_download, gid)
-            if not download.is_torrent:
-                await sleep(3)
-                download = download.live
+            download = await __get_sized_download(api, gid)
             size = download.total_length
             LOGGER.info(f"listener size : {size}")
             if limit_exceeded := await limit_checker(size, listener):
                 await listener.onDownloadError(limit_exceeded)
                 await sync_to_async(api.remove, [download], force=True, files=True)
     if config_dict["STOP_DUPLICATE"]:
-        await sleep(1)
         if dl is None:
-            dl = await getDownloadByGid(gid)
+            dl = await wait_for_download(gid)
         if dl:
             if not hasattr(dl, "listener"):
                 LOGGER.warning(
@@ -88,10 +102,7 @@ async def __onDownloadStarted(api, gid):
                 return
             listener = dl.listener()
             if not listener.isLeech and not listener.select and listener.upPath == "gd":
-                download = await sync_to_async(api.get_download, gid)
-                if not download.is_torrent:
-                    await sleep(3)
-                    download = download.live
+                download = await __get_sized_download(api, gid)
                 LOGGER.info("Checking File/Folder if already in Drive...")
                 name = download.name
                 if listener.compress:
@@ -103,7 +114,10 @@ async def __onDownloadStarted(api, gid):
                         name = None
                 if name is not None:
                     telegraph_content, contents_no = await sync_to_async(
-                        GoogleDriveHelper().drive_list, name, True
+                        GoogleDriveHelper().drive_list,
+                        name,
+                        True,
+                        indexed=await search_drive_index(name, stopDup=True),
                     )
                     if telegraph_content:
                         msg = BotTheme("STOP_DUPLICATE", content=contents_no)
@@ -154,12 +168,11 @@ async def __onDownloadComplete(api, gid):
 @new_thread
 async def __onBtDownloadComplete(api, gid):
     seed_start_time = time()
-    await sleep(1)
     download = await sync_to_async(api.get_download, gid)
     if download.options.follow_torrent == "false":
         return
     LOGGER.info(f"onBtDownloadComplete: {download.name} - Gid: {gid}")
-    if dl := await getDownloadByGid(gid):
+    if dl := await wait_for_download(gid):
         listener = dl.listener()
         if listener.select:
             res = download.files
@@ -212,10 +225,13 @@ async def __onBtDownloadComplete(api, gid):
 
 @new_thread
 async def __onDownloadStopped(api, gid):
-    await sleep(6)
     if dl := await getDownloadByGid(gid):
         listener = dl.listener()
-        await listener.onDownloadError("Dead torrent!")
+        # cancelled and finished tasks are done before aria2 stops their download
+        if await listener.state.wait_for(TaskStage.FINISHED, timeout=6):
+            return
+        if await getDownloadByGid(gid):
+            await listener.onDownloadError("Dead torrent!")
 
 
 @new_thread
@@ -5,7 +5,6 @@ from time import time
 from bot import (
     download_dict,
     download_dict_lock,
-    get_client,
     QbInterval,
     config_dict,
     QbTorrents,
@@ -22,6 +21,8 @@ from bot.helper.ext_utils.bot_utils import (
     sync_to_async,
 )
 from bot.helper.ext_utils.fs_utils import clean_unwanted
+from bot.helper.ext_utils.qbit_utils import qb_state
+from bot.helper.ext_utils.task_state import wait_for_download
 from bot.helper.ext_utils.task_manager import limit_checker, stop_duplicate_check
 
 
@@ -88,8 +89,7 @@ async def __size_checked(tor):
 async def __onDownloadComplete(tor):
     ext_hash = tor.hash
     tag = tor.tags
-    await sleep(2)
-    download = await getDownloadByGid(ext_hash[:12])
+    download = await wait_for_download(ext_hash[:12])
     if not hasattr(download, "client"):
         return
     listener = download.listener()
@@ -99,7 +99,6 @@ async def __onDownloadComplete(tor):
     if listener.select:
         await clean_unwanted(listener.dir)
     await listener.onDownloadComplete()
-    client = await sync_to_async(get_client)
     if listener.seed:
         async with download_dict_lock:
             if listener.uid in download_dict:
@@ -117,21 +116,20 @@ async def __onDownloadComplete(tor):
                 return
         await update_all_messages()
         LOGGER.info(f"Seeding started: {tor.name} - Hash: {ext_hash}")
-        await sync_to_async(client.auth_log_out)
     else:
         await __remove_torrent(client, ext_hash, tag)
 
 
 async def __qb_listener():
-    client = await sync_to_async(get_client)
+    client = qb_state.client
     while True:
         async with qb_listener_lock:
             try:
-                if len(await sync_to_async(client.torrents_info)) == 0:
+                # one sync/maindata delta per tick, the status objects read it too
+                if not (torrents := await sync_to_async(qb_state.refresh)):
                     QbInterval.clear()
-                    await sync_to_async(client.auth_log_out)
                     break
-                for tor_info in await sync_to_async(client.torrents_info):
+                for tor_info in torrents:
                     tag = tor_info.tags
                     if tag not in QbTorrents:
                         continue
@@ -206,8 +204,14 @@ async def __qb_listener():
                     elif (
                         tor_info.completion_on != 0
                         and not QbTorrents[tag]["uploaded"]
+                        # files are complete once qBittorrent stopped moving them
                         and state
-                        not in ["checkingUP", "checkingDL", "checkingResumeData"]
+                        not in [
+                            "checkingUP",
+                            "checkingDL",
+                            "checkingResumeData",
+                            "moving",
+                        ]
                     ):
                         QbTorrents[tag]["uploaded"] = True
                         __onDownloadComplete(tor_info)
@@ -218,7 +222,6 @@ async def __qb_listener():
                         __onSeedFinish(tor_info)
             except Exception as e:
                 LOGGER.error(str(e))
-                client = await sync_to_async(get_client)
         await sleep(3)
 
 
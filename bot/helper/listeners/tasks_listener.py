@@ -10,7 +10,8 @@ from aiofiles.os import path as aiopath, remove as aioremove, listdir, makedirs
 from os import walk, path as ospath
 from html import escape
 from aioshutil import move
-from asyncio import create_subprocess_exec, sleep, Event
+from asyncio import create_task, sleep, Queue
+from contextlib import suppress
 from pyrogram.enums import ChatType
 
 from bot import (
@@ -29,8 +30,6 @@ from bot import (
     user_data,
     non_queued_up,
     non_queued_dl,
-    queued_up,
-    queued_dl,
     queue_dict_lock,
     bot,
     GLOBAL_EXTENSION_FILTER,
@@ -43,27 +42,34 @@ from bot.helper.ext_utils.bot_utils import (
     is_mega_link,
     is_gdrive_link,
 )
+from bot.helper.ext_utils.archive_utils import ArchiveStage, archive_workers
 from bot.helper.ext_utils.fs_utils import (
     get_base_name,
     get_path_size,
+    get_tree,
     clean_download,
     clean_target,
     is_first_archive_split,
     is_archive,
     is_archive_split,
     join_files,
-    edit_metadata,
 )
 from bot.helper.ext_utils.leech_utils import (
     split_file,
     format_filename,
-    get_document_type,
+    MetadataStage,
 )
 from bot.helper.ext_utils.exceptions import NotSupportedExtractionArchive
-from bot.helper.ext_utils.task_manager import start_from_queued
+from bot.helper.ext_utils.task_manager import (
+    start_from_queued,
+    queued_dl,
+    queued_up,
+)
+from bot.helper.ext_utils.task_state import TaskState, TaskStage, wait_for_tasks
+from bot.helper.ext_utils.bandwidth_utils import bandwidth
+from bot.helper.ext_utils.drive_index import index_uploaded_item
 from bot.helper.mirror_utils.status_utils.extract_status import ExtractStatus
 from bot.helper.mirror_utils.status_utils.zip_status import ZipStatus
-from bot.helper.mirror_utils.status_utils.split_status import SplitStatus
 from bot.helper.mirror_utils.status_utils.gdrive_status import GdriveStatus
 from bot.helper.mirror_utils.status_utils.telegram_status import TelegramStatus
 from bot.helper.mirror_utils.status_utils.ddl_status import DDLStatus
@@ -138,6 +144,7 @@ class MirrorLeechListener:
         self.user_dict = user_data.get(self.user_id, {})
         self.isPM = config_dict["BOT_PM"] or self.user_dict.get("bot_pm")
         self.suproc = None
+        self.state = TaskState()
         self.sameDir = sameDir
         self.rcFlags = rcFlags
         self.upPath = upPath
@@ -213,6 +220,7 @@ class MirrorLeechListener:
             self.source_msg = f"<code>{self.source_url}</code>"
 
     async def onDownloadStart(self):
+        await self.state.advance(TaskStage.STARTED)
         if config_dict["LINKS_LOG_ID"] and not self.excep_chat:
             dispTime = datetime.now(timezone(config_dict["TIMEZONE"])).strftime(
                 "%d/%m/%y, %I:%M:%S %p"
@@ -242,17 +250,13 @@ class MirrorLeechListener:
 
     async def onDownloadComplete(self):
         multi_links = False
-        while True:
-            if self.sameDir:
-                if (
-                    self.sameDir["total"] in [1, 0]
-                    or self.sameDir["total"] > 1
-                    and len(self.sameDir["tasks"]) > 1
-                ):
-                    break
-            else:
-                break
-            await sleep(0.2)
+        if self.sameDir:
+            # wait for the task that will upload the shared folder to be added
+            await wait_for_tasks(
+                lambda: self.sameDir["total"] in [1, 0]
+                or self.sameDir["total"] > 1
+                and len(self.sameDir["tasks"]) > 1
+            )
         async with download_dict_lock:
             if self.sameDir and self.sameDir["total"] > 1:
                 self.sameDir["tasks"].remove(self.uid)
@@ -275,6 +279,7 @@ class MirrorLeechListener:
             download = download_dict[self.uid]
             name = str(download.name()).replace("/", "")
             gid = download.gid()
+        await self.state.advance(TaskStage.DOWNLOADED)
         LOGGER.info(f"Download Completed: {name}")
         if multi_links:
             await self.onUploadError("Downloaded! Starting other part of the Task...")
@@ -311,17 +316,30 @@ class MirrorLeechListener:
                 if await aiopath.isfile(dl_path):
                     up_path = get_base_name(dl_path)
                 LOGGER.info(f"Extracting: {name}")
+                if self.suproc == "cancelled":
+                    return
+                stage = ArchiveStage(self, size)
                 async with download_dict_lock:
-                    download_dict[self.uid] = ExtractStatus(name, size, gid, self)
+                    download_dict[self.uid] = ExtractStatus(
+                        name, size, gid, self, stage
+                    )
                 if await aiopath.isdir(dl_path):
                     if self.seed:
                         self.newDir = f"{self.dir}10000"
                         up_path = f"{self.newDir}/{name}"
                     else:
                         up_path = dl_path
+                    jobs = []
+                    dirs = []
                     for dirpath, _, files in await sync_to_async(
                         walk, dl_path, topdown=False
                     ):
+                        t_path = (
+                            dirpath.replace(self.dir, self.newDir)
+                            if self.seed
+                            else dirpath
+                        )
+                        archives = 0
                         for file_ in files:
                             if (
                                 is_first_archive_split(file_)
@@ -329,11 +347,6 @@ class MirrorLeechListener:
                                 and not file_.endswith(".rar")
                             ):
                                 f_path = ospath.join(dirpath, file_)
-                                t_path = (
-                                    dirpath.replace(self.dir, self.newDir)
-                                    if self.seed
-                                    else dirpath
-                                )
                                 cmd = [
                                     "7z",
                                     "x",
@@ -345,23 +358,21 @@ class MirrorLeechListener:
                                 ]
                                 if not pswd:
                                     del cmd[2]
-                                if (
-                                    self.suproc == "cancelled"
-                                    or self.suproc is not None
-                                    and self.suproc.returncode == -9
-                                ):
-                                    return
-                                self.suproc = await create_subprocess_exec(*cmd)
-                                code = await self.suproc.wait()
-                                if code == -9:
-                                    return
-                                elif code != 0:
-                                    LOGGER.error("Unable to extract archive splits!")
-                        if (
-                            not self.seed
-                            and self.suproc is not None
-                            and self.suproc.returncode == 0
-                        ):
+                                jobs.append(
+                                    (cmd, await aiopath.getsize(f_path), t_path)
+                                )
+                                archives += 1
+                        if archives:
+                            dirs.append((dirpath, files, archives))
+                    # archives of different directories are extracted side by side
+                    codes = await stage.run_all(jobs)
+                    if -9 in codes:
+                        return
+                    for dirpath, files, archives in dirs:
+                        dir_codes, codes = codes[:archives], codes[archives:]
+                        if any(dir_codes):
+                            LOGGER.error("Unable to extract archive splits!")
+                        elif not self.seed:
                             for file_ in files:
                                 if is_archive_split(file_) or is_archive(file_):
                                     del_path = ospath.join(dirpath, file_)
@@ -384,10 +395,7 @@ class MirrorLeechListener:
                     ]
                     if not pswd:
                         del cmd[2]
-                    if self.suproc == "cancelled":
-                        return
-                    self.suproc = await create_subprocess_exec(*cmd)
-                    code = await self.suproc.wait()
+                    code = await stage.run(cmd, size)
                     if code == -9:
                         return
                     elif code == 0:
@@ -410,28 +418,31 @@ class MirrorLeechListener:
             meta_path = up_path or dl_path
             self.newDir = f"{self.dir}10000"
             await makedirs(self.newDir, exist_ok=True)
+            if self.suproc == "cancelled":
+                return
+            stage = MetadataStage(self, size)
             async with download_dict_lock:
-                download_dict[self.uid] = MetadataStatus(name, size, gid, self)
-            if (
-                await aiopath.isfile(meta_path)
-                and (await get_document_type(meta_path))[0]
-            ):
-                base_dir, file_name = ospath.split(meta_path)
-                outfile = ospath.join(self.newDir, file_name)
-                await edit_metadata(self, base_dir, meta_path, outfile, metadata)
-                if self.suproc == "cancelled":
-                    return
+                download_dict[self.uid] = MetadataStatus(name, size, gid, self, stage)
+            if await aiopath.isfile(meta_path):
+                paths = [meta_path]
             elif await aiopath.isdir(meta_path):
-                for dirpath, _, files in await sync_to_async(walk, meta_path):
-                    for file in files:
-                        if self.suproc == "cancelled":
-                            return
-                        video_file = ospath.join(dirpath, file)
-                        if (await get_document_type(video_file))[0]:
-                            outfile = ospath.join(self.newDir, file)
-                            await edit_metadata(
-                                self, dirpath, video_file, outfile, metadata
-                            )
+                paths = [
+                    ospath.join(dirpath, file)
+                    for dirpath, _, files in await sync_to_async(walk, meta_path)
+                    for file in files
+                ]
+            else:
+                paths = []
+            jobs = []
+            for n, video_file in enumerate(await stage.videos(paths)):
+                base_dir, file_name = ospath.split(video_file)
+                # files with the same name in different folders are remuxed at once
+                out_dir = ospath.join(self.newDir, str(n))
+                await makedirs(out_dir, exist_ok=True)
+                jobs.append((base_dir, video_file, ospath.join(out_dir, file_name)))
+            await stage.edit(jobs, metadata)
+            if stage.cancelled():
+                return
 
         if self.compress:
             pswd = self.compress if isinstance(self.compress, str) else ""
@@ -443,8 +454,11 @@ class MirrorLeechListener:
                 up_path = f"{self.newDir}/{name}.zip"
             else:
                 up_path = f"{dl_path}.zip"
+            if self.suproc == "cancelled":
+                return
+            stage = ArchiveStage(self, size)
             async with download_dict_lock:
-                download_dict[self.uid] = ZipStatus(name, size, gid, self)
+                download_dict[self.uid] = ZipStatus(name, size, gid, self, stage)
             LEECH_SPLIT_SIZE = (
                 user_dict.get("split_size", False) or config_dict["LEECH_SPLIT_SIZE"]
             )
@@ -457,6 +471,9 @@ class MirrorLeechListener:
                 up_path,
                 dl_path,
             ]
+            if level := config_dict["ARCHIVE_LEVEL"]:
+                cmd[3] = f"-mx={level}"
+                cmd.append(f"-mmt{archive_workers()}")
             for ext in GLOBAL_EXTENSION_FILTER:
                 ex_ext = f"-xr!*.{ext}"
                 cmd.append(ex_ext)
@@ -469,10 +486,7 @@ class MirrorLeechListener:
                 if not pswd:
                     del cmd[3]
                 LOGGER.info(f"Zip: orig_path: {dl_path}, zip_path: {up_path}")
-            if self.suproc == "cancelled":
-                return
-            self.suproc = await create_subprocess_exec(*cmd)
-            code = await self.suproc.wait()
+            code = await stage.run(cmd, size)
             if code == -9:
                 return
             elif not self.seed:
@@ -482,50 +496,8 @@ class MirrorLeechListener:
             up_path = dl_path
 
         up_dir, up_name = up_path.rsplit("/", 1)
-        size = await get_path_size(up_dir)
-        if self.isLeech:
-            m_size = []
-            o_files = []
-            if not self.compress:
-                checked = False
-                LEECH_SPLIT_SIZE = (
-                    user_dict.get("split_size", False)
-                    or config_dict["LEECH_SPLIT_SIZE"]
-                )
-                for dirpath, _, files in await sync_to_async(
-                    walk, up_dir, topdown=False
-                ):
-                    for file_ in files:
-                        f_path = ospath.join(dirpath, file_)
-                        f_size = await aiopath.getsize(f_path)
-                        if f_size > LEECH_SPLIT_SIZE:
-                            if not checked:
-                                checked = True
-                                async with download_dict_lock:
-                                    download_dict[self.uid] = SplitStatus(
-                                        up_name, size, gid, self
-                                    )
-                                LOGGER.info(f"Splitting: {up_name}")
-                            res = await split_file(
-                                f_path, f_size, file_, dirpath, LEECH_SPLIT_SIZE, self
-                            )
-                            if not res:
-                                return
-                            if res == "errored":
-                                if f_size <= MAX_SPLIT_SIZE:
-                                    continue
-                                try:
-                                    await aioremove(f_path)
-                                except Exception:
-                                    return
-                            elif not self.seed or self.newDir:
-                                try:
-                                    await aioremove(f_path)
-                                except Exception:
-                                    return
-                            else:
-                                m_size.append(f_size)
-                                o_files.append(file_)
+        tree = await get_tree(up_dir)
+        size = tree.size
 
         up_limit = config_dict["QUEUE_UPLOAD"]
         all_limit = config_dict["QUEUE_ALL"]
@@ -538,8 +510,7 @@ class MirrorLeechListener:
             ) or (up_limit and up >= up_limit):
                 added_to_queue = True
                 LOGGER.info(f"Added to Queue/Upload: {name}")
-                event = Event()
-                queued_up[self.uid] = event
+                event = queued_up.add(self.uid, self, size)
         if added_to_queue:
             async with download_dict_lock:
                 download_dict[self.uid] = QueueStatus(name, size, gid, self, "Up")
@@ -548,12 +519,19 @@ class MirrorLeechListener:
                 if self.uid not in download_dict:
                     return
             LOGGER.info(f"Start from Queued/Upload: {name}")
+        # the upload holds its slot while it waits for bandwidth, so no other
+        # task is started from the queue in its place
         async with queue_dict_lock:
             non_queued_up.add(self.uid)
+        if not await bandwidth.admit_upload(wait=False):
+            LOGGER.info(f"Waiting for upload bandwidth: {name}")
+            async with download_dict_lock:
+                download_dict[self.uid] = QueueStatus(name, size, gid, self, "Up")
+            await bandwidth.admit_upload()
+            async with download_dict_lock:
+                if self.uid not in download_dict:
+                    return
         if self.isLeech:
-            size = await get_path_size(up_dir)
-            for s in m_size:
-                size = size - s
             LOGGER.info(f"Leech Name: {up_name}")
             tg = TgUploader(up_name, up_dir, self)
             tg_upload_status = TelegramStatus(
@@ -562,9 +540,13 @@ class MirrorLeechListener:
             async with download_dict_lock:
                 download_dict[self.uid] = tg_upload_status
             await update_all_messages()
-            await tg.upload(o_files, m_size, size)
+            if self.compress:
+                await tg.upload([], [], size, tree=tree)
+            else:
+                await self.__split_and_upload(tg, tree, user_dict)
         elif self.upPath == "gd":
-            size = await get_path_size(up_path)
+            tree = tree.subtree(up_path)
+            size = tree.size
             LOGGER.info(f"Upload Name: {up_name}")
             drive = GoogleDriveHelper(up_name, up_dir, self)
             upload_status = GdriveStatus(
@@ -574,9 +556,9 @@ class MirrorLeechListener:
                 download_dict[self.uid] = upload_status
             await update_all_messages()
 
-            await sync_to_async(drive.upload, up_name, size, self.drive_id)
+            await sync_to_async(drive.upload, up_name, size, self.drive_id, tree)
         elif self.upPath == "ddl":
-            size = await get_path_size(up_path)
+            size = tree.subtree(up_path).size
             LOGGER.info(f"Upload Name: {up_name} via DDL")
             ddl = DDLUploader(self, up_name, up_dir)
             ddl_upload_status = DDLStatus(
@@ -587,7 +569,8 @@ class MirrorLeechListener:
             await update_all_messages()
             await ddl.upload(up_name, size)
         else:
-            size = await get_path_size(up_path)
+            tree = tree.subtree(up_path)
+            size = tree.size
             LOGGER.info(f"Upload Name: {up_name} via RClone")
             RCTransfer = RcloneTransferHelper(self, up_name)
             async with download_dict_lock:
@@ -595,7 +578,84 @@ class MirrorLeechListener:
                     RCTransfer, self.message, gid, "up", self.upload_details
                 )
             await update_all_messages()
-            await RCTransfer.upload(up_path, size)
+            await RCTransfer.upload(up_path, size, tree)
+
+    async def __split_and_upload(self, tg, tree, user_dict):
+        LEECH_SPLIT_SIZE = (
+            user_dict.get("split_size", False) or config_dict["LEECH_SPLIT_SIZE"]
+        )
+        m_size = []
+        o_files = []
+        queue = Queue(maxsize=1)
+
+        async def add_file(f_path):
+            await queue.put(f_path.rsplit("/", 1))
+            # the next part is cut only once this one is being uploaded
+            await queue.join()
+
+        async def split_files():
+            oversized = set(tree.oversized(LEECH_SPLIT_SIZE))
+            for entry in tree.files:
+                dirpath, file_, f_size = entry
+                if dirpath.endswith("/yt-dlp-thumb"):
+                    continue
+                f_path = ospath.join(dirpath, file_)
+                if entry not in oversized:
+                    await add_file(f_path)
+                    continue
+                LOGGER.info(f"Splitting: {f_path}")
+                res = await split_file(
+                    f_path,
+                    f_size,
+                    file_,
+                    dirpath,
+                    LEECH_SPLIT_SIZE,
+                    self,
+                    on_part=add_file,
+                )
+                if not res:
+                    return
+                if res == "errored":
+                    if f_size <= MAX_SPLIT_SIZE:
+                        await add_file(f_path)
+                        continue
+                    await aioremove(f_path)
+                elif not self.seed or self.newDir:
+                    await aioremove(f_path)
+                else:
+                    m_size.append(f_size)
+                    o_files.append(file_)
+
+        error = None
+
+        async def splitter():
+            nonlocal error
+            try:
+                await split_files()
+            except Exception as e:
+                LOGGER.error(f"Split failed: {e}")
+                error = e
+            await queue.put(None)
+
+        async def parts():
+            while (item := await queue.get()) is not None:
+                queue.task_done()
+                yield item
+            if error is not None:
+                # the upload must not be reported complete with parts missing
+                raise error
+
+        task = create_task(splitter())
+        try:
+            await tg.upload(o_files, m_size, tree.size, parts())
+        finally:
+            if not task.done():
+                # upload stopped early, stop cutting parts as well
+                if self.suproc is not None and self.suproc != "cancelled":
+                    with suppress(Exception):
+                        self.suproc.kill()
+                self.suproc = "cancelled"
+                task.cancel()
 
     async def onUploadComplete(
         self, link, size, files, folders, mime_type, name, rclonePath="", private=False
@@ -608,6 +668,10 @@ class MirrorLeechListener:
             await DbManger().rm_complete_task(self.message.link)
         user_id = self.message.from_user.id
         name, _ = await format_filename(name, user_id, isMirror=not self.isLeech)
+        if not self.isLeech and not rclonePath and isinstance(link, str):
+            await index_uploaded_item(
+                link, name, size, mime_type, self.drive_id or config_dict["GDRIVE_ID"]
+            )
         user_dict = user_data.get(user_id, {})
         msg = BotTheme(
             "NAME",
@@ -891,6 +955,7 @@ class MirrorLeechListener:
             if self.uid in download_dict.keys():
                 del download_dict[self.uid]
             count = len(download_dict)
+        await self.state.advance(TaskStage.FINISHED)
         if count == 0:
             await self.clean()
         else:
@@ -911,6 +976,7 @@ class MirrorLeechListener:
             if self.sameDir and self.uid in self.sameDir["tasks"]:
                 self.sameDir["tasks"].remove(self.uid)
                 self.sameDir["total"] -= 1
+        await self.state.advance(TaskStage.FINISHED)
         msg = f"""<i><b>Download Stopped!</b></i>
 ┠ <b>Task for:</b> {self.tag}
 ┃
@@ -931,12 +997,8 @@ class MirrorLeechListener:
             await DbManger().rm_complete_task(self.message.link)
 
         async with queue_dict_lock:
-            if self.uid in queued_dl:
-                queued_dl[self.uid].set()
-                del queued_dl[self.uid]
-            if self.uid in queued_up:
-                queued_up[self.uid].set()
-                del queued_up[self.uid]
+            queued_dl.remove(self.uid)
+            queued_up.remove(self.uid)
             if self.uid in non_queued_dl:
                 non_queued_dl.remove(self.uid)
             if self.uid in non_queued_up:
@@ -953,6 +1015,7 @@ class MirrorLeechListener:
             if self.uid in download_dict.keys():
                 del download_dict[self.uid]
             count = len(download_dict)
+        await self.state.advance(TaskStage.FINISHED)
         msg = f"""<i><b>Upload Stopped!</b></i>
 ┠ <b>Task for:</b> {self.tag}
 ┃
@@ -973,12 +1036,8 @@ class MirrorLeechListener:
             await DbManger().rm_complete_task(self.message.link)
 
         async with queue_dict_lock:
-            if self.uid in queued_dl:
-                queued_dl[self.uid].set()
-                del queued_dl[self.uid]
-            if self.uid in queued_up:
-                queued_up[self.uid].set()
-                del queued_up[self.uid]
+            queued_dl.remove(self.uid)
+            queued_up.remove(self.uid)
             if self.uid in non_queued_dl:
                 non_queued_dl.remove(self.uid)
             if self.uid in non_queued_up:
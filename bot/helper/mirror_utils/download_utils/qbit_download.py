@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 from time import time
+from asyncio import sleep
 from aiofiles.os import remove as aioremove, path as aiopath
 
 from bot import (
     download_dict,
     download_dict_lock,
-    get_client,
     LOGGER,
     config_dict,
     non_queued_dl,
@@ -20,6 +20,7 @@ from bot.helper.telegram_helper.message_utils import (
 from bot.helper.ext_utils.bot_utils import bt_selection_buttons, sync_to_async
 from bot.helper.listeners.qbit_listener import onDownloadStart
 from bot.helper.ext_utils.task_manager import is_queued
+from bot.helper.ext_utils.qbit_utils import qb_state
 
 
 """
@@ -43,7 +44,7 @@ def __get_hash_file(path):
 
 
 async def add_qb_torrent(link, path, listener, ratio, seed_time):
-    client = await sync_to_async(get_client)
+    client = qb_state.client
     ADD_TIME = time()
     try:
         url = link
@@ -51,7 +52,7 @@ async def add_qb_torrent(link, path, listener, ratio, seed_time):
         if await aiopath.exists(link):
             url = None
             tpath = link
-        added_to_queue, event = await is_queued(listener.uid)
+        added_to_queue, event = await is_queued(listener)
         op = await sync_to_async(
             client.torrents_add,
             url,
@@ -64,19 +65,16 @@ async def add_qb_torrent(link, path, listener, ratio, seed_time):
             headers={"user-agent": "Wget/1.12"},
         )
         if op.lower() == "ok.":
-            tor_info = await sync_to_async(client.torrents_info, tag=f"{listener.uid}")
-            if len(tor_info) == 0:
-                while True:
-                    tor_info = await sync_to_async(
-                        client.torrents_info, tag=f"{listener.uid}"
-                    )
-                    if len(tor_info) > 0:
-                        break
-                    elif time() - ADD_TIME >= 120:
-                        msg = "Not added! Check if the link is valid or not. If it's torrent file then report, this happens if torrent file size above 10mb."
-                        await sendMessage(listener.message, msg)
-                        return
-            tor_info = tor_info[0]
+            while (
+                tor_info := await sync_to_async(
+                    qb_state.get, f"{listener.uid}", refresh=True
+                )
+            ) is None:
+                if time() - ADD_TIME >= 120:
+                    msg = "Not added! Check if the link is valid or not. If it's torrent file then report, this happens if torrent file size above 10mb."
+                    await sendMessage(listener.message, msg)
+                    return
+                await sleep(0.5)
             ext_hash = tor_info.hash
         else:
             await sendMessage(
@@ -105,24 +103,19 @@ async def add_qb_torrent(link, path, listener, ratio, seed_time):
                 metamsg = "Downloading Metadata, wait then you can select files. Use torrent file to avoid this wait."
                 meta = await sendMessage(listener.message, metamsg)
                 while True:
-                    tor_info = await sync_to_async(
-                        client.torrents_info, tag=f"{listener.uid}"
-                    )
-                    if len(tor_info) == 0:
+                    # the qbit listener keeps the cached state fresh
+                    tor_info = await sync_to_async(qb_state.get, f"{listener.uid}")
+                    if tor_info is None:
                         await deleteMessage(meta)
                         return
-                    try:
-                        tor_info = tor_info[0]
-                        if tor_info.state not in [
-                            "metaDL",
-                            "checkingResumeData",
-                            "pausedDL",
-                        ]:
-                            await deleteMessage(meta)
-                            break
-                    except Exception:
+                    if tor_info.state not in [
+                        "metaDL",
+                        "checkingResumeData",
+                        "pausedDL",
+                    ]:
                         await deleteMessage(meta)
-                        return
+                        break
+                    await sleep(1)
 
             ext_hash = tor_info.hash
             if not added_to_queue:
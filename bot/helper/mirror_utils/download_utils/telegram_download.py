@@ -14,6 +14,8 @@ from bot import (
     user,
     IS_PREMIUM_USER,
 )
+from bot.helper.ext_utils.bot_utils import sync_to_async
+from bot.helper.ext_utils.hash_utils import FileHasher, caption_hashes
 from bot.helper.mirror_utils.status_utils.telegram_status import TelegramStatus
 from bot.helper.mirror_utils.status_utils.queue_status import QueueStatus
 from bot.helper.telegram_helper.message_utils import (
@@ -43,6 +45,9 @@ class TelegramDownloadHelper:
         self.__decrypter = None
         self.__id = ""
         self.__is_cancelled = False
+        self.__hasher = None
+        self.__hash_path = ""
+        self.__hash_job = None
 
     @property
     def speed(self):
@@ -79,6 +84,10 @@ class TelegramDownloadHelper:
         if self.__is_cancelled:
             self.__client.stop_transmission()
         self.__processed_bytes = current
+        if self.__hasher and (self.__hash_job is None or self.__hash_job.done()):
+            self.__hash_job = await sync_to_async(
+                self.__hasher.feed, self.__hash_path, current, wait=False
+            )
 
     async def __onDownloadError(self, error):
         async with global_lock:
@@ -93,7 +102,17 @@ class TelegramDownloadHelper:
         async with global_lock:
             GLOBAL_GID.remove(self.__id)
 
+    async def __hash_download(self, path):
+        if self.__hash_job is not None:
+            await self.__hash_job
+        await sync_to_async(self.__hasher.feed, path)
+        await sync_to_async(self.__hasher.store, path)
+
     async def __download(self, message, path):
+        if self.__listener.isLeech:
+            # pyrogram writes to a .temp file and moves it once complete
+            self.__hasher = FileHasher(caption_hashes(self.__listener.user_id))
+            self.__hash_path = f"{path}{self.name if path.endswith('/') else ''}.temp"
         try:
             if self.__client is None and self.__decrypter is not None:
                 try:
@@ -126,6 +145,8 @@ class TelegramDownloadHelper:
             await self.__onDownloadError(str(e))
             return
         if download is not None:
+            if self.__hasher:
+                await self.__hash_download(download)
             await self.__onDownloadComplete()
         elif not self.__is_cancelled:
             await self.__onDownloadError("Internal Error occurred")
@@ -166,7 +187,7 @@ class TelegramDownloadHelper:
                     await sendMessage(self.__listener.message, limit_exceeded)
                     await delete_links(self.__listener.message)
                     return
-                added_to_queue, event = await is_queued(self.__listener.uid)
+                added_to_queue, event = await is_queued(self.__listener, size)
                 if added_to_queue:
                     LOGGER.info(f"Added to Queue/Download: {name}")
                     async with download_dict_lock:
@@ -10,7 +10,7 @@ from logging import getLogger
 
 from bot import config_dict, GLOBAL_EXTENSION_FILTER
 from bot.helper.ext_utils.bot_utils import cmd_exec, sync_to_async
-from bot.helper.ext_utils.fs_utils import get_mime_type, count_files_and_folders
+from bot.helper.ext_utils.fs_utils import get_mime_type, get_tree
 
 
 LOGGER = getLogger(__name__)
@@ -266,7 +266,7 @@ class RcloneTransferHelper:
         else:
             return True
 
-    async def upload(self, path, size):
+    async def upload(self, path, size, tree=None):
         self.__is_upload = True
         rc_path = self.__listener.upPath.strip("/")
         if rc_path.startswith("mrcc:"):
@@ -279,7 +279,8 @@ class RcloneTransferHelper:
 
         if await aiopath.isdir(path):
             mime_type = "Folder"
-            folders, files = await count_files_and_folders(path)
+            tree = tree or await get_tree(path)
+            folders, files = len(tree.folders), tree.file_count
             rc_path += f"/{self.name}" if rc_path else self.name
         else:
             if path.lower().endswith(tuple(GLOBAL_EXTENSION_FILTER)):
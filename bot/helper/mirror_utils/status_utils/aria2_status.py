@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 from time import time
+from aria2p import Download
 
 from bot import aria2, LOGGER
 from bot.helper.ext_utils.bot_utils import (
@@ -8,11 +9,12 @@ from bot.helper.ext_utils.bot_utils import (
     get_readable_time,
     sync_to_async,
 )
+from bot.helper.ext_utils.aria2_utils import aria2_state
 
 
-def get_download(gid):
+def get_status(gid):
     try:
-        return aria2.get_download(gid)
+        return aria2.client.tell_status(gid)
     except Exception as e:
         LOGGER.error(f"{e}: Aria2c, Error while getting torrent info")
         return None
@@ -22,7 +24,9 @@ class Aria2Status:
 
     def __init__(self, gid, listener, seeding=False, queued=False):
         self.__gid = gid
-        self.__download = get_download(gid)
+        self.__struct = {}
+        self.__download = None
+        self.__fetch()
         self.__listener = listener
         self.upload_details = self.__listener.upload_details
         self.queued = queued
@@ -30,14 +34,21 @@ class Aria2Status:
         self.seeding = seeding
         self.message = self.__listener.message
 
+    def __fetch(self):
+        if (struct := get_status(self.__gid)) is not None:
+            self.__struct = struct
+            self.__download = Download(aria2, struct)
+
     def __update(self):
         if self.__download is None:
-            self.__download = get_download(self.__gid)
-        else:
-            self.__download = self.__download.live
+            self.__fetch()
+        elif (struct := aria2_state.get(self.__gid)) is not None:
+            # only the changing fields come from the shared multicall
+            self.__struct.update(struct)
+            self.__download = Download(aria2, self.__struct)
         if self.__download.followed_by_ids:
             self.__gid = self.__download.followed_by_ids[0]
-            self.__download = get_download(self.__gid)
+            self.__fetch()
 
     def progress(self):
         return self.__download.progress_string()
@@ -45,6 +56,9 @@ class Aria2Status:
     def processed_bytes(self):
         return self.__download.completed_length_string()
 
+    def speed_raw(self):
+        return self.__download.download_speed
+
     def speed(self):
         return self.__download.download_speed_string()
 
@@ -83,6 +97,9 @@ class Aria2Status:
     def uploaded_bytes(self):
         return self.__download.upload_length_string()
 
+    def upload_speed_raw(self):
+        return self.__download.upload_speed
+
     def upload_speed(self):
         self.__update()
         return self.__download.upload_speed_string()
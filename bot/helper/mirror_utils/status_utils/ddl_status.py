@@ -33,6 +33,9 @@ class DDLStatus:
             progress_raw = 0
         return f"{round(progress_raw, 2)}%"
 
+    def speed_raw(self):
+        return self.__obj.speed
+
     def speed(self):
         return f"{get_readable_file_size(self.__obj.speed)}/s"
 
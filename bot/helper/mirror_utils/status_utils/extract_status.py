@@ -13,8 +13,9 @@ from bot.helper.ext_utils.fs_utils import get_path_size
 
 
 class ExtractStatus:
-    def __init__(self, name, size, gid, listener):
+    def __init__(self, name, size, gid, listener, stage=None):
         self.__name = name
+        self.__stage = stage
         self.__size = size
         self.__gid = gid
         self.__listener = listener
@@ -61,6 +62,8 @@ class ExtractStatus:
         return get_readable_file_size(self.processed_raw())
 
     def processed_raw(self):
+        if self.__stage is not None:
+            return self.__stage.processed_bytes
         if self.__listener.newDir:
             return async_to_sync(get_path_size, self.__listener.newDir)
         else:
@@ -45,6 +45,9 @@ class GdriveStatus:
     def progress(self):
         return f"{round(self.progress_raw(), 2)}%"
 
+    def speed_raw(self):
+        return self.__obj.speed
+
     def speed(self):
         return f"{get_readable_file_size(self.__obj.speed)}/s"
 
@@ -45,6 +45,9 @@ class MegaDownloadStatus:
     def size(self):
         return get_readable_file_size(self.__size)
 
+    def speed_raw(self):
+        return self.__obj.speed
+
     def speed(self):
         return f"{get_readable_file_size(self.__obj.speed)}/s"
 
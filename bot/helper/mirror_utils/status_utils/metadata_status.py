@@ -1,45 +1,63 @@
 #!/usr/bin/env python3
+from time import time
 
 from bot import LOGGER
 from bot.helper.ext_utils.bot_utils import (
     EngineStatus,
     get_readable_file_size,
     MirrorStatus,
+    get_readable_time,
 )
 
 
 class MetadataStatus:
-    def __init__(self, name, size, gid, listener):
+    def __init__(self, name, size, gid, listener, stage):
         self.__name = name
         self.__gid = gid
         self.__size = size
         self.__listener = listener
+        self.__stage = stage
+        self.__start_time = time()
         self.upload_details = listener.upload_details
         self.message = listener.message
 
     def gid(self):
         return self.__gid
 
+    def speed_raw(self):
+        return self.__stage.processed_bytes / (time() - self.__start_time)
+
+    def progress_raw(self):
+        try:
+            return self.__stage.processed_bytes / self.__size * 100
+        except Exception:
+            return 0
+
     def progress(self):
-        return "0"
+        return f"{round(self.progress_raw(), 2)}%"
 
     def speed(self):
-        return "0"
+        return f"{get_readable_file_size(self.speed_raw())}/s"
 
     def name(self):
-        return self.__name
+        done, total = self.__stage.files
+        return f"{self.__name} [{done}/{total}]" if total > 1 else self.__name
 
     def size(self):
         return get_readable_file_size(self.__size)
 
     def eta(self):
-        return "0s"
+        try:
+            seconds = (self.__size - self.__stage.processed_bytes) / self.speed_raw()
+            return get_readable_time(seconds)
+        except Exception:
+            return "-"
 
     def status(self):
         return MirrorStatus.STATUS_METADATA
 
     def processed_bytes(self):
-        return 0
+        return get_readable_file_size(self.__stage.processed_bytes)
 
     def download(self):
         return self
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 from asyncio import sleep
 
-from bot import LOGGER, get_client, QbTorrents, qb_listener_lock
+from bot import LOGGER, QbTorrents, qb_listener_lock
 from bot.helper.ext_utils.bot_utils import (
     EngineStatus,
     MirrorStatus,
@@ -9,29 +9,30 @@ from bot.helper.ext_utils.bot_utils import (
     get_readable_time,
     sync_to_async,
 )
+from bot.helper.ext_utils.qbit_utils import qb_state
 
 
-def get_download(client, tag):
-    try:
-        return client.torrents_info(tag=tag)[0]
-    except Exception as e:
-        LOGGER.error(f"{e}: Qbittorrent, while getting torrent info. Tag: {tag}")
-        return None
+def get_download(tag):
+    if (tor := qb_state.get(tag)) is None:
+        LOGGER.error(f"Qbittorrent, torrent not found while getting info. Tag: {tag}")
+    return tor
 
 
 class QbittorrentStatus:
 
     def __init__(self, listener, seeding=False, queued=False):
-        self.__client = get_client()
+        self.__client = qb_state.client
         self.__listener = listener
         self.upload_details = listener.upload_details
-        self.__info = get_download(self.__client, f"{self.__listener.uid}")
+        self.__info = get_download(f"{self.__listener.uid}")
         self.queued = queued
         self.seeding = seeding
         self.message = listener.message
 
     def __update(self):
-        new_info = get_download(self.__client, f"{self.__listener.uid}")
+        # refreshed once per tick by the qbit listener, a removed torrent keeps
+        # its last info until the listener drops the task
+        new_info = qb_state.get(f"{self.__listener.uid}")
         if new_info is not None:
             self.__info = new_info
 
@@ -41,6 +42,9 @@ class QbittorrentStatus:
     def processed_bytes(self):
         return get_readable_file_size(self.__info.downloaded)
 
+    def speed_raw(self):
+        return self.__info.dlspeed
+
     def speed(self):
         return f"{get_readable_file_size(self.__info.dlspeed)}/s"
 
@@ -81,6 +85,9 @@ class QbittorrentStatus:
     def uploaded_bytes(self):
         return get_readable_file_size(self.__info.uploaded)
 
+    def upload_speed_raw(self):
+        return self.__info.upspeed
+
     def upload_speed(self):
         return f"{get_readable_file_size(self.__info.upspeed)}/s"
 
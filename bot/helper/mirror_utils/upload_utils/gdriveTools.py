@@ -6,11 +6,15 @@ from os import makedirs, path as ospath, listdir, remove as osremove
 from io import FileIO
 from re import search as re_search
 from urllib.parse import parse_qs, urlparse, quote as rquote
-from random import randrange
+from functools import partial
+from threading import Lock, local
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, ALL_COMPLETED, wait
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload, build_http
 from tenacity import (
     retry,
     wait_exponential,
@@ -26,17 +30,210 @@ from bot.helper.ext_utils.bot_utils import (
     get_readable_file_size,
     fetch_user_tds,
 )
-from bot.helper.ext_utils.fs_utils import get_mime_type
+from bot.helper.ext_utils.fs_utils import get_mime_type, scan_tree
 from bot.helper.ext_utils.leech_utils import format_filename
 
 LOGGER = getLogger(__name__)
 getLogger("googleapiclient.discovery").setLevel(ERROR)
 
 
+class FolderCache:
+    """Per-drive folder id -> (name, parent) map with TTL and LRU eviction"""
+
+    def __init__(self, max_size=50000, ttl=1800):
+        self.__max_size = max_size
+        self.__ttl = ttl
+        self.__items = OrderedDict()
+        self.__lock = Lock()
+
+    def get(self, drive_id, folder_id):
+        key = (drive_id, folder_id)
+        with self.__lock:
+            if (item := self.__items.get(key)) is None:
+                return None
+            if item[2] < time():
+                del self.__items[key]
+                return None
+            self.__items.move_to_end(key)
+            return item[0], item[1]
+
+    def set(self, drive_id, folder_id, name, parent):
+        key = (drive_id, folder_id)
+        with self.__lock:
+            self.__items[key] = (name, parent, time() + self.__ttl)
+            self.__items.move_to_end(key)
+            while len(self.__items) > self.__max_size:
+                self.__items.popitem(last=False)
+
+    def fill(self, drive_id, files):
+        for file in files:
+            if parents := file.get("parents"):
+                self.set(drive_id, file["id"], file.get("name"), parents[0])
+
+
+folder_cache = FolderCache()
+
+
+class DriveServicePool:
+    """Authorized Drive services shared per credential, one HTTP transport per thread"""
+
+    def __init__(self, max_per_thread=4):
+        self.__max_per_thread = max_per_thread
+        self.__lock = Lock()
+        self.__local = local()
+        self.__accounts = None
+        self.__credentials = {}
+        self.__generation = 0
+
+    def accounts(self):
+        with self.__lock:
+            if self.__accounts is None:
+                self.__accounts = listdir("accounts")
+            return self.__accounts
+
+    def clear(self):
+        with self.__lock:
+            self.__accounts = None
+            self.__credentials.clear()
+            self.__generation += 1
+
+    def __get_credentials(self, sa_index):
+        with self.__lock:
+            if (credentials := self.__credentials.get(sa_index)) is not None:
+                return credentials, self.__generation
+            if sa_index is not None:
+                if self.__accounts is None:
+                    self.__accounts = listdir("accounts")
+                credentials = service_account.Credentials.from_service_account_file(
+                    f"accounts/{self.__accounts[sa_index]}",
+                    scopes=["https://www.googleapis.com/auth/drive"],
+                )
+            elif ospath.exists("token.pickle"):
+                with open("token.pickle", "rb") as f:
+                    credentials = pload(f)
+            else:
+                LOGGER.error("token.pickle not found!")
+                return None, self.__generation
+            self.__credentials[sa_index] = credentials
+            return credentials, self.__generation
+
+    def get(self, sa_index=None):
+        """sa_index None means token.pickle"""
+        if (services := getattr(self.__local, "services", None)) is None:
+            services = self.__local.services = OrderedDict()
+        credentials, generation = self.__get_credentials(sa_index)
+        key = (generation, sa_index)
+        if (service := services.get(key)) is None:
+            if credentials is None:
+                return build("drive", "v3", credentials=None, cache_discovery=False)
+            service = build(
+                "drive",
+                "v3",
+                http=AuthorizedHttp(credentials, http=build_http()),
+                cache_discovery=False,
+            )
+            services[key] = service
+            while len(services) > self.__max_per_thread:
+                services.popitem(last=False)[1].close()
+        services.move_to_end(key)
+        return service
+
+
+service_pool = DriveServicePool()
+
+
+class ServiceAccountScheduler:
+    """Rolling 24h usage per service account, hands out the least used healthy one"""
+
+    def __init__(self, window=86400):
+        self.__window = window
+        self.__lock = Lock()
+        self.__usage = {}
+        self.__exhausted = {}
+        self.__handed = {}
+
+    def __used(self, name, now):
+        usage = self.__usage.get(name)
+        while usage and usage[0][0] < now - self.__window:
+            usage.popleft()
+        if not usage:
+            return 0, 0
+        return sum(item[1] for item in usage), sum(item[2] for item in usage)
+
+    def acquire(self, exclude=None):
+        accounts = service_pool.accounts()
+        now = time()
+
+        def rank(index):
+            name = accounts[index]
+            until = self.__exhausted.get(name, 0)
+            # accounts within the same GiB of usage are rotated, not reused
+            return (
+                until if until > now else 0,
+                self.__used(name, now)[0] >> 30,
+                self.__handed.get(name, 0),
+            )
+
+        with self.__lock:
+            candidates = [
+                index
+                for index in range(len(accounts))
+                if index != exclude or len(accounts) == 1
+            ]
+            index = min(candidates, key=rank)
+            self.__handed[accounts[index]] = now
+            return index
+
+    def record(self, index, size, copies=0):
+        accounts = service_pool.accounts()
+        if index is None or index >= len(accounts):
+            return
+        hour = int(time()) // 3600 * 3600
+        with self.__lock:
+            usage = self.__usage.setdefault(accounts[index], deque())
+            if usage and usage[-1][0] == hour:
+                usage[-1][1] += size
+                usage[-1][2] += copies
+            else:
+                usage.append([hour, size, copies])
+
+    def mark_exhausted(self, index):
+        accounts = service_pool.accounts()
+        with self.__lock:
+            self.__exhausted[accounts[index]] = time() + self.__window
+        LOGGER.info(f"Service account {accounts[index]} marked as exhausted")
+
+    def clear(self):
+        with self.__lock:
+            self.__usage.clear()
+            self.__exhausted.clear()
+            self.__handed.clear()
+
+    def stats(self):
+        accounts = service_pool.accounts()
+        now = time()
+        with self.__lock:
+            stats = []
+            for name in accounts:
+                size, copies = self.__used(name, now)
+                until = self.__exhausted.get(name, 0)
+                stats.append(
+                    {
+                        "name": name,
+                        "size": size,
+                        "copies": copies,
+                        "exhausted": until - now if until > now else 0,
+                    }
+                )
+            return stats
+
+
+sa_scheduler = ServiceAccountScheduler()
+
+
 class GoogleDriveHelper:
 
     def __init__(self, name=None, path=None, listener=None):
-        self.__OAUTH_SCOPE = ["https://www.googleapis.com/auth/drive"]
         self.__G_DRIVE_DIR_MIME_TYPE = "application/vnd.google-apps.folder"
         self.__G_DRIVE_BASE_DOWNLOAD_URL = (
             "https://drive.google.com/uc?id={}&export=download"
@@ -47,6 +244,7 @@ class GoogleDriveHelper:
         self.__listener = listener
         self.__user_id = listener.message.from_user.id if listener else None
         self.__path = path
+        self.__listing = {}
         self.__total_bytes = 0
         self.__total_files = 0
         self.__total_folders = 0
@@ -65,7 +263,14 @@ class GoogleDriveHelper:
         self.__sa_index = 0
         self.__sa_count = 1
         self.__sa_number = 100
-        self.__service = self.__authorize()
+        self.__sa_lock = Lock()
+        self.__progress_lock = Lock()
+        self.__thread_data = local()
+        self.__batch_size = 100
+        self.__pending_permissions = []
+        self.__upload_rate = 0
+        self.__token_auth = False
+        self.__authorize()
         self.__file_processed_bytes = 0
         self.__processed_bytes = 0
         self.name = name
@@ -82,47 +287,52 @@ class GoogleDriveHelper:
         return self.__processed_bytes
 
     def __authorize(self):
-        credentials = None
         if config_dict["USE_SERVICE_ACCOUNTS"]:
-            json_files = listdir("accounts")
+            json_files = service_pool.accounts()
             self.__sa_number = len(json_files)
-            self.__sa_index = randrange(self.__sa_number)
+            self.__sa_index = sa_scheduler.acquire()
             LOGGER.info(
                 f"Authorizing with {json_files[self.__sa_index]} service account"
             )
-            credentials = service_account.Credentials.from_service_account_file(
-                f"accounts/{json_files[self.__sa_index]}", scopes=self.__OAUTH_SCOPE
-            )
-        elif ospath.exists("token.pickle"):
-            LOGGER.info("Authorize with token.pickle")
-            with open("token.pickle", "rb") as f:
-                credentials = pload(f)
         else:
-            LOGGER.error("token.pickle not found!")
-        return build("drive", "v3", credentials=credentials, cache_discovery=False)
+            LOGGER.info("Authorize with token.pickle")
+            self.__token_auth = True
+
+    def __get_service(self):
+        if getattr(self.__thread_data, "is_worker", False):
+            self.__thread_data.sa_index = self.__sa_index
+        return service_pool.get(None if self.__token_auth else self.__sa_index)
 
     def __alt_authorize(self):
         if not self.__alt_auth:
             self.__alt_auth = True
             if ospath.exists("token.pickle"):
                 LOGGER.info("Authorize with token.pickle")
-                with open("token.pickle", "rb") as f:
-                    credentials = pload(f)
-                return build(
-                    "drive", "v3", credentials=credentials, cache_discovery=False
-                )
+                self.__token_auth = True
+                return self.__get_service()
             else:
                 LOGGER.error("token.pickle not found!")
         return None
 
-    def __switchServiceAccount(self):
-        if self.__sa_index == self.__sa_number - 1:
-            self.__sa_index = 0
-        else:
-            self.__sa_index += 1
-        self.__sa_count += 1
-        LOGGER.info(f"Switching to {self.__sa_index} index")
-        self.__service = self.__authorize()
+    def __switchServiceAccount(self, exhausted=True):
+        with self.__sa_lock:
+            if (
+                getattr(self.__thread_data, "sa_index", self.__sa_index)
+                != self.__sa_index
+            ):
+                # another worker already moved away from this account
+                return
+            if exhausted:
+                sa_scheduler.mark_exhausted(self.__sa_index)
+            self.__sa_index = sa_scheduler.acquire(exclude=self.__sa_index)
+            self.__sa_count += 1
+            LOGGER.info(f"Switching to {self.__sa_index} index")
+
+    def __record_usage(self, size, copies=0):
+        if config_dict["USE_SERVICE_ACCOUNTS"] and not self.__token_auth:
+            sa_scheduler.record(
+                getattr(self.__thread_data, "sa_index", self.__sa_index), size, copies
+            )
 
     @staticmethod
     def getIdFromUrl(link):
@@ -143,7 +353,8 @@ class GoogleDriveHelper:
     def getFolderData(self, file_id):
         try:
             meta = (
-                self.__service.files()
+                self.__get_service()
+                .files()
                 .get(fileId=file_id, supportsAllDrives=True)
                 .execute()
             )
@@ -165,11 +376,65 @@ class GoogleDriveHelper:
             "withLink": True,
         }
         return (
-            self.__service.permissions()
+            self.__get_service()
+            .permissions()
             .create(fileId=file_id, body=permissions, supportsAllDrives=True)
             .execute()
         )
 
+    def __execute_batch(self, requests):
+        results = {}
+        failed = []
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = response
+            else:
+                failed.append(request_id)
+
+        service = self.__get_service()
+        for i in range(0, len(requests), self.__batch_size):
+            if self.__is_cancelled:
+                return results
+            chunk = requests[i : i + self.__batch_size]
+            batch = service.new_batch_http_request(callback=callback)
+            for request_id, request, _ in chunk:
+                batch.add(request, request_id=request_id)
+            try:
+                batch.execute()
+            except Exception as err:
+                LOGGER.error(f"Batch request failed: {err}")
+                failed.extend(request_id for request_id, _, _ in chunk)
+        # failed items go through the single request path with its own retry
+        fallbacks = {request_id: fallback for request_id, _, fallback in requests}
+        for request_id in dict.fromkeys(failed):
+            if self.__is_cancelled:
+                break
+            if request_id not in results:
+                results[request_id] = fallbacks[request_id]()
+        return results
+
+    def __set_permissions(self, file_ids):
+        permissions = {
+            "role": "reader",
+            "type": "anyone",
+            "value": None,
+            "withLink": True,
+        }
+        service = self.__get_service()
+        self.__execute_batch(
+            [
+                (
+                    str(index),
+                    service.permissions().create(
+                        fileId=file_id, body=permissions, supportsAllDrives=True
+                    ),
+                    partial(self.__set_permission, file_id),
+                )
+                for index, file_id in enumerate(file_ids)
+            ]
+        )
+
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
         stop=stop_after_attempt(3),
@@ -177,7 +442,8 @@ class GoogleDriveHelper:
     )
     def __getFileMetadata(self, file_id):
         return (
-            self.__service.files()
+            self.__get_service()
+            .files()
             .get(
                 fileId=file_id,
                 supportsAllDrives=True,
@@ -196,7 +462,8 @@ class GoogleDriveHelper:
         files = []
         while True:
             response = (
-                self.__service.files()
+                self.__get_service()
+                .files()
                 .list(
                     supportsAllDrives=True,
                     includeItemsFromAllDrives=True,
@@ -234,7 +501,7 @@ class GoogleDriveHelper:
             return "Google Drive ID could not be found in the provided link"
         msg = ""
         try:
-            self.__service.files().delete(
+            self.__get_service().files().delete(
                 fileId=file_id, supportsAllDrives=True
             ).execute()
             msg = "Successfully deleted"
@@ -246,7 +513,6 @@ class GoogleDriveHelper:
                 token_service = self.__alt_authorize()
                 if token_service is not None:
                     LOGGER.error("File not found. Trying with token.pickle...")
-                    self.__service = token_service
                     return self.deletefile(link)
                 err = "File not found or insufficientFilePermissions!"
             LOGGER.error(f"Delete Result: {err}")
@@ -260,7 +526,8 @@ class GoogleDriveHelper:
         while True:
             try:
                 drive_query = (
-                    self.__service.files()
+                    self.__get_service()
+                    .files()
                     .list(
                         q=query,
                         spaces="drive",
@@ -276,11 +543,11 @@ class GoogleDriveHelper:
                     self.__total_files += 1
                     self.__total_bytes += int(file.get("size", 0))
                     if trash:
-                        self.__service.files().update(
+                        self.__get_service().files().update(
                             fileId=file["id"], body={"trashed": True}
                         ).execute()
                     else:
-                        self.__service.files().delete(
+                        self.__get_service().files().delete(
                             fileId=file["id"], supportsAllDrives=True
                         ).execute()
                 page_token = drive_query.get("nextPageToken", None)
@@ -298,7 +565,7 @@ class GoogleDriveHelper:
                 break
         return msg
 
-    def upload(self, file_name, size, gdrive_id):
+    def upload(self, file_name, size, gdrive_id, tree=None):
         if not gdrive_id:
             gdrive_id = config_dict["GDRIVE_ID"]
         self.__is_uploading = True
@@ -322,12 +589,19 @@ class GoogleDriveHelper:
                 LOGGER.info(f"Uploaded To G-Drive: {item_path}")
             else:
                 mime_type = "Folder"
+                self.__listing = (tree or scan_tree(item_path)).listing()
                 dir_id = self.__create_directory(
                     ospath.basename(ospath.abspath(file_name)), gdrive_id
                 )
-                result = self.__upload_dir(item_path, dir_id)
+                if config_dict["GD_UPLOAD_WORKERS"] > 1:
+                    result = self.__upload_dir_parallel(item_path, dir_id)
+                else:
+                    result = self.__upload_dir(item_path, dir_id)
                 if result is None:
                     raise Exception("Upload has been manually cancelled!")
+                if self.__pending_permissions and not self.__is_cancelled:
+                    self.__set_permissions(self.__pending_permissions)
+                    self.__pending_permissions.clear()
                 link = self.__G_DRIVE_DIR_BASE_DOWNLOAD_URL.format(dir_id)
                 if self.__is_cancelled:
                     return
@@ -360,15 +634,20 @@ class GoogleDriveHelper:
             )
 
     def __upload_dir(self, input_directory, dest_id):
-        list_dirs = listdir(input_directory)
+        sub_dirs, files = self.__listing.get(input_directory, ([], []))
+        list_dirs = sub_dirs + files
         if len(list_dirs) == 0:
             return dest_id
         new_id = None
+        dir_ids = dict(zip(sub_dirs, self.__create_directories(sub_dirs, dest_id)))
         for item in list_dirs:
             current_file_name = ospath.join(input_directory, item)
-            if ospath.isdir(current_file_name):
-                current_dir_id = self.__create_directory(item, dest_id)
-                new_id = self.__upload_dir(current_file_name, current_dir_id)
+            if self.__is_cancelled:
+                break
+            if item in dir_ids:
+                if dir_ids[item] is None:
+                    continue
+                new_id = self.__upload_dir(current_file_name, dir_ids[item])
                 self.__total_folders += 1
             elif not item.lower().endswith(tuple(GLOBAL_EXTENSION_FILTER)):
                 mime_type = get_mime_type(current_file_name)
@@ -384,32 +663,141 @@ class GoogleDriveHelper:
                 break
         return new_id
 
+    def __upload_dir_parallel(self, input_directory, dest_id):
+        workers = config_dict["GD_UPLOAD_WORKERS"]
+        folders = deque([(input_directory, dest_id)])
+        self.__start_time = time()
+        pending = set()
+
+        def reap(return_when):
+            done, _ = wait(pending, return_when=return_when)
+            pending.difference_update(done)
+            for future in done:
+                if exc := future.exception():
+                    raise exc
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                while folders and not self.__is_cancelled:
+                    path, target_id = folders.popleft()
+                    sub_dirs, files = self.__listing.get(path, ([], []))
+                    list_dirs = sub_dirs + files
+                    for item, current_dir_id in zip(
+                        sub_dirs, self.__create_directories(sub_dirs, target_id)
+                    ):
+                        if current_dir_id is None:
+                            continue
+                        self.__total_folders += 1
+                        folders.append((ospath.join(path, item), current_dir_id))
+                    for item in list_dirs:
+                        if self.__is_cancelled:
+                            break
+                        current_file_name = ospath.join(path, item)
+                        if item in sub_dirs:
+                            continue
+                        if item.lower().endswith(tuple(GLOBAL_EXTENSION_FILTER)):
+                            osremove(current_file_name)
+                            continue
+                        if len(pending) >= workers * 2:
+                            reap(FIRST_COMPLETED)
+                        pending.add(
+                            executor.submit(
+                                self.__upload_worker, current_file_name, item, target_id
+                            )
+                        )
+                if pending:
+                    reap(ALL_COMPLETED)
+            except Exception:
+                # stop the sessions still in flight, the whole upload has failed
+                self.__is_cancelled = True
+                raise
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+        return dest_id
+
+    def __upload_worker(self, file_path, file_name, dest_id):
+        if self.__is_cancelled:
+            return
+        self.__thread_data.is_worker = True
+        self.__upload_file(file_path, file_name, get_mime_type(file_path), dest_id)
+        with self.__progress_lock:
+            self.__total_files += 1
+
+    def __add_progress(self, size):
+        with self.__progress_lock:
+            self.__processed_bytes += size
+            self.__total_time = int(time() - self.__start_time)
+
+    def __chunk_size(self, file_size):
+        # aim for ~10s per chunk at the session rate seen so far, in 256KB units
+        chunk = self.__upload_rate * 10 or 16 * 1024 * 1024
+        chunk = min(max(chunk, 8 * 1024 * 1024), 100 * 1024 * 1024, file_size)
+        return max(int(chunk) // (256 * 1024), 1) * 256 * 1024
+
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
         stop=stop_after_attempt(3),
         retry=retry_if_exception_type(Exception),
     )
-    def __create_directory(self, directory_name, dest_id):
+    def __create_directory(self, directory_name, dest_id, set_permission=True):
+        file_metadata = self.__folder_metadata(directory_name, dest_id)
+        file = (
+            self.__get_service()
+            .files()
+            .create(body=file_metadata, supportsAllDrives=True)
+            .execute()
+        )
+        file_id = file.get("id")
+        if set_permission and not config_dict["IS_TEAM_DRIVE"]:
+            self.__set_permission(file_id)
+        LOGGER.info(f'Created G-Drive Folder:\nName: {file.get("name")}\nID: {file_id}')
+        return file_id
+
+    def __folder_metadata(self, directory_name, dest_id):
         directory_name, _ = async_to_sync(
             format_filename, directory_name, self.__user_id, isMirror=True
         )
-        file_metadata = {
+        if dest_id is None:
+            # without parents Drive puts the folder into the My Drive root
+            raise ValueError(f"No parent folder for {directory_name}")
+        return {
             "name": directory_name,
             "description": config_dict["GD_INFO"],
             "mimeType": self.__G_DRIVE_DIR_MIME_TYPE,
+            "parents": [dest_id],
         }
-        if dest_id is not None:
-            file_metadata["parents"] = [dest_id]
-        file = (
-            self.__service.files()
-            .create(body=file_metadata, supportsAllDrives=True)
-            .execute()
+
+    def __create_directories(self, directory_names, dest_id):
+        if not directory_names:
+            return []
+        if len(directory_names) == 1:
+            return [self.__create_directory(directory_names[0], dest_id)]
+        service = self.__get_service()
+        results = self.__execute_batch(
+            [
+                (
+                    str(index),
+                    service.files().create(
+                        body=self.__folder_metadata(name, dest_id),
+                        supportsAllDrives=True,
+                    ),
+                    partial(self.__create_directory, name, dest_id, False),
+                )
+                for index, name in enumerate(directory_names)
+            ]
         )
-        file_id = file.get("id")
+        file_ids = []
+        for index in range(len(directory_names)):
+            file = results.get(str(index))
+            file_id = file.get("id") if isinstance(file, dict) else file
+            if isinstance(file, dict):
+                LOGGER.info(
+                    f'Created G-Drive Folder:\nName: {file.get("name")}\nID: {file_id}'
+                )
+            file_ids.append(file_id)
         if not config_dict["IS_TEAM_DRIVE"]:
-            self.__set_permission(file_id)
-        LOGGER.info(f'Created G-Drive Folder:\nName: {file.get("name")}\nID: {file_id}')
-        return file_id
+            self.__set_permissions([file_id for file_id in file_ids if file_id])
+        return file_ids
 
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
@@ -432,7 +820,8 @@ class GoogleDriveHelper:
         if ospath.getsize(file_path) == 0:
             media_body = MediaFileUpload(file_path, mimetype=mime_type, resumable=False)
             response = (
-                self.__service.files()
+                self.__get_service()
+                .files()
                 .create(
                     body=file_metadata, media_body=media_body, supportsAllDrives=True
                 )
@@ -442,28 +831,55 @@ class GoogleDriveHelper:
                 self.__set_permission(response["id"])
 
             drive_file = (
-                self.__service.files()
+                self.__get_service()
+                .files()
                 .get(fileId=response["id"], supportsAllDrives=True)
                 .execute()
             )
             return self.__G_DRIVE_BASE_DOWNLOAD_URL.format(drive_file.get("id"))
+        worker = getattr(self.__thread_data, "is_worker", False)
+        file_size = ospath.getsize(file_path)
         media_body = MediaFileUpload(
-            file_path, mimetype=mime_type, resumable=True, chunksize=100 * 1024 * 1024
+            file_path,
+            mimetype=mime_type,
+            resumable=True,
+            chunksize=(self.__chunk_size(file_size) if worker else 100 * 1024 * 1024),
         )
 
         # Insert a file
-        drive_file = self.__service.files().create(
-            body=file_metadata, media_body=media_body, supportsAllDrives=True
+        drive_file = (
+            self.__get_service()
+            .files()
+            .create(body=file_metadata, media_body=media_body, supportsAllDrives=True)
         )
         response = None
         retries = 0
+        uploaded = 0
         while response is None and not self.__is_cancelled:
             try:
-                self.__status, response = drive_file.next_chunk()
+                if not worker:
+                    self.__status, response = drive_file.next_chunk()
+                    continue
+                # concurrent sessions report their own progress chunk by chunk
+                chunk_start = time()
+                status, response = drive_file.next_chunk()
+                done = status.resumable_progress if status else file_size
+                rate = (done - uploaded) / max(time() - chunk_start, 0.001)
+                self.__upload_rate = (
+                    rate
+                    if not self.__upload_rate
+                    else 0.7 * self.__upload_rate + 0.3 * rate
+                )
+                self.__add_progress(done - uploaded)
+                uploaded = done
             except HttpError as err:
                 if err.resp.status in [500, 502, 503, 504] and retries < 10:
                     retries += 1
                     continue
+                if worker:
+                    # the session is either given up or started again from scratch
+                    self.__add_progress(-uploaded)
+                    uploaded = 0
                 if err.resp.get("content-type", "").startswith("application/json"):
                     reason = (
                         eval(err.content).get("error").get("errors")[0].get("reason")
@@ -490,21 +906,30 @@ class GoogleDriveHelper:
                     else:
                         LOGGER.error(f"Got: {reason}")
                         raise err
+            except Exception:
+                if worker:
+                    self.__add_progress(-uploaded)
+                raise
         if self.__is_cancelled:
             return
+        self.__record_usage(file_size)
         if not self.__listener.seed or self.__listener.newDir:
             try:
                 osremove(file_path)
             except Exception:
                 pass
         self.__file_processed_bytes = 0
-        # Insert new permissions
+        # Insert new permissions, files of a folder upload are shared in batches
         if not config_dict["IS_TEAM_DRIVE"]:
-            self.__set_permission(response["id"])
+            if is_dir:
+                self.__pending_permissions.append(response["id"])
+            else:
+                self.__set_permission(response["id"])
         # Define file instance and get url for download
         if not is_dir:
             drive_file = (
-                self.__service.files()
+                self.__get_service()
+                .files()
                 .get(fileId=response["id"], supportsAllDrives=True)
                 .execute()
             )
@@ -529,9 +954,12 @@ class GoogleDriveHelper:
             mime_type = meta.get("mimeType")
             if mime_type == self.__G_DRIVE_DIR_MIME_TYPE:
                 dir_id = self.__create_directory(meta.get("name"), gdrive_id)
-                self.__cloneFolder(
-                    meta.get("name"), meta.get("name"), meta.get("id"), dir_id
-                )
+                if config_dict["GD_CLONE_WORKERS"] > 1:
+                    self.__cloneFolderParallel(meta.get("name"), meta.get("id"), dir_id)
+                else:
+                    self.__cloneFolder(
+                        meta.get("name"), meta.get("name"), meta.get("id"), dir_id
+                    )
                 durl = self.__G_DRIVE_DIR_BASE_DOWNLOAD_URL.format(dir_id)
                 if self.__is_cancelled:
                     LOGGER.info("Deleting cloned data from Drive...")
@@ -546,6 +974,7 @@ class GoogleDriveHelper:
                 if mime_type is None:
                     mime_type = "File"
                 size = int(meta.get("size", 0))
+                self.__record_usage(size, 1)
             return durl, size, mime_type, self.__total_files, self.__total_folders
         except Exception as err:
             if isinstance(err, RetryError):
@@ -559,7 +988,6 @@ class GoogleDriveHelper:
                     token_service = self.__alt_authorize()
                     if token_service is not None:
                         LOGGER.error("File not found. Trying with token.pickle...")
-                        self.__service = token_service
                         return self.clone(link)
                 msg = "File not found."
             else:
@@ -572,21 +1000,127 @@ class GoogleDriveHelper:
         files = self.__getFilesByFolderId(folder_id)
         if len(files) == 0:
             return dest_id
+        folders, files = self.__split_listing(files)
+        folder_ids = self.__create_directories(
+            [folder.get("name") for folder in folders], dest_id
+        )
+        for folder, current_dir_id in zip(folders, folder_ids):
+            # ids are missing only for a batch cut short by a cancel
+            if self.__is_cancelled:
+                return
+            if current_dir_id is None:
+                continue
+            self.__total_folders += 1
+            file_path = ospath.join(local_path, folder.get("name"))
+            self.__cloneFolder(
+                folder.get("name"), file_path, folder.get("id"), current_dir_id
+            )
+        if self.__is_cancelled:
+            return
+        for i in range(0, len(files), self.__batch_size):
+            chunk = files[i : i + self.__batch_size]
+            self.__total_files += len(chunk)
+            self.__copy_files(chunk, dest_id)
+            size = sum(int(file.get("size", 0)) for file in chunk)
+            self.__record_usage(size, len(chunk))
+            self.__processed_bytes += size
+            self.__total_time = int(time() - self.__start_time)
+            if self.__is_cancelled:
+                break
+
+    def __cloneFolderParallel(self, local_path, folder_id, dest_id):
+        workers = config_dict["GD_CLONE_WORKERS"]
+        folders = deque([(local_path, folder_id, dest_id)])
+        pending = set()
+
+        def reap(return_when):
+            done, _ = wait(pending, return_when=return_when)
+            pending.difference_update(done)
+            for future in done:
+                if exc := future.exception():
+                    raise exc
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                while folders and not self.__is_cancelled:
+                    path, source_id, target_id = folders.popleft()
+                    LOGGER.info(f"Syncing: {path}")
+                    sub_folders, files = self.__split_listing(
+                        self.__getFilesByFolderId(source_id)
+                    )
+                    folder_ids = self.__create_directories(
+                        [folder.get("name") for folder in sub_folders], target_id
+                    )
+                    for folder, current_dir_id in zip(sub_folders, folder_ids):
+                        if current_dir_id is None:
+                            continue
+                        self.__total_folders += 1
+                        folders.append(
+                            (
+                                ospath.join(path, folder.get("name")),
+                                folder.get("id"),
+                                current_dir_id,
+                            )
+                        )
+                    for i in range(0, len(files), self.__batch_size):
+                        if self.__is_cancelled:
+                            break
+                        chunk = files[i : i + self.__batch_size]
+                        self.__total_files += len(chunk)
+                        if len(pending) >= workers * 2:
+                            reap(FIRST_COMPLETED)
+                        pending.add(
+                            executor.submit(self.__copy_worker, chunk, target_id)
+                        )
+                if pending:
+                    reap(ALL_COMPLETED)
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def __split_listing(self, files):
+        folders = []
+        copies = []
         for file in files:
             if file.get("mimeType") == self.__G_DRIVE_DIR_MIME_TYPE:
-                self.__total_folders += 1
-                file_path = ospath.join(local_path, file.get("name"))
-                current_dir_id = self.__create_directory(file.get("name"), dest_id)
-                self.__cloneFolder(
-                    file.get("name"), file_path, file.get("id"), current_dir_id
-                )
+                folders.append(file)
             elif not file.get("name").lower().endswith(tuple(GLOBAL_EXTENSION_FILTER)):
-                self.__total_files += 1
-                self.__copyFile(file.get("id"), dest_id, file.get("name"))
-                self.__processed_bytes += int(file.get("size", 0))
-                self.__total_time = int(time() - self.__start_time)
-            if self.__is_cancelled:
-                break
+                copies.append(file)
+        return folders, copies
+
+    def __copy_worker(self, files, dest_id):
+        if self.__is_cancelled:
+            return
+        self.__thread_data.is_worker = True
+        self.__copy_files(files, dest_id)
+        size = sum(int(file.get("size", 0)) for file in files)
+        self.__record_usage(size, len(files))
+        with self.__progress_lock:
+            self.__processed_bytes += size
+            self.__total_time = int(time() - self.__start_time)
+
+    def __copy_files(self, files, dest_id):
+        if len(files) == 1:
+            file = files[0]
+            return [self.__copyFile(file.get("id"), dest_id, file.get("name"))]
+        service = self.__get_service()
+        requests = []
+        for index, file in enumerate(files):
+            file_name, _ = async_to_sync(
+                format_filename, file.get("name"), self.__user_id, isMirror=True
+            )
+            requests.append(
+                (
+                    str(index),
+                    service.files().copy(
+                        fileId=file.get("id"),
+                        body={"name": file_name, "parents": [dest_id]},
+                        supportsAllDrives=True,
+                    ),
+                    partial(self.__copyFile, file.get("id"), dest_id, file.get("name")),
+                )
+            )
+        results = self.__execute_batch(requests)
+        return [results.get(str(index)) for index in range(len(files))]
 
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
@@ -600,7 +1134,8 @@ class GoogleDriveHelper:
         body = {"name": file_name, "parents": [dest_id]}
         try:
             return (
-                self.__service.files()
+                self.__get_service()
+                .files()
                 .copy(fileId=file_id, body=body, supportsAllDrives=True)
                 .execute()
             )
@@ -636,32 +1171,80 @@ class GoogleDriveHelper:
             estr = estr.replace(char, f"\\{char}")
         return estr.strip()
 
-    def __get_recursive_list(self, file, rootid):
-        rtnlist = []
-        # if not rootid:
-        #    rootid = file.get('teamDriveId')
-        if rootid == "root":
-            rootid = (
-                self.__service.files()
-                .get(fileId="root", fields="id")
+    def __get_root_id(self, rootid):
+        if rootid != "root":
+            return rootid
+        return (
+            self.__get_service()
+            .files()
+            .get(fileId="root", fields="id")
+            .execute()
+            .get("id")
+        )
+
+    def __getParentData(self, file_id):
+        try:
+            return (
+                self.__get_service()
+                .files()
+                .get(fileId=file_id, supportsAllDrives=True, fields="id, name, parents")
                 .execute()
-                .get("id")
             )
-        x = file.get("name")
-        y = file.get("id")
-        while y != rootid:
-            rtnlist.append(x)
-            file = (
-                self.__service.files()
-                .get(
-                    fileId=file.get("parents")[0],
-                    supportsAllDrives=True,
-                    fields="id, name, parents",
-                )
-                .execute()
+        except Exception as err:
+            LOGGER.error(f"Failed to get parent {file_id}: {err}")
+
+    def __missing_parents(self, files, rootid, unresolved):
+        missing = set()
+        for file in files:
+            parent = (file.get("parents") or [None])[0]
+            while parent and parent != rootid and parent not in unresolved:
+                if (cached := folder_cache.get(rootid, parent)) is None:
+                    missing.add(parent)
+                    break
+                parent = cached[1]
+        return missing
+
+    def __resolve_parents(self, files, rootid):
+        folder_cache.fill(rootid, files)
+        service = self.__get_service()
+        unresolved = set()
+        # every round fetches one whole level of unknown ancestors in a single batch
+        while missing := list(self.__missing_parents(files, rootid, unresolved)):
+            results = self.__execute_batch(
+                [
+                    (
+                        str(index),
+                        service.files().get(
+                            fileId=file_id,
+                            supportsAllDrives=True,
+                            fields="id, name, parents",
+                        ),
+                        partial(self.__getParentData, file_id),
+                    )
+                    for index, file_id in enumerate(missing)
+                ]
             )
-            x = file.get("name")
-            y = file.get("id")
+            for index, file_id in enumerate(missing):
+                parent = results.get(str(index))
+                if parent and parent.get("parents"):
+                    folder_cache.set(
+                        rootid, file_id, parent.get("name"), parent["parents"][0]
+                    )
+                elif parent and file_id != rootid:
+                    folder_cache.set(rootid, file_id, parent.get("name"), None)
+                else:
+                    unresolved.add(file_id)
+
+    def __get_recursive_list(self, file, rootid):
+        if file.get("id") == rootid:
+            return []
+        rtnlist = [file.get("name")]
+        parent = (file.get("parents") or [None])[0]
+        while parent and parent != rootid:
+            if (cached := folder_cache.get(rootid, parent)) is None:
+                break
+            name, parent = cached
+            rtnlist.append(name)
         rtnlist.reverse()
         return rtnlist
 
@@ -684,7 +1267,8 @@ class GoogleDriveHelper:
                 query += "trashed = false"
                 if dir_id == "root":
                     return (
-                        self.__service.files()
+                        self.__get_service()
+                        .files()
                         .list(
                             q=f"{query} and 'me' in owners",
                             pageSize=200,
@@ -696,7 +1280,8 @@ class GoogleDriveHelper:
                     )
                 else:
                     return (
-                        self.__service.files()
+                        self.__get_service()
+                        .files()
                         .list(
                             supportsAllDrives=True,
                             includeItemsFromAllDrives=True,
@@ -725,7 +1310,8 @@ class GoogleDriveHelper:
                         query += "mimeType = 'application/vnd.google-apps.folder' and "
                 query += "trashed = false"
                 return (
-                    self.__service.files()
+                    self.__get_service()
+                    .files()
                     .list(
                         supportsAllDrives=True,
                         includeItemsFromAllDrives=True,
@@ -742,6 +1328,25 @@ class GoogleDriveHelper:
             LOGGER.error(err)
             return {"files": []}
 
+    def __search_worker(self, *args):
+        self.__thread_data.is_worker = True
+        return self.__search_drive(*args)
+
+    def __search_drive(
+        self, dir_id, index_url, fileName, stopDup, isRecursive, itemType, indexed=None
+    ):
+        isRecur = False if isRecursive and len(dir_id) > 23 else isRecursive
+        if indexed is not None:
+            dir_id, files = indexed
+            if files and isRecur and index_url:
+                self.__resolve_parents(files, dir_id)
+            return dir_id, isRecur, {"files": files}
+        response = self.__drive_query(dir_id, fileName, stopDup, isRecur, itemType)
+        if response["files"] and isRecur and index_url:
+            dir_id = self.__get_root_id(dir_id)
+            self.__resolve_parents(response["files"], dir_id)
+        return dir_id, isRecur, response
+
     def drive_list(
         self,
         fileName,
@@ -750,6 +1355,7 @@ class GoogleDriveHelper:
         isRecursive=True,
         itemType="",
         userId=None,
+        indexed=None,
     ):
         msg = f"""<figure><img src='{config_dict["COVER_IMAGE"]}'></figure>"""
         fileName = self.__escapes(str(fileName))
@@ -760,14 +1366,43 @@ class GoogleDriveHelper:
         if userId and (user_tds := async_to_sync(fetch_user_tds, userId)):
             merged_dict = {**list_drives_dict, **user_tds}
         if len(merged_dict) > 1:
-            token_service = self.__alt_authorize()
-            if token_service is not None:
-                self.__service = token_service
-        for no, (drive_name, drives_dict) in enumerate(merged_dict.items(), start=1):
-            dir_id = drives_dict["drive_id"]
+            self.__alt_authorize()
+        drives = list(merged_dict.items())[:1] if noMulti else list(merged_dict.items())
+        indexed = indexed or {}
+        remote = [
+            (no, drives_dict)
+            for no, (_, drives_dict) in enumerate(drives, start=1)
+            if drives_dict["drive_id"] not in indexed
+        ]
+        searches = {}
+        if len(remote) > 1:
+            executor = ThreadPoolExecutor(max_workers=min(len(remote), 10))
+            for no, drives_dict in remote:
+                searches[no] = executor.submit(
+                    self.__search_worker,
+                    drives_dict["drive_id"],
+                    drives_dict["index_link"],
+                    fileName,
+                    stopDup,
+                    isRecursive,
+                    itemType,
+                )
+            executor.shutdown(wait=False)
+        # results are merged in the configured drive order as each one arrives
+        for no, (drive_name, drives_dict) in enumerate(drives, start=1):
             index_url = drives_dict["index_link"]
-            isRecur = False if isRecursive and len(dir_id) > 23 else isRecursive
-            response = self.__drive_query(dir_id, fileName, stopDup, isRecur, itemType)
+            if search := searches.get(no):
+                dir_id, isRecur, response = search.result()
+            else:
+                dir_id, isRecur, response = self.__search_drive(
+                    drives_dict["drive_id"],
+                    index_url,
+                    fileName,
+                    stopDup,
+                    isRecursive,
+                    itemType,
+                    indexed.get(drives_dict["drive_id"]),
+                )
             if not response["files"]:
                 if noMulti:
                     break
@@ -845,6 +1480,112 @@ class GoogleDriveHelper:
 
         return telegraph_content, contents_no
 
+    @staticmethod
+    def __is_shared_drive(drive_id):
+        return drive_id != "root" and len(drive_id) <= 23
+
+    def use_account(self, account=None):
+        """Pins this helper to account, a service account file or token.pickle,
+        a fixed one if None. Change tokens of a My Drive folder belong to the
+        account that took them. Returns the pinned account, None if it is gone"""
+        if self.__token_auth:
+            return "token.pickle" if account in [None, "token.pickle"] else None
+        accounts = service_pool.accounts()
+        if account is None:
+            account = min(accounts)
+        if account not in accounts:
+            return None
+        self.__sa_index = accounts.index(account)
+        return account
+
+    def get_index_token(self, drive_id):
+        kwargs = {"driveId": drive_id} if self.__is_shared_drive(drive_id) else {}
+        return (
+            self.__get_service()
+            .changes()
+            .getStartPageToken(supportsAllDrives=True, **kwargs)
+            .execute()
+            .get("startPageToken")
+        )
+
+    def crawl_drive(self, drive_id):
+        root_id = self.__get_root_id(drive_id)
+        files = []
+        if drive_id != "root" and not self.__is_shared_drive(drive_id):
+            folders = deque([root_id])
+            while folders:
+                folder_id = folders.popleft()
+                for file in self.__getFilesByFolderId(folder_id):
+                    file["parents"] = [folder_id]
+                    files.append(file)
+                    if file.get("mimeType") == self.__G_DRIVE_DIR_MIME_TYPE:
+                        folders.append(file["id"])
+            return root_id, files
+        if drive_id == "root":
+            kwargs = {"q": "'me' in owners and trashed = false"}
+        else:
+            kwargs = {
+                "q": "trashed = false",
+                "driveId": drive_id,
+                "corpora": "drive",
+                "includeItemsFromAllDrives": True,
+            }
+        page_token = None
+        while True:
+            response = (
+                self.__get_service()
+                .files()
+                .list(
+                    supportsAllDrives=True,
+                    spaces="drive",
+                    pageSize=1000,
+                    fields="nextPageToken, files(id, name, mimeType, size, parents)",
+                    pageToken=page_token,
+                    **kwargs,
+                )
+                .execute()
+            )
+            files.extend(response.get("files", []))
+            page_token = response.get("nextPageToken")
+            if page_token is None:
+                break
+        return root_id, files
+
+    def get_index_changes(self, drive_id, page_token):
+        kwargs = {"driveId": drive_id} if self.__is_shared_drive(drive_id) else {}
+        changed = {}
+        removed = set()
+        while True:
+            response = (
+                self.__get_service()
+                .changes()
+                .list(
+                    pageToken=page_token,
+                    pageSize=1000,
+                    includeItemsFromAllDrives=True,
+                    supportsAllDrives=True,
+                    includeRemoved=True,
+                    fields="nextPageToken, newStartPageToken, changes(fileId, removed, file(id, name, mimeType, size, parents, trashed))",
+                    **kwargs,
+                )
+                .execute()
+            )
+            for change in response.get("changes", []):
+                file = change.get("file")
+                if change.get("removed") or not file or file.get("trashed"):
+                    removed.add(change["fileId"])
+                    changed.pop(change["fileId"], None)
+                else:
+                    changed[file["id"]] = file
+                    removed.discard(file["id"])
+            if "newStartPageToken" in response:
+                return (
+                    list(changed.values()),
+                    list(removed),
+                    response["newStartPageToken"],
+                )
+            page_token = response.get("nextPageToken")
+
     def count(self, link):
         try:
             file_id = self.getIdFromUrl(link)
@@ -869,7 +1610,6 @@ class GoogleDriveHelper:
                     token_service = self.__alt_authorize()
                     if token_service is not None:
                         LOGGER.error("File not found. Trying with token.pickle...")
-                        self.__service = token_service
                         return self.count(link)
                 msg = "File not found."
             else:
@@ -945,7 +1685,6 @@ class GoogleDriveHelper:
                     token_service = self.__alt_authorize()
                     if token_service is not None:
                         LOGGER.error("File not found. Trying with token.pickle...")
-                        self.__service = token_service
                         self.__updater.cancel()
                         return self.download(link)
                 err = "File not found!"
@@ -990,8 +1729,10 @@ class GoogleDriveHelper:
         retry=(retry_if_exception_type(Exception)),
     )
     def __download_file(self, file_id, path, filename, mime_type):
-        request = self.__service.files().get_media(
-            fileId=file_id, supportsAllDrives=True
+        request = (
+            self.__get_service()
+            .files()
+            .get_media(fileId=file_id, supportsAllDrives=True)
         )
         filename = filename.replace("/", "")
         if len(filename.encode()) > 255:
@@ -1033,7 +1774,7 @@ class GoogleDriveHelper:
                         else:
                             if self.__is_cancelled:
                                 return
-                            self.__switchServiceAccount()
+                            self.__switchServiceAccount(exhausted=False)
                             LOGGER.info(f"Got: {reason}, Trying Again...")
                             return self.__download_file(
                                 file_id, path, filename, mime_type
@@ -9,12 +9,24 @@ from aiofiles.os import (
     rmdir,
     mkdir,
 )
-from os import walk, path as ospath
+from os import path as ospath
 from time import time
 from PIL import Image
-from pyrogram.types import InputMediaVideo, InputMediaDocument, InlineKeyboardMarkup
-from pyrogram.errors import FloodWait, RPCError, PeerIdInvalid, ChannelInvalid
-from asyncio import sleep
+from pyrogram import StopTransmission, raw, utils
+from pyrogram.types import (
+    InputMediaVideo,
+    InputMediaDocument,
+    InlineKeyboardMarkup,
+    Message,
+)
+from pyrogram.errors import (
+    FloodWait,
+    RPCError,
+    PeerIdInvalid,
+    ChannelInvalid,
+    FilePartMissing,
+)
+from asyncio import sleep, create_task
 from tenacity import (
     retry,
     wait_exponential,
@@ -23,7 +35,6 @@ from tenacity import (
     RetryError,
 )
 from re import match as re_match, sub as re_sub
-from natsort import natsorted
 from aioshutil import copy
 
 from bot import (
@@ -44,7 +55,12 @@ from bot.helper.telegram_helper.message_utils import (
     deleteMessage,
     get_tg_link_content,
 )
-from bot.helper.ext_utils.fs_utils import clean_unwanted, is_archive, get_base_name
+from bot.helper.ext_utils.fs_utils import (
+    clean_unwanted,
+    is_archive,
+    get_base_name,
+    get_tree,
+)
 from bot.helper.ext_utils.bot_utils import (
     get_readable_file_size,
     is_telegram_link,
@@ -57,6 +73,7 @@ from bot.helper.ext_utils.leech_utils import (
     get_media_info,
     get_document_type,
     take_ss,
+    is_cached_thumb,
     get_ss,
     get_mediainfo_link,
     format_filename,
@@ -97,6 +114,7 @@ class TgUploader:
         self.__user_id = listener.message.from_user.id
         self.__leechmsg = {}
         self.__leech_utils = self.__listener.leech_utils
+        self.__workers = []
 
     async def get_custom_thumb(self, thumb):
         if is_telegram_link(thumb):
@@ -427,92 +445,394 @@ class TgUploader:
             if not self.__is_cancelled:
                 LOGGER.error(f"Failed To Send in User Dump:\n{str(err)}")
 
-    async def upload(self, o_files, m_size, size):
-        await self.__user_settings()
-        res = await self.__msg_to_reply()
-        if not res:
+    async def __send_media_groups(self):
+        for key, value in list(self.__media_dict.items()):
+            for subkey, msgs in list(value.items()):
+                if len(msgs) > 1:
+                    await self.__send_media_group(subkey, key, msgs)
+
+    async def __close_media_groups(self):
+        if self.__last_msg_in_group:
+            group_lists = [x for v in self.__media_dict.values() for x in v.keys()]
+            if (
+                match := re_match(r".+(?=\.0*\d+$)|.+(?=\.part\d+\..+)", self.__up_path)
+            ) and match.group(0) not in group_lists:
+                await self.__send_media_groups()
+        self.__last_msg_in_group = False
+
+    async def __add_to_media_group(self):
+        if self.__media_group and (self.__sent_msg.video or self.__sent_msg.document):
+            key = "documents" if self.__sent_msg.document else "videos"
+            if match := re_match(r".+(?=\.0*\d+$)|.+(?=\.part\d+\..+)", self.__up_path):
+                pname = match.group(0)
+                if pname in self.__media_dict[key].keys():
+                    self.__media_dict[key][pname].append(self.__sent_msg)
+                else:
+                    self.__media_dict[key][pname] = [self.__sent_msg]
+                msgs = self.__media_dict[key][pname]
+                if len(msgs) == 10:
+                    await self.__send_media_group(pname, key, msgs)
+                else:
+                    self.__last_msg_in_group = True
+
+    def __new_worker(self, client):
+        # only uploads the bytes of a single file, sending it is left to __publish
+        worker = TgUploader(self.name, self.__path, self.__listener)
+        worker.__client = client
+        worker.__thumb = self.__thumb
+        worker.__as_doc = self.__as_doc
+        worker.__leech_utils = {**self.__leech_utils, "screenshots": ""}
+        worker.__staged = None
+        worker.__media = None
+        self.__workers.append(worker)
+        return worker
+
+    async def __upload_staged(self, file_, dirpath):
+        self.__staged = await self.__prepare_file(file_, dirpath)
+        await self.__stage_file(*self.__staged)
+
+    @retry(
+        wait=wait_exponential(multiplier=2, min=4, max=8),
+        stop=stop_after_attempt(3),
+        retry=retry_if_exception_type(Exception),
+    )
+    async def __stage_file(self, cap_mono, file):
+        """Uploads self.__up_path with save_file, the media to send it with is
+        kept in self.__media, nothing is posted to the chat here"""
+        if self.__thumb is not None and not await aiopath.exists(self.__thumb):
+            self.__thumb = None
+        thumb = self.__thumb
+        self.__last_uploaded = 0
+        try:
+            key, thumb, attrs, is_video = await self.__media_kind(file)
+            if self.__is_cancelled:
+                return
+            client = self.__client
+            input_file = await client.save_file(
+                self.__up_path, progress=self.__upload_progress
+            )
+            if input_file is None:
+                raise Exception(f"Unable to upload {self.__up_path}")
+            if key == "photos":
+                media = raw.types.InputMediaUploadedPhoto(file=input_file)
+            else:
+                attributes = [
+                    raw.types.DocumentAttributeFilename(
+                        file_name=ospath.basename(self.__up_path)
+                    )
+                ]
+                if key == "videos":
+                    attributes.insert(
+                        0,
+                        raw.types.DocumentAttributeVideo(
+                            supports_streaming=True,
+                            duration=attrs["duration"],
+                            w=attrs["width"],
+                            h=attrs["height"],
+                        ),
+                    )
+                elif key == "audios":
+                    attributes.insert(0, raw.types.DocumentAttributeAudio(**attrs))
+                media = raw.types.InputMediaUploadedDocument(
+                    mime_type=client.guess_mime_type(self.__up_path)
+                    or {"videos": "video/mp4", "audios": "audio/mpeg"}.get(
+                        key, "application/zip"
+                    ),
+                    file=input_file,
+                    force_file=True if key == "documents" else None,
+                    thumb=await client.save_file(thumb) if thumb else None,
+                    attributes=attributes,
+                )
+            self.__media = (key, media, input_file, cap_mono, is_video)
+        except StopTransmission:
             return
+        except FloodWait as f:
+            LOGGER.warning(str(f))
+            await sleep(f.value)
+            raise
+        finally:
+            if (
+                self.__thumb is None
+                and thumb is not None
+                and not is_cached_thumb(thumb)
+                and await aiopath.exists(thumb)
+            ):
+                await aioremove(thumb)
+                if (
+                    (dir_name := ospath.dirname(thumb))
+                    and dir_name != "Thumbnails"
+                    and await aiopath.exists(dir_name)
+                ):
+                    await rmdir(dir_name)
+
+    async def __send_staged(self, worker, buttons):
+        """Sends the media worker uploaded as the next message of the reply chain,
+        by the client whose session holds the uploaded parts"""
+        key, media, input_file, cap_mono, _ = worker.__media
+        client = worker.__client
+        peer = await client.resolve_peer(self.__sent_msg.chat.id)
+        for _ in range(3):
+            try:
+                r = await client.invoke(
+                    raw.functions.messages.SendMedia(
+                        peer=peer,
+                        media=media,
+                        silent=True,
+                        reply_to_msg_id=self.__sent_msg.id,
+                        random_id=client.rnd_id(),
+                        reply_markup=await buttons.write(client) if buttons else None,
+                        **await utils.parse_text_entities(client, cap_mono, None, None),
+                    )
+                )
+            except FilePartMissing as e:
+                await client.save_file(
+                    worker.__up_path, file_id=input_file.id, file_part=e.value
+                )
+                continue
+            except FloodWait as f:
+                LOGGER.warning(str(f))
+                await sleep(f.value)
+                continue
+            for update in r.updates:
+                if isinstance(
+                    update,
+                    (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage),
+                ):
+                    return await Message._parse(
+                        client,
+                        update.message,
+                        {u.id: u for u in r.users},
+                        {c.id: c for c in r.chats},
+                    )
+            break
+        raise Exception(f"Unable to send {worker.__up_path}")
+
+    async def __restage(self, worker):
+        """Uploads the file worker could not once more, by the other client if it
+        can take the file, returns the worker that made the last attempt"""
+        if worker.__staged is None:
+            return worker
+        client = worker.__client
+        if IS_PREMIUM_USER:
+            if client is bot:
+                client = user
+            elif await aiopath.getsize(worker.__up_path) <= 2097152000:
+                client = bot
+        LOGGER.info(
+            f'Retrying by {"User" if client is user else "Bot"} Client. Path: {worker.__up_path}'
+        )
+        retry = self.__new_worker(client)
+        retry.__up_path = worker.__up_path
+        retry.__staged = worker.__staged
+        try:
+            await retry.__stage_file(*worker.__staged)
+        except Exception as err:
+            if isinstance(err, RetryError):
+                LOGGER.info(f"Total Attempts: {err.last_attempt.attempt_number}")
+            else:
+                LOGGER.error(f"{format_exc()}. Path: {worker.__up_path}")
+        return retry
+
+    async def __publish(self, worker, dirpath, task):
+        sender = worker
+        try:
+            try:
+                await task
+            except Exception as err:
+                if isinstance(err, RetryError):
+                    LOGGER.info(f"Total Attempts: {err.last_attempt.attempt_number}")
+                else:
+                    LOGGER.error(f"{format_exc()}. Path: {worker.__up_path}")
+            if self.__is_cancelled:
+                return
+            if worker.__media is None:
+                # FloodWait or an error before the upload was done
+                sender = await self.__restage(worker)
+                if self.__is_cancelled:
+                    return
+                if sender.__media is None:
+                    LOGGER.error(f"Unable to upload. Path: {worker.__up_path}")
+                    self.__corrupted += 1
+                    self.__retry_error = True
+                    return
+            key, _, _, _, is_video = sender.__media
+            file_ = sender.__staged[1]
+            self.__up_path = sender.__up_path
+            await self.__close_media_groups()
+            buttons = await self.__buttons(self.__up_path, is_video)
+            nrml_media = await self.__send_staged(sender, buttons)
+            if (
+                sender.__client is user
+                and key in ["documents", "videos"]
+                and (self.__has_buttons or not self.__leechmsg)
+            ):
+                # buttons of the bot, as the serial path does for premium media
+                try:
+                    self.__sent_msg = await bot.copy_message(
+                        nrml_media.chat.id,
+                        nrml_media.chat.id,
+                        nrml_media.id,
+                        reply_to_message_id=self.__sent_msg.id,
+                        reply_markup=buttons,
+                    )
+                    if self.__sent_msg:
+                        await deleteMessage(nrml_media)
+                except Exception:
+                    self.__sent_msg = nrml_media
+            else:
+                self.__sent_msg = nrml_media
+            if self.__is_cancelled:
+                return
+            await self.__add_to_media_group()
+            await self.__copy_file()
+            if self.__listener.isSuperGroup or config_dict["LEECH_LOG_ID"]:
+                self.__msgs_dict[self.__sent_msg.link] = file_
+        except Exception:
+            # the file never made it into the reply chain
+            self.__retry_error = True
+            LOGGER.error(f"{format_exc()}. Path: {worker.__up_path}")
+        finally:
+            for done in {worker, sender}:
+                self.__workers.remove(done)
+            # bytes of a failed first attempt are uploaded again by the retry
+            self.__processed_bytes += sender.__processed_bytes
+            if (
+                not self.__is_cancelled
+                and await aiopath.exists(sender.__up_path)
+                and (
+                    not self.__listener.seed
+                    or self.__listener.newDir
+                    or dirpath.endswith("/splited_files_mltb")
+                    or "/copied_mltb/" in sender.__up_path
+                )
+            ):
+                await aioremove(sender.__up_path)
+
+    async def __upload_parallel(self, files, o_files, m_size, workers):
+        # files are uploaded side by side with save_file and sent into the reply
+        # chain in order once they and all files before them are uploaded
+        clients = [bot, user] if IS_PREMIUM_USER else [bot]
+        pending = []
+        async for dirpath, file_ in files:
+            up_path = ospath.join(dirpath, file_)
+            if file_.lower().endswith(tuple(GLOBAL_EXTENSION_FILTER)):
+                await aioremove(up_path)
+                continue
+            f_size = await aiopath.getsize(up_path)
+            if self.__listener.seed and file_ in o_files and f_size in m_size:
+                continue
+            self.__total_files += 1
+            if f_size == 0:
+                LOGGER.error(
+                    f"{up_path} size is zero, telegram don't upload zero size files"
+                )
+                self.__corrupted += 1
+                continue
+            if self.__is_cancelled:
+                break
+            client = (
+                user
+                if f_size > 2097152000 and IS_PREMIUM_USER
+                else clients[self.__total_files % len(clients)]
+            )
+            worker = self.__new_worker(client)
+            worker.__up_path = up_path
+            task = create_task(worker.__upload_staged(file_, dirpath))
+            pending.append((worker, dirpath, task))
+            while len(pending) >= workers or pending and pending[0][2].done():
+                await self.__publish(*pending.pop(0))
+        for item in pending:
+            await self.__publish(*item)
+        if self.__leechmsg and config_dict["CLEAN_LOG_MSG"]:
+            await deleteMessage(list(self.__leechmsg.values())[0])
+
+    async def __walk_files(self, tree=None):
+        tree = tree or await get_tree(self.__path)
+        for dirpath, file_, _ in tree.files:
+            if not dirpath.endswith("/yt-dlp-thumb"):
+                yield dirpath, file_
+
+    async def __upload_serial(self, files, o_files, m_size):
         isDeleted = False
-        for dirpath, _, files in sorted(await sync_to_async(walk, self.__path)):
-            if dirpath.endswith("/yt-dlp-thumb"):
+        async for dirpath, file_ in files:
+            self.__up_path = ospath.join(dirpath, file_)
+            if file_.lower().endswith(tuple(GLOBAL_EXTENSION_FILTER)):
+                await aioremove(self.__up_path)
                 continue
-            for file_ in natsorted(files):
-                self.__up_path = ospath.join(dirpath, file_)
-                if file_.lower().endswith(tuple(GLOBAL_EXTENSION_FILTER)):
-                    await aioremove(self.__up_path)
+            try:
+                f_size = await aiopath.getsize(self.__up_path)
+                if self.__listener.seed and file_ in o_files and f_size in m_size:
                     continue
-                try:
-                    f_size = await aiopath.getsize(self.__up_path)
-                    if self.__listener.seed and file_ in o_files and f_size in m_size:
-                        continue
-                    self.__total_files += 1
-                    if f_size == 0:
-                        LOGGER.error(
-                            f"{self.__up_path} size is zero, telegram don't upload zero size files"
-                        )
-                        self.__corrupted += 1
-                        continue
-                    if self.__is_cancelled:
-                        return
-                    self.__prm_media = True if f_size > 2097152000 else False
-                    cap_mono, file_ = await self.__prepare_file(file_, dirpath)
-                    if self.__last_msg_in_group:
-                        group_lists = [
-                            x for v in self.__media_dict.values() for x in v.keys()
-                        ]
-                        if (
-                            match := re_match(
-                                r".+(?=\.0*\d+$)|.+(?=\.part\d+\..+)", self.__up_path
-                            )
-                        ) and match.group(0) not in group_lists:
-                            for key, value in list(self.__media_dict.items()):
-                                for subkey, msgs in list(value.items()):
-                                    if len(msgs) > 1:
-                                        await self.__send_media_group(subkey, key, msgs)
-                    self.__last_msg_in_group = False
-                    self.__last_uploaded = 0
-                    await self.__switching_client()
-                    await self.__upload_file(cap_mono, file_)
-                    if (
-                        self.__leechmsg
-                        and not isDeleted
-                        and config_dict["CLEAN_LOG_MSG"]
-                    ):
-                        await deleteMessage(list(self.__leechmsg.values())[0])
-                        isDeleted = True
-                    if self.__is_cancelled:
-                        return
-                    if not self.__is_corrupted and (
-                        self.__listener.isSuperGroup or config_dict["LEECH_LOG_ID"]
-                    ):
-                        self.__msgs_dict[self.__sent_msg.link] = file_
-                    await sleep(1)
-                except Exception as err:
-                    if isinstance(err, RetryError):
-                        LOGGER.info(
-                            f"Total Attempts: {err.last_attempt.attempt_number}"
-                        )
-                    else:
-                        LOGGER.error(f"{format_exc()}. Path: {self.__up_path}")
-                    if self.__is_cancelled:
-                        return
+                self.__total_files += 1
+                if f_size == 0:
+                    LOGGER.error(
+                        f"{self.__up_path} size is zero, telegram don't upload zero size files"
+                    )
+                    self.__corrupted += 1
                     continue
-                finally:
-                    if (
-                        not self.__is_cancelled
-                        and await aiopath.exists(self.__up_path)
-                        and (
-                            not self.__listener.seed
-                            or self.__listener.newDir
-                            or dirpath.endswith("/splited_files_mltb")
-                            or "/copied_mltb/" in self.__up_path
-                        )
-                    ):
-                        await aioremove(self.__up_path)
-        for key, value in list(self.__media_dict.items()):
-            for subkey, msgs in list(value.items()):
-                if len(msgs) > 1:
-                    await self.__send_media_group(subkey, key, msgs)
+                if self.__is_cancelled:
+                    return
+                self.__prm_media = True if f_size > 2097152000 else False
+                cap_mono, file_ = await self.__prepare_file(file_, dirpath)
+                await self.__close_media_groups()
+                self.__last_uploaded = 0
+                await self.__switching_client()
+                await self.__upload_file(cap_mono, file_)
+                if self.__leechmsg and not isDeleted and config_dict["CLEAN_LOG_MSG"]:
+                    await deleteMessage(list(self.__leechmsg.values())[0])
+                    isDeleted = True
+                if self.__is_cancelled:
+                    return
+                if not self.__is_corrupted and (
+                    self.__listener.isSuperGroup or config_dict["LEECH_LOG_ID"]
+                ):
+                    self.__msgs_dict[self.__sent_msg.link] = file_
+                await sleep(1)
+            except Exception as err:
+                if isinstance(err, RetryError):
+                    LOGGER.info(f"Total Attempts: {err.last_attempt.attempt_number}")
+                else:
+                    LOGGER.error(f"{format_exc()}. Path: {self.__up_path}")
+                if self.__is_cancelled:
+                    return
+                continue
+            finally:
+                if (
+                    not self.__is_cancelled
+                    and await aiopath.exists(self.__up_path)
+                    and (
+                        not self.__listener.seed
+                        or self.__listener.newDir
+                        or dirpath.endswith("/splited_files_mltb")
+                        or "/copied_mltb/" in self.__up_path
+                    )
+                ):
+                    await aioremove(self.__up_path)
+
+    async def upload(self, o_files, m_size, size, files=None, tree=None):
+        """files: async iterator of (dirpath, file_), taken from tree, or a fresh
+        scan of the upload path, if None"""
+        await self.__user_settings()
+        res = await self.__msg_to_reply()
+        if not res:
+            return
+        files = files or self.__walk_files(tree)
+        try:
+            if (workers := config_dict["LEECH_UPLOAD_WORKERS"]) > 1:
+                await self.__upload_parallel(files, o_files, m_size, workers)
+            else:
+                await self.__upload_serial(files, o_files, m_size)
+        except Exception as err:
+            # the files source failed, what was sent is not the whole leech
+            LOGGER.error(f"{format_exc()}. Leech: {self.name}")
+            self.__is_cancelled = True
+            for worker in self.__workers:
+                worker.__is_cancelled = True
+            await self.__listener.onUploadError(f"Unable to upload all files: {err}")
+            return
+        if self.__is_cancelled:
+            return
+        await self.__send_media_groups()
         if self.__is_cancelled:
             return
         if self.__listener.seed and not self.__listener.newDir:
@@ -542,6 +862,64 @@ class TgUploader:
             self.name,
         )
 
+    async def __media_kind(self, file, force_document=False):
+        """Media group key of self.__up_path, its thumbnail, the attributes to
+        send it with and if it is a video. Videos sent as such that are neither
+        MKV nor MP4 are renamed to .mp4 first"""
+        is_video, is_audio, is_image = await get_document_type(self.__up_path)
+        thumb = self.__thumb
+        if self.__leech_utils["thumb"]:
+            thumb = await self.get_custom_thumb(self.__leech_utils["thumb"])
+
+        if not is_image and thumb is None:
+            file_name = ospath.splitext(file)[0]
+            thumb_path = f"{self.__path}/yt-dlp-thumb/{file_name}.jpg"
+            if await aiopath.isfile(thumb_path):
+                thumb = thumb_path
+            elif is_audio and not is_video:
+                thumb = await get_audio_thumb(self.__up_path)
+
+        if (
+            self.__as_doc
+            or force_document
+            or (not is_video and not is_audio and not is_image)
+        ):
+            if is_video and thumb is None:
+                thumb = await take_ss(self.__up_path, None)
+            return "documents", thumb, {}, is_video
+        if is_video:
+            duration = (await get_media_info(self.__up_path))[0]
+            if thumb is None:
+                thumb = await take_ss(self.__up_path, duration)
+            if thumb is not None:
+                with Image.open(thumb) as img:
+                    width, height = img.size
+            else:
+                width = 480
+                height = 320
+            if not self.__up_path.upper().endswith(("MKV", "MP4")):
+                dirpath, file_ = self.__up_path.rsplit("/", 1)
+                if (
+                    self.__listener.seed
+                    and not self.__listener.newDir
+                    and not dirpath.endswith("/splited_files_mltb")
+                ):
+                    dirpath = f"{dirpath}/copied_mltb"
+                    await makedirs(dirpath, exist_ok=True)
+                    new_path = ospath.join(dirpath, f"{ospath.splitext(file_)[0]}.mp4")
+                    self.__up_path = await copy(self.__up_path, new_path)
+                else:
+                    new_path = f"{ospath.splitext(self.__up_path)[0]}.mp4"
+                    await aiorename(self.__up_path, new_path)
+                    self.__up_path = new_path
+            attrs = {"duration": duration, "width": width, "height": height}
+            return "videos", thumb, attrs, True
+        if is_audio:
+            duration, artist, title = await get_media_info(self.__up_path)
+            attrs = {"duration": duration, "performer": artist, "title": title}
+            return "audios", thumb, attrs, False
+        return "photos", thumb, {}, False
+
     @retry(
         wait=wait_exponential(multiplier=2, min=4, max=8),
         stop=stop_after_attempt(3),
@@ -553,102 +931,37 @@ class TgUploader:
         thumb = self.__thumb
         self.__is_corrupted = False
         try:
-            is_video, is_audio, is_image = await get_document_type(self.__up_path)
-
-            if self.__leech_utils["thumb"]:
-                thumb = await self.get_custom_thumb(self.__leech_utils["thumb"])
-
-            if not is_image and thumb is None:
-                file_name = ospath.splitext(file)[0]
-                thumb_path = f"{self.__path}/yt-dlp-thumb/{file_name}.jpg"
-                if await aiopath.isfile(thumb_path):
-                    thumb = thumb_path
-                elif is_audio and not is_video:
-                    thumb = await get_audio_thumb(self.__up_path)
-
-            if (
-                self.__as_doc
-                or force_document
-                or (not is_video and not is_audio and not is_image)
-            ):
-                key = "documents"
-                if is_video and thumb is None:
-                    thumb = await take_ss(self.__up_path, None)
-                if self.__is_cancelled:
-                    return
+            key, thumb, attrs, is_video = await self.__media_kind(file, force_document)
+            if self.__is_cancelled:
+                return
+            if key in ["documents", "videos"]:
                 buttons = await self.__buttons(self.__up_path, is_video)
-                nrml_media = await self.__client.send_document(
-                    chat_id=self.__sent_msg.chat.id,
-                    reply_to_message_id=self.__sent_msg.id,
-                    document=self.__up_path,
-                    thumb=thumb,
-                    caption=cap_mono,
-                    force_document=True,
-                    disable_notification=True,
-                    progress=self.__upload_progress,
-                    reply_markup=buttons,
-                )
-
-                if self.__prm_media and (self.__has_buttons or not self.__leechmsg):
-                    try:
-                        self.__sent_msg = await bot.copy_message(
-                            nrml_media.chat.id,
-                            nrml_media.chat.id,
-                            nrml_media.id,
-                            reply_to_message_id=self.__sent_msg.id,
-                            reply_markup=buttons,
-                        )
-                        if self.__sent_msg:
-                            await deleteMessage(nrml_media)
-                    except Exception:
-                        self.__sent_msg = nrml_media
-                else:
-                    self.__sent_msg = nrml_media
-            elif is_video:
-                key = "videos"
-                duration = (await get_media_info(self.__up_path))[0]
-                if thumb is None:
-                    thumb = await take_ss(self.__up_path, duration)
-                if thumb is not None:
-                    with Image.open(thumb) as img:
-                        width, height = img.size
+                if key == "documents":
+                    nrml_media = await self.__client.send_document(
+                        chat_id=self.__sent_msg.chat.id,
+                        reply_to_message_id=self.__sent_msg.id,
+                        document=self.__up_path,
+                        thumb=thumb,
+                        caption=cap_mono,
+                        force_document=True,
+                        disable_notification=True,
+                        progress=self.__upload_progress,
+                        reply_markup=buttons,
+                    )
                 else:
-                    width = 480
-                    height = 320
-                if not self.__up_path.upper().endswith(("MKV", "MP4")):
-                    dirpath, file_ = self.__up_path.rsplit("/", 1)
-                    if (
-                        self.__listener.seed
-                        and not self.__listener.newDir
-                        and not dirpath.endswith("/splited_files_mltb")
-                    ):
-                        dirpath = f"{dirpath}/copied_mltb"
-                        await makedirs(dirpath, exist_ok=True)
-                        new_path = ospath.join(
-                            dirpath, f"{ospath.splitext(file_)[0]}.mp4"
-                        )
-                        self.__up_path = await copy(self.__up_path, new_path)
-                    else:
-                        new_path = f"{ospath.splitext(self.__up_path)[0]}.mp4"
-                        await aiorename(self.__up_path, new_path)
-                        self.__up_path = new_path
-                if self.__is_cancelled:
-                    return
-                buttons = await self.__buttons(self.__up_path, is_video)
-                nrml_media = await self.__client.send_video(
-                    chat_id=self.__sent_msg.chat.id,
-                    reply_to_message_id=self.__sent_msg.id,
-                    video=self.__up_path,
-                    caption=cap_mono,
-                    duration=duration,
-                    width=width,
-                    height=height,
-                    thumb=thumb,
-                    supports_streaming=True,
-                    disable_notification=True,
-                    progress=self.__upload_progress,
-                    reply_markup=buttons,
-                )
+                    nrml_media = await self.__client.send_video(
+                        chat_id=self.__sent_msg.chat.id,
+                        reply_to_message_id=self.__sent_msg.id,
+                        video=self.__up_path,
+                        caption=cap_mono,
+                        thumb=thumb,
+                        supports_streaming=True,
+                        disable_notification=True,
+                        progress=self.__upload_progress,
+                        reply_markup=buttons,
+                        **attrs,
+                    )
+
                 if self.__prm_media and (self.__has_buttons or not self.__leechmsg):
                     try:
                         self.__sent_msg = await bot.copy_message(
@@ -664,28 +977,19 @@ class TgUploader:
                         self.__sent_msg = nrml_media
                 else:
                     self.__sent_msg = nrml_media
-            elif is_audio:
-                key = "audios"
-                duration, artist, title = await get_media_info(self.__up_path)
-                if self.__is_cancelled:
-                    return
+            elif key == "audios":
                 self.__sent_msg = await self.__client.send_audio(
                     chat_id=self.__sent_msg.chat.id,
                     reply_to_message_id=self.__sent_msg.id,
                     audio=self.__up_path,
                     caption=cap_mono,
-                    duration=duration,
-                    performer=artist,
-                    title=title,
                     thumb=thumb,
                     disable_notification=True,
                     progress=self.__upload_progress,
                     reply_markup=await self.__buttons(self.__up_path),
+                    **attrs,
                 )
             else:
-                key = "photos"
-                if self.__is_cancelled:
-                    return
                 self.__sent_msg = await self.__client.send_photo(
                     chat_id=self.__sent_msg.chat.id,
                     reply_to_message_id=self.__sent_msg.id,
@@ -696,25 +1000,8 @@ class TgUploader:
                     reply_markup=await self.__buttons(self.__up_path),
                 )
 
-            if (
-                not self.__is_cancelled
-                and self.__media_group
-                and (self.__sent_msg.video or self.__sent_msg.document)
-            ):
-                key = "documents" if self.__sent_msg.document else "videos"
-                if match := re_match(
-                    r".+(?=\.0*\d+$)|.+(?=\.part\d+\..+)", self.__up_path
-                ):
-                    pname = match.group(0)
-                    if pname in self.__media_dict[key].keys():
-                        self.__media_dict[key][pname].append(self.__sent_msg)
-                    else:
-                        self.__media_dict[key][pname] = [self.__sent_msg]
-                    msgs = self.__media_dict[key][pname]
-                    if len(msgs) == 10:
-                        await self.__send_media_group(pname, key, msgs)
-                    else:
-                        self.__last_msg_in_group = True
+            if not self.__is_cancelled:
+                await self.__add_to_media_group()
             if self.__sent_msg:
                 await self.__copy_file()
 
@@ -739,6 +1026,7 @@ class TgUploader:
             if (
                 self.__thumb is None
                 and thumb is not None
+                and not is_cached_thumb(thumb)
                 and await aiopath.exists(thumb)
             ):
                 await aioremove(thumb)
@@ -757,15 +1045,19 @@ class TgUploader:
     @property
     def speed(self):
         try:
-            return self.__processed_bytes / (time() - self.__start_time)
+            return self.processed_bytes / (time() - self.__start_time)
         except Exception:
             return 0
 
     @property
     def processed_bytes(self):
-        return self.__processed_bytes
+        return self.__processed_bytes + sum(
+            worker.__processed_bytes for worker in self.__workers
+        )
 
     async def cancel_download(self):
         self.__is_cancelled = True
+        for worker in self.__workers:
+            worker.__is_cancelled = True
         LOGGER.info(f"Cancelling Upload: {self.name}")
         await self.__listener.onUploadError("Your Upload has been Stopped!")
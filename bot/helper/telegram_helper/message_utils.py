@@ -439,10 +439,9 @@ async def sendStatusMessage(msg):
             await deleteMessage(message)
             del status_reply_dict[chat_id]
         if message := await sendMessage(msg, progress, buttons, photo="IMAGES"):
-            if hasattr(message, "caption"):
-                message.caption = progress
-            else:
-                message.text = progress
+            # update_all_messages compares against .text to skip unchanged edits
+            message.caption = progress
+            message.text = progress
         status_reply_dict[chat_id] = [message, time()]
         if not Interval:
             Interval.append(
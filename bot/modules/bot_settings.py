@@ -30,7 +30,6 @@ from bot import (
     IS_PREMIUM_USER,
     download_dict,
     qbit_options,
-    get_client,
     LOGGER,
     bot,
     extra_buttons,
@@ -49,8 +48,13 @@ from bot.helper.telegram_helper.button_build import ButtonMaker
 from bot.helper.ext_utils.bot_utils import setInterval, sync_to_async, new_thread
 from bot.helper.ext_utils.db_handler import DbManger
 from bot.helper.ext_utils.task_manager import start_from_queued
+from bot.helper.ext_utils.qbit_utils import qb_state
 from bot.helper.ext_utils.help_messages import default_desp
 from bot.helper.mirror_utils.rclone_utils.serve import rclone_serve_booter
+from bot.helper.mirror_utils.upload_utils.gdriveTools import (
+    service_pool,
+    sa_scheduler,
+)
 from bot.modules.torrent_search import initiate_search_tools
 from bot.modules.rss import addJob
 from bot.helper.themes import AVL_THEMES
@@ -74,6 +78,14 @@ default_values = {
     "AUTHOR_URL": "https://t.me/WZML_X",
     "TITLE_NAME": "WZ Mirror/Leech X",
     "GD_INFO": "Uploaded by WZML-X",
+    "GD_CLONE_WORKERS": 1,
+    "GD_UPLOAD_WORKERS": 1,
+    "LEECH_UPLOAD_WORKERS": 1,
+    "DATABASE_WRITE_DELAY": 0,
+    "ARCHIVE_WORKERS": 0,
+    "ARCHIVE_LEVEL": 0,
+    "LINK_SPEED": 0,
+    "LINK_UTILIZATION": 90,
 }
 bool_vars = [
     "AS_DOCUMENT",
@@ -96,6 +108,7 @@ bool_vars = [
     "INCOMPLETE_TASK_NOTIFIER",
     "UPGRADE_PACKAGES",
     "SCREENSHOTS_MODE",
+    "DRIVE_INDEX",
 ]
 
 
@@ -338,14 +351,36 @@ async def load_config():
     QUEUE_UPLOAD = environ.get("QUEUE_UPLOAD", "")
     QUEUE_UPLOAD = "" if len(QUEUE_UPLOAD) == 0 else int(QUEUE_UPLOAD)
 
+    LINK_SPEED = environ.get("LINK_SPEED", "")
+    LINK_SPEED = int(LINK_SPEED) if LINK_SPEED.isdigit() else 0
+
+    LINK_UTILIZATION = environ.get("LINK_UTILIZATION", "")
+    LINK_UTILIZATION = (
+        min(int(LINK_UTILIZATION), 100) if LINK_UTILIZATION.isdigit() else 90
+    )
+
     INCOMPLETE_TASK_NOTIFIER = environ.get("INCOMPLETE_TASK_NOTIFIER", "")
     INCOMPLETE_TASK_NOTIFIER = INCOMPLETE_TASK_NOTIFIER.lower() == "true"
     if not INCOMPLETE_TASK_NOTIFIER and DATABASE_URL:
         await DbManger().trunc_table("tasks")
 
+    DATABASE_WRITE_DELAY = environ.get("DATABASE_WRITE_DELAY", "")
+    DATABASE_WRITE_DELAY = (
+        int(DATABASE_WRITE_DELAY) if DATABASE_WRITE_DELAY.isdigit() else 0
+    )
+
+    ARCHIVE_WORKERS = environ.get("ARCHIVE_WORKERS", "")
+    ARCHIVE_WORKERS = int(ARCHIVE_WORKERS) if ARCHIVE_WORKERS.isdigit() else 0
+
+    ARCHIVE_LEVEL = environ.get("ARCHIVE_LEVEL", "")
+    ARCHIVE_LEVEL = min(int(ARCHIVE_LEVEL), 9) if ARCHIVE_LEVEL.isdigit() else 0
+
     STOP_DUPLICATE = environ.get("STOP_DUPLICATE", "")
     STOP_DUPLICATE = STOP_DUPLICATE.lower() == "true"
 
+    DRIVE_INDEX = environ.get("DRIVE_INDEX", "")
+    DRIVE_INDEX = DRIVE_INDEX.lower() == "true"
+
     IS_TEAM_DRIVE = environ.get("IS_TEAM_DRIVE", "")
     IS_TEAM_DRIVE = IS_TEAM_DRIVE.lower() == "true"
 
@@ -379,6 +414,11 @@ async def load_config():
     EQUAL_SPLITS = environ.get("EQUAL_SPLITS", "")
     EQUAL_SPLITS = EQUAL_SPLITS.lower() == "true"
 
+    LEECH_UPLOAD_WORKERS = environ.get("LEECH_UPLOAD_WORKERS", "")
+    LEECH_UPLOAD_WORKERS = (
+        int(LEECH_UPLOAD_WORKERS) if LEECH_UPLOAD_WORKERS.isdigit() else 1
+    )
+
     MEDIA_GROUP = environ.get("MEDIA_GROUP", "")
     MEDIA_GROUP = MEDIA_GROUP.lower() == "true"
 
@@ -534,6 +574,12 @@ async def load_config():
     if len(GD_INFO) == 0:
         GD_INFO = "Uploaded by WZML-X"
 
+    GD_CLONE_WORKERS = environ.get("GD_CLONE_WORKERS", "")
+    GD_CLONE_WORKERS = int(GD_CLONE_WORKERS) if GD_CLONE_WORKERS.isdigit() else 1
+
+    GD_UPLOAD_WORKERS = environ.get("GD_UPLOAD_WORKERS", "")
+    GD_UPLOAD_WORKERS = int(GD_UPLOAD_WORKERS) if GD_UPLOAD_WORKERS.isdigit() else 1
+
     SAVE_MSG = environ.get("SAVE_MSG", "")
     SAVE_MSG = SAVE_MSG.lower() == "true"
 
@@ -716,12 +762,18 @@ async def load_config():
             "COVER_IMAGE": COVER_IMAGE,
             "TITLE_NAME": TITLE_NAME,
             "GD_INFO": GD_INFO,
+            "GD_CLONE_WORKERS": GD_CLONE_WORKERS,
+            "GD_UPLOAD_WORKERS": GD_UPLOAD_WORKERS,
             "GDTOT_CRYPT": GDTOT_CRYPT,
             "JIODRIVE_TOKEN": JIODRIVE_TOKEN,
             "EQUAL_SPLITS": EQUAL_SPLITS,
+            "LEECH_UPLOAD_WORKERS": LEECH_UPLOAD_WORKERS,
             "EXTENSION_FILTER": EXTENSION_FILTER,
             "GDRIVE_ID": GDRIVE_ID,
             "INCOMPLETE_TASK_NOTIFIER": INCOMPLETE_TASK_NOTIFIER,
+            "DATABASE_WRITE_DELAY": DATABASE_WRITE_DELAY,
+            "ARCHIVE_WORKERS": ARCHIVE_WORKERS,
+            "ARCHIVE_LEVEL": ARCHIVE_LEVEL,
             "INDEX_URL": INDEX_URL,
             "IS_TEAM_DRIVE": IS_TEAM_DRIVE,
             "LEECH_FILENAME_PREFIX": LEECH_FILENAME_PREFIX,
@@ -743,6 +795,8 @@ async def load_config():
             "QUEUE_ALL": QUEUE_ALL,
             "QUEUE_DOWNLOAD": QUEUE_DOWNLOAD,
             "QUEUE_UPLOAD": QUEUE_UPLOAD,
+            "LINK_SPEED": LINK_SPEED,
+            "LINK_UTILIZATION": LINK_UTILIZATION,
             "RCLONE_FLAGS": RCLONE_FLAGS,
             "RCLONE_PATH": RCLONE_PATH,
             "RCLONE_SERVE_URL": RCLONE_SERVE_URL,
@@ -765,6 +819,7 @@ async def load_config():
             "STATUS_LIMIT": STATUS_LIMIT,
             "STATUS_UPDATE_INTERVAL": STATUS_UPDATE_INTERVAL,
             "STOP_DUPLICATE": STOP_DUPLICATE,
+            "DRIVE_INDEX": DRIVE_INDEX,
             "SUDO_USERS": SUDO_USERS,
             "TELEGRAM_API": TELEGRAM_API,
             "TELEGRAM_HASH": TELEGRAM_HASH,
@@ -1048,7 +1103,7 @@ async def edit_qbit(_, message, pre_message, key):
         value = float(value)
     elif value.isdigit():
         value = int(value)
-    await sync_to_async(get_client().app_set_preferences, {key: value})
+    await sync_to_async(qb_state.client.app_set_preferences, {key: value})
     qbit_options[key] = value
     await update_buttons(pre_message, "qbit")
     await deleteMessage(message)
@@ -1188,6 +1243,9 @@ async def update_private_file(_, message, pre_message):
             await deleteMessage(message)
     if file_name == "rclone.conf":
         await rclone_serve_booter()
+    elif file_name in ["accounts", "accounts.zip", "token.pickle"]:
+        service_pool.clear()
+        sa_scheduler.clear()
     await update_buttons(pre_message)
     if DATABASE_URL:
         await DbManger().update_private_file(path)
@@ -1346,7 +1404,7 @@ async def edit_bot_settings(client, query):
     elif data[1] == "emptyqbit":
         handler_dict[message.chat.id] = False
         await query.answer()
-        await sync_to_async(get_client().app_set_preferences, {data[2]: value})
+        await sync_to_async(qb_state.client.app_set_preferences, {data[2]: value})
         qbit_options[data[2]] = ""
         await update_buttons(message, "qbit")
         if DATABASE_URL:
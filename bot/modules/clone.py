@@ -17,6 +17,7 @@ from bot import (
 )
 from bot.helper.ext_utils.task_manager import limit_checker, task_utils
 from bot.helper.mirror_utils.upload_utils.gdriveTools import GoogleDriveHelper
+from bot.helper.ext_utils.drive_index import search_drive_index
 from bot.helper.telegram_helper.message_utils import (
     sendMessage,
     editMessage,
@@ -232,7 +233,11 @@ async def gdcloneNode(message, link, listen_up):
         if config_dict["STOP_DUPLICATE"]:
             LOGGER.info("Checking File/Folder if already in Drive...")
             telegraph_content, contents_no = await sync_to_async(
-                gd.drive_list, name, True, True
+                gd.drive_list,
+                name,
+                True,
+                True,
+                indexed=await search_drive_index(name, stopDup=True),
             )
             if telegraph_content:
                 msg = BotTheme("STOP_DUPLICATE", content=contents_no)
@@ -5,6 +5,7 @@ from pyrogram.filters import command, regex
 
 from bot import LOGGER, bot, config_dict
 from bot.helper.mirror_utils.upload_utils.gdriveTools import GoogleDriveHelper
+from bot.helper.ext_utils.drive_index import search_drive_index
 from bot.helper.telegram_helper.message_utils import (
     sendMessage,
     editMessage,
@@ -44,6 +45,7 @@ async def _list_drive(key, message, user_id, item_type, isRecursive):
         isRecursive=isRecursive,
         itemType=item_type,
         userId=user_id,
+        indexed=await search_drive_index(key, False, isRecursive, item_type),
     )
     if telegraph_content:
         try:
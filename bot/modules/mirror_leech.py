@@ -36,6 +36,7 @@ from bot.helper.ext_utils.bot_utils import (
 )
 from bot.helper.ext_utils.exceptions import DirectDownloadLinkException
 from bot.helper.ext_utils.task_manager import task_utils
+from bot.helper.ext_utils.task_state import notify_tasks
 from bot.helper.mirror_utils.download_utils.aria2_download import add_aria2c_download
 from bot.helper.mirror_utils.download_utils.gd_download import add_gd_download
 from bot.helper.mirror_utils.download_utils.qbit_download import add_qb_torrent
@@ -238,6 +239,7 @@ async def _mirror_leech(
         )
         if folder_name:
             sameDir["tasks"].add(nextmsg.id)
+            await notify_tasks()
         nextmsg.from_user = message.from_user
         await sleep(5)
         _mirror_leech(client, nextmsg, isQbit, isLeech, sameDir, bulk)
@@ -10,6 +10,7 @@ from time import time
 
 from bot import DOWNLOAD_DIR, bot, categories_dict, config_dict, user_data, LOGGER
 from bot.helper.ext_utils.task_manager import task_utils
+from bot.helper.ext_utils.task_state import notify_tasks
 from bot.helper.telegram_helper.message_utils import (
     sendMessage,
     editMessage,
@@ -395,6 +396,7 @@ async def _ytdl(client, message, isLeech=False, sameDir=None, bulk=[]):
         )
         if folder_name:
             sameDir["tasks"].add(nextmsg.id)
+            await notify_tasks()
         nextmsg.from_user = message.from_user
         await sleep(5)
         _ytdl(client, nextmsg, isLeech, sameDir, bulk)